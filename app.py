@@ -3,11 +3,15 @@ import dash_bootstrap_components as dbc
 from dash import Dash, dcc, html
 from dash.dependencies import Input, Output
 
+import metrics
 import secrets_rs
 from callbacks import register_callbacks  # Import callbacks
 from components import navbar  # Import navbar
 from config import init_cache
-from data import data_loader, database, ynab_calls
+from data.data_loader import sync_all_data
+from data.migrations import run_migrations
+from data.sync_scheduler import SyncScheduler, register_sync
+from profiling import profiled
 
 # Local Application Imports
 from pages import home, transactions  # Import pages
@@ -22,9 +26,18 @@ app.title = "Financial Dashboard"
 
 server = app.server  # Get the Flask server
 
+# Bring a database written by an older version up to date before anything reads it
+run_migrations()
+
 # Initialize the cache
 init_cache(app.server)
 
+# Time callbacks, SQL statements and YNAB requests; served on /metrics
+metrics.instrument_callbacks(app)
+metrics.instrument_sql()
+metrics.instrument_requests()
+metrics.register_metrics_route(server)
+
 # Define Dash app layout
 app.layout = html.Div(
     [
@@ -47,29 +60,10 @@ def display_page(pathname):
 # Register callbacks separately
 register_callbacks(app)
 
-if __name__ == "__main__":
-    # Import all data from YNAB
-    budget_id = secrets_rs.BANANA_STAND_ID
-    if budget_id:
-        # Option 1: Sync everything
-        # data_loader.sync_all_data(budget_id)
+# Incremental YNAB sync in the background, off unless YNAB_SYNC_INTERVAL sets
+# the seconds between runs; started with each worker's first request, see /sync/status
+sync_scheduler = SyncScheduler(secrets_rs.BANANA_STAND_ID, sync=profiled(sync_all_data))
+register_sync(server, sync_scheduler)
 
-        # # Option 2: Or sync individual entities
-        # ynab_client = ynab_calls.YNABClient()
-        #
-        # # Get and store categories
-        # categories = ynab_client.get_categories(budget_id)
-        # data_loader.store_categories(categories)
-        #
-        # # Get and store payees
-        # payees = ynab_client.get_payees(budget_id)
-        # data_loader.store_payees(payees)
-        #
-        # # Get and store accounts and their current balances
-        # accounts = ynab_client.get_accounts(budget_id)
-        # data_loader.store_accounts(accounts)
-        #
-        # # Get and store transactions
-        # transactions = ynab_client.get_transactions(budget_id)
-        # data_loader.store_transactions(transactions)
-        app.run_server(debug=True)
+if __name__ == "__main__":
+    app.run_server(debug=True)
@@ -0,0 +1,54 @@
+// Clientside summary graph (YNAB_SUMMARY_MODE=client).
+//
+// `data` is the store filled by load_summary_data in callbacks.py: account
+// ids and category names once each, then parallel arrays of account index,
+// category index and total (milliunits) per account x category pair. The
+// figure matches the server-side update_summary_graph.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    summary: {
+        figure: function (selectedAccount, data) {
+            if (!data) {
+                return window.dash_clientside.no_update;
+            }
+            const filtered = Boolean(selectedAccount) && selectedAccount !== "all";
+            const account = filtered ? data.accounts.indexOf(selectedAccount) : -1;
+
+            const totals = new Map();
+            for (let i = 0; i < data.total.length; i++) {
+                if (filtered && data.account[i] !== account) {
+                    continue;
+                }
+                const category = data.category[i];
+                totals.set(category, (totals.get(category) || 0) + data.total[i]);
+            }
+            const top = Array.from(totals.entries())
+                .sort((a, b) => b[1] - a[1])
+                .slice(0, data.limit);
+
+            if (top.length === 0) {
+                let title = "No Data for Summary Graph";
+                if (filtered) {
+                    title += " for Selected Account";
+                }
+                return {data: [], layout: {title: {text: title}}};
+            }
+
+            let title = `Top ${data.limit} Spending Categories`;
+            if (filtered) {
+                title += " (Filtered by Account)";
+            }
+            return {
+                data: [{
+                    type: "bar",
+                    x: top.map(([category]) => data.categories[category]),
+                    y: top.map(([, total]) => total / data.scale),
+                }],
+                layout: {
+                    title: {text: title},
+                    xaxis: {title: {text: "category_name"}},
+                    yaxis: {title: {text: "total"}},
+                },
+            };
+        },
+    },
+});
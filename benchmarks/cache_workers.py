@@ -0,0 +1,148 @@
+"""
+Per-worker memory and cold-start latency of the dashboard data cache.
+
+Starts N worker processes the way gunicorn would, lets each one load
+`fetch_transactions()` from a cold start, and reports load latency and
+memory per worker for the "memory" (per-process SimpleCache) and "shared"
+(memory-mapped snapshot) backends.
+
+    YNAB_DATABASE_URI=sqlite:////tmp/bench.db python -m benchmarks.cache_workers --workers 4 --rows 200000
+
+RSS counts mapped snapshot pages in every worker that touches them; PSS
+(proportional set size, Linux only) splits shared pages between the workers
+and is the better measure of what the host actually pays.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+import datetime
+
+
+def _memory_kb():
+    """Return (rss_kb, pss_kb) of the current process; pss is None where unavailable."""
+    rss = pss = None
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        import resource
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss, pss
+
+
+def _worker(backend, cache_dir, barrier, results):
+    os.environ["YNAB_CACHE_BACKEND"] = backend
+    os.environ["YNAB_CACHE_DIR"] = cache_dir
+    from flask import Flask
+    import config
+
+    app = Flask(__name__)
+    config.init_cache(app)
+    baseline_rss, baseline_pss = _memory_kb()
+    barrier.wait()
+    with app.app_context():
+        start = time.perf_counter()
+        df = config.fetch_transactions()
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        config.fetch_transactions()
+        warm = time.perf_counter() - start
+    rss, pss = _memory_kb()
+    results.put({
+        "pid": os.getpid(),
+        "rows": len(df),
+        "cold_start_s": round(cold, 4),
+        "warm_s": round(warm, 4),
+        "rss_mb": round(rss / 1024, 1) if rss else None,
+        "pss_mb": round(pss / 1024, 1) if pss else None,
+        "rss_growth_mb": round((rss - baseline_rss) / 1024, 1) if rss and baseline_rss else None,
+        "pss_growth_mb": round((pss - baseline_pss) / 1024, 1) if pss and baseline_pss else None,
+    })
+
+
+def seed(rows):
+    """Fill an empty database with `rows` random transactions."""
+    from data import data_loader
+    from data.bulk_writer import upsert_rows
+    from data.database import Transaction
+    from data.migrations import run_migrations
+
+    run_migrations()
+    with data_loader.get_db_session() as session:
+        if session.query(Transaction).count():
+            return
+        start = datetime.date(2015, 1, 1)
+        upsert_rows(session, Transaction, (
+            {
+                "id": f"bench-{i:08d}",
+                "date": start + datetime.timedelta(days=random.randrange(3650)),
+                "amount": random.randint(-500_000, 200_000),
+                "memo": random.choice([None, "groceries", "rent", "coffee with a long memo"]),
+                "cleared": "cleared",
+                "approved": True,
+                "account_id": f"account-{random.randrange(12)}",
+                "payee_id": f"payee-{random.randrange(800)}",
+                "category_id": f"category-{random.randrange(90)}",
+            }
+            for i in range(rows)
+        ))
+        data_loader.bump_data_version(session=session)
+
+
+def run(backend, workers):
+    cache_dir = tempfile.mkdtemp(prefix="ynab-cache-")
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(backend, cache_dir, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    per_worker = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return per_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=0, help="seed an empty database with this many transactions")
+    parser.add_argument("--backends", default="memory,shared")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.rows:
+        seed(args.rows)
+
+    report = {}
+    for backend in args.backends.split(","):
+        per_worker = run(backend, args.workers)
+        report[backend] = {
+            "workers": per_worker,
+            "total_pss_growth_mb": round(sum(w["pss_growth_mb"] or 0 for w in per_worker), 1),
+            "max_cold_start_s": max(w["cold_start_s"] for w in per_worker),
+        }
+        print(f"{backend:>7}: cold start up to {report[backend]['max_cold_start_s']}s, "
+              f"PSS growth across {args.workers} workers {report[backend]['total_pss_growth_mb']} MB")
+        for w in per_worker:
+            print(f"         pid {w['pid']}: cold {w['cold_start_s']}s warm {w['warm_s']}s "
+                  f"rss {w['rss_mb']} MB pss {w['pss_mb']} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
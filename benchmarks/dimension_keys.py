@@ -0,0 +1,166 @@
+"""
+Join and aggregate speed on UUID columns vs integer dimension keys.
+
+Builds a synthetic database, then recreates the reporting tables the way
+they were before data.dimensions: copies of ledger_lines and
+category_account_month holding account, payee and category UUIDs, with the
+same indexes on the UUID columns, plus the old UUID indexes on transactions.
+The same reports are then timed both ways, joined and grouped on UUIDs
+("uuid") and on integer keys ("key"), and the on-disk size of the tables
+and indexes is compared:
+
+    python -m benchmarks.dimension_keys --transactions 200000
+    python -m benchmarks.dimension_keys --transactions 1000000 --repeat 3
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# The reporting tables and transactions indexes as they were on UUIDs
+UUID_SCHEMA = (
+    """CREATE TABLE ledger_lines_uuid AS
+       SELECT l.id, l.transaction_id, a.id AS account_id, l.date, p.id AS payee_id, c.id AS category_id,
+              l.amount, l.created_at, l.updated_at
+       FROM ledger_lines l
+       JOIN accounts a ON a.key = l.account_key
+       LEFT JOIN payees p ON p.key = l.payee_key
+       LEFT JOIN categories c ON c.key = l.category_key""",
+    "CREATE INDEX ix_ledger_lines_uuid_transaction ON ledger_lines_uuid (transaction_id)",
+    "CREATE INDEX ix_ledger_lines_uuid_date ON ledger_lines_uuid (date)",
+    "CREATE INDEX ix_ledger_lines_uuid_account_date ON ledger_lines_uuid (account_id, date)",
+    "CREATE INDEX ix_ledger_lines_uuid_category_date ON ledger_lines_uuid (category_id, date)",
+    """CREATE TABLE category_account_month_uuid AS
+       SELECT cam.id, a.id AS account_id, c.id AS category_id, cam.month, cam.total, cam.count,
+              cam.created_at, cam.updated_at
+       FROM category_account_month cam
+       JOIN accounts a ON a.key = cam.account_key
+       LEFT JOIN categories c ON c.key = cam.category_key""",
+    "CREATE INDEX ix_category_account_month_uuid_account_month ON category_account_month_uuid (account_id, month)",
+    "CREATE INDEX ix_category_account_month_uuid_month ON category_account_month_uuid (month)",
+    "CREATE INDEX ix_uuid_transactions_date_account ON transactions (date, account_id)",
+    "CREATE INDEX ix_uuid_transactions_category_date ON transactions (category_id, date)",
+    "CREATE INDEX ix_uuid_transactions_payee_date ON transactions (payee_id, date)",
+)
+
+# (table or index names on UUIDs, the same on keys) compared by size
+SIZES = {
+    "ledger_lines": (
+        ("ledger_lines_uuid",),
+        ("ledger_lines",),
+    ),
+    "ledger_lines indexes": (
+        ("ix_ledger_lines_uuid_transaction", "ix_ledger_lines_uuid_date",
+         "ix_ledger_lines_uuid_account_date", "ix_ledger_lines_uuid_category_date"),
+        ("ix_ledger_lines_transaction", "ix_ledger_lines_date",
+         "ix_ledger_lines_account_date", "ix_ledger_lines_category_date"),
+    ),
+    "transactions dimension indexes": (
+        ("ix_uuid_transactions_date_account", "ix_uuid_transactions_category_date",
+         "ix_uuid_transactions_payee_date"),
+        ("ix_transactions_date_account", "ix_transactions_category_date", "ix_transactions_payee_date"),
+    ),
+}
+
+# name: (query on UUIDs, query on keys); both return the same report
+QUERIES = {
+    "cube rebuild (group by account, category, month)": (
+        """SELECT SUM(amount), COUNT(*) FROM ledger_lines_uuid
+           GROUP BY account_id, category_id, substr(date, 1, 7)""",
+        """SELECT SUM(amount), COUNT(*) FROM ledger_lines
+           GROUP BY account_key, category_key, substr(date, 1, 7)""",
+    ),
+    "cube cell refresh (every account, one year)": (
+        """SELECT a.name, substr(l.date, 1, 7), SUM(l.amount), COUNT(*)
+           FROM accounts a JOIN ledger_lines_uuid l ON l.account_id = a.id
+           WHERE l.date >= date((SELECT MAX(date) FROM ledger_lines), '-1 year')
+           GROUP BY a.name, substr(l.date, 1, 7), l.category_id""",
+        """SELECT a.name, substr(l.date, 1, 7), SUM(l.amount), COUNT(*)
+           FROM accounts a JOIN ledger_lines l ON l.account_key = a.key
+           WHERE l.date >= date((SELECT MAX(date) FROM ledger_lines), '-1 year')
+           GROUP BY a.name, substr(l.date, 1, 7), l.category_key""",
+    ),
+    "spending by category and payee (ledger joins)": (
+        """SELECT c.name, p.name, SUM(l.amount) FROM ledger_lines_uuid l
+           JOIN categories c ON c.id = l.category_id
+           JOIN payees p ON p.id = l.payee_id
+           GROUP BY c.name, p.name""",
+        """SELECT c.name, p.name, SUM(l.amount) FROM ledger_lines l
+           JOIN categories c ON c.key = l.category_key
+           JOIN payees p ON p.key = l.payee_key
+           GROUP BY c.name, p.name""",
+    ),
+    "category summary (cube join)": (
+        """SELECT c.name, SUM(cam.total) FROM category_account_month_uuid cam
+           LEFT JOIN categories c ON cam.category_id = c.id GROUP BY c.name""",
+        """SELECT c.name, SUM(cam.total) FROM category_account_month cam
+           LEFT JOIN categories c ON cam.category_key = c.key GROUP BY c.name""",
+    ),
+    "transactions by account, payee, category": (
+        """SELECT a.name, p.name, c.name, SUM(t.amount) FROM transactions t
+           JOIN accounts a ON a.id = t.account_id
+           JOIN payees p ON p.id = t.payee_id
+           JOIN categories c ON c.id = t.category_id
+           GROUP BY a.name, p.name, c.name""",
+        """SELECT a.name, p.name, c.name, SUM(t.amount) FROM transactions t
+           JOIN accounts a ON a.key = t.account_key
+           JOIN payees p ON p.key = t.payee_key
+           JOIN categories c ON c.key = t.category_key
+           GROUP BY a.name, p.name, c.name""",
+    ),
+}
+
+
+def _time(conn, sql, repeat):
+    timings, rows = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.exec_driver_sql(sql).all()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), sorted(rows, key=repr)
+
+
+def _size_bytes(conn, names):
+    placeholders = ", ".join(f"'{name}'" for name in names)
+    return conn.exec_driver_sql(f"SELECT SUM(pgsize) FROM dbstat WHERE name IN ({placeholders})").scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="ynab-keys-bench-"), "bench.db")
+    os.environ["YNAB_DATABASE_URI"] = f"sqlite:///{db_path}"
+    from benchmarks.synthetic import FakeYNABClient, SyntheticBudget
+    from data import data_loader, database
+
+    budget = SyntheticBudget(transactions=args.transactions, seed=args.seed)
+    data_loader.sync_all_data(budget.id, client=FakeYNABClient(budget))
+
+    with database.engine.begin() as conn:
+        for statement in UUID_SCHEMA:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql("ANALYZE")
+
+    with database.engine.connect() as conn:
+        print(f"{args.transactions:,} transactions, median of {args.repeat} runs\n")
+        print(f"{'query':<50} {'uuid ms':>9} {'key ms':>9} {'speedup':>8}")
+        for name, (uuid_sql, key_sql) in QUERIES.items():
+            uuid_seconds, uuid_rows = _time(conn, uuid_sql, args.repeat)
+            key_seconds, key_rows = _time(conn, key_sql, args.repeat)
+            assert uuid_rows == key_rows, f"{name}: results differ"
+            print(f"{name:<50} {uuid_seconds * 1000:>9.1f} {key_seconds * 1000:>9.1f} "
+                  f"{uuid_seconds / key_seconds:>7.2f}x")
+
+        print(f"\n{'on disk':<50} {'uuid MB':>9} {'key MB':>9}")
+        for name, (uuid_names, key_names) in SIZES.items():
+            print(f"{name:<50} {_size_bytes(conn, uuid_names) / 2**20:>9.1f} "
+                  f"{_size_bytes(conn, key_names) / 2**20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Dashboard read latency while a large sync is writing.
+
+Builds a synthetic database, then runs a full resync in a separate process
+(as the syncing worker of a multi-worker deployment would) while this process
+repeatedly runs the dashboard's queries (data version, category summary,
+trend, accounts) and records their latency. Each journal mode gets its own
+database, so WAL can be compared with SQLite's default rollback journal:
+
+    python -m benchmarks.read_during_sync --transactions 200000
+    python -m benchmarks.read_during_sync --journal-modes WAL,DELETE --transactions 500000
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _summary(latencies):
+    if not latencies:
+        return {"reads": 0}
+    return {
+        "reads": len(latencies),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+def _configure(db_path, journal_mode, options):
+    os.environ["YNAB_DATABASE_URI"] = f"sqlite:///{db_path}"
+    os.environ["YNAB_SQLITE_JOURNAL_MODE"] = journal_mode
+    # Fail reads that wait longer than this instead of hanging the benchmark
+    os.environ["YNAB_SQLITE_BUSY_TIMEOUT_MS"] = str(options["busy_timeout_ms"])
+
+
+def _sync(db_path, journal_mode, options, full_resync):
+    """Run one sync of the synthetic budget (in its own process, like a sync worker)."""
+    _configure(db_path, journal_mode, options)
+    from benchmarks.synthetic import FakeYNABClient, SyntheticBudget
+    from data import data_loader
+
+    budget = SyntheticBudget(transactions=options["transactions"], seed=options["seed"])
+    data_loader.sync_all_data(budget.id, full_resync=full_resync, client=FakeYNABClient(budget))
+
+
+def _run_mode(journal_mode, options, queue):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="ynab-wal-bench-"), "bench.db")
+    ctx = multiprocessing.get_context("spawn")
+    seed = ctx.Process(target=_sync, args=(db_path, journal_mode, options, False))
+    seed.start()
+    seed.join()
+
+    _configure(db_path, journal_mode, options)
+    import config
+    from data import aggregates, trend
+
+    def reads():
+        config.get_data_version()
+        aggregates.get_category_summary()
+        trend.get_transaction_trend()
+        config._query_accounts()
+
+    def measure(stop_when):
+        latencies, errors = [], 0
+        while not stop_when():
+            start = time.perf_counter()
+            try:
+                reads()
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        return latencies, errors
+
+    idle_until = time.perf_counter() + options["idle_seconds"]
+    idle, _ = measure(lambda: time.perf_counter() > idle_until)
+
+    writer = ctx.Process(target=_sync, args=(db_path, journal_mode, options, True))
+    start = time.perf_counter()
+    writer.start()
+    busy, errors = measure(lambda: not writer.is_alive())
+    writer.join()
+    sync_seconds = time.perf_counter() - start
+
+    queue.put({
+        "journal_mode": journal_mode,
+        "sync_seconds": round(sync_seconds, 2),
+        "idle": _summary(idle),
+        "during_sync": dict(_summary(busy), errors=errors),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    parser.add_argument("--journal-modes", default="WAL,DELETE")
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--busy-timeout-ms", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    options = {
+        "transactions": args.transactions, "idle_seconds": args.idle_seconds,
+        "busy_timeout_ms": args.busy_timeout_ms, "seed": args.seed,
+    }
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'mode':<8} {'sync s':>8} {'phase':<12} {'reads':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'errors':>7}")
+    for mode in args.journal_modes.split(","):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_mode, args=(mode, options, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+        for phase in ("idle", "during_sync"):
+            row = result[phase]
+            print(f"{mode:<8} {result['sync_seconds']:>8} {phase:<12} {row['reads']:>6} "
+                  f"{row.get('p50_ms', '-'):>9} {row.get('p95_ms', '-'):>9} {row.get('max_ms', '-'):>9} "
+                  f"{row.get('errors', ''):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+End-to-end benchmark suite.
+
+For every budget size, a fresh SQLite database is built in a child process
+and the suite times the store_* loaders, full and incremental sync_all_data
+runs, fetch_transactions (cold and warm) and every Dash callback. It records
+wall time, throughput and peak traced memory per step and writes everything
+to a JSON file so releases can be compared.
+
+    python -m benchmarks.run_benchmarks --sizes 10000,100000,1000000
+    python -m benchmarks.run_benchmarks --sizes 5000000 --no-tracemalloc --output big.json
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+DEFAULT_SIZES = "10000,100000,1000000"
+
+
+class _CallbackRecorder:
+    """Minimal stand-in for a Dash app that keeps the functions passed to register_callbacks."""
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def callback(self, *args, **kwargs):
+        def decorator(func):
+            self.callbacks[func.__name__] = func
+            return func
+        return decorator
+
+    def clientside_callback(self, *args, **kwargs):
+        pass
+
+
+class _Timer:
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.results = []
+
+    def run(self, step, func, *args, rows=None, **kwargs):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        value = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        peak = None
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.results.append({
+            "step": step,
+            "seconds": round(seconds, 4),
+            "rows": rows,
+            "rows_per_s": round(rows / seconds) if rows and seconds else None,
+            "peak_traced_mb": round(peak / 2**20, 2) if peak is not None else None,
+        })
+        print(f"  {step:<38} {seconds:9.3f}s" + (f"  {rows / seconds:12,.0f} rows/s" if rows and seconds else ""))
+        return value
+
+
+def _run_size(size, options, queue):
+    """Benchmark one budget size against its own database (runs in a child process)."""
+    db_dir = tempfile.mkdtemp(prefix="ynab-bench-")
+    os.environ["YNAB_DATABASE_URI"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ["YNAB_CACHE_DIR"] = os.path.join(db_dir, "cache")
+
+    from flask import Flask
+
+    import callbacks
+    import config
+    from benchmarks.synthetic import FakeYNABClient, SyntheticBudget
+    from data import data_loader
+    from data.migrations import run_migrations
+
+    # The store_* steps below write before any sync has migrated the new database
+    run_migrations()
+    timer = _Timer(options["trace_memory"])
+    budget = SyntheticBudget(
+        accounts=options["accounts"], payees=options["payees"], category_groups=options["category_groups"],
+        transactions=size, split_ratio=options["split_ratio"], months=options["months"], seed=options["seed"],
+    )
+    categories = len(budget.categories)
+
+    print(f"size {size:,}")
+    timer.run("store_categories", data_loader.store_categories, budget.category_groups, rows=categories)
+    timer.run("store_payees", data_loader.store_payees, budget.payees, rows=len(budget.payees))
+    timer.run("store_accounts", data_loader.store_accounts, budget.accounts, rows=len(budget.accounts))
+    timer.run("store_budget", data_loader.store_budget, budget.budget_detail(),
+              rows=len(budget.months) * categories)
+    timer.run("store_transactions", data_loader.store_transactions, budget.transactions, rows=size)
+
+    client = FakeYNABClient(budget, delta_transactions=options["delta"])
+    timer.run("sync_all_data (full resync)", data_loader.sync_all_data, budget.id,
+              full_resync=True, client=client, rows=size)
+    timer.run("sync_all_data (incremental)", data_loader.sync_all_data, budget.id,
+              client=client, rows=options["delta"])
+
+    server = Flask(__name__)
+    config.init_cache(server)
+    recorder = _CallbackRecorder()
+    callbacks.register_callbacks(recorder)
+    first_account = budget.accounts[0].id
+    callback_args = {
+        "populate_account_dropdown": [("", (None,))],
+        "update_transaction_graph": [("", (None, None))],
+        "update_summary_graph": [(" (all)", ("all",)), (" (one account)", (first_account,))],
+        "populate_transaction_filters": [("", (None,))],
+        "update_transaction_table": [(" (first page)", (None, None, None, None, None, "desc", None, None, None))],
+        "update_search_results": [(" (ranked)", ("market ref", "rank")), (" (recent)", ("market ref", "recent"))],
+    }
+    with server.app_context():
+        timer.run("fetch_transactions (cold)", config.fetch_transactions, rows=size)
+        timer.run("fetch_transactions (warm)", config.fetch_transactions, rows=size)
+        for name, func in recorder.callbacks.items():
+            for label, args in callback_args.get(name, []):
+                timer.run(f"callback {name}{label}", func, *args)
+
+        # The same summary in YNAB_SUMMARY_MODE=client: what the server still does per data version
+        client_recorder = _CallbackRecorder()
+        callbacks.register_callbacks(client_recorder, summary_mode="client")
+        load_summary_data = client_recorder.callbacks["load_summary_data"]
+        timer.run("callback load_summary_data (new version)", load_summary_data, None, None)
+        stored = load_summary_data(None, None)
+        timer.run("callback load_summary_data (stored)", load_summary_data, None, stored)
+
+        from app import display_page
+        timer.run("callback display_page", display_page, "/transactions")
+
+    queue.put({
+        "size": size,
+        "split_ratio": options["split_ratio"],
+        "months": options["months"],
+        "steps": timer.results,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated transaction counts")
+    parser.add_argument("--accounts", type=int, default=8)
+    parser.add_argument("--payees", type=int, default=300)
+    parser.add_argument("--category-groups", type=int, default=10)
+    parser.add_argument("--split-ratio", type=float, default=0.05)
+    parser.add_argument("--months", type=int, default=60)
+    parser.add_argument("--delta", type=int, default=500, help="transactions changed by the incremental sync")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-tracemalloc", dest="trace_memory", action="store_false",
+                        help="skip per-step peak memory tracing (much faster on large sizes)")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    options = {
+        "accounts": args.accounts, "payees": args.payees, "category_groups": args.category_groups,
+        "split_ratio": args.split_ratio, "months": args.months, "delta": args.delta, "seed": args.seed,
+        "trace_memory": args.trace_memory,
+    }
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_size, args=(size, options, queue))
+        proc.start()
+        runs.append(queue.get())
+        proc.join()
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": options,
+        "runs": runs,
+    }
+    output = args.output or os.path.join(
+        "benchmarks", "results", datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
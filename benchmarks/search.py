@@ -0,0 +1,77 @@
+"""
+Transaction search: LIKE scans vs the FTS5 index of data.search.
+
+Builds a synthetic database and times the same searches both ways: a
+`LIKE '%word%'` over transactions.memo and the payee and category names
+("like"), and search_transactions() ranked by BM25 ("ranked") and most
+recent first ("recent"). Words found in many transactions let LIKE stop
+early at its LIMIT; rare or missing words make it read the whole table:
+
+    python -m benchmarks.search --transactions 200000
+    python -m benchmarks.search --transactions 1000000 --repeat 3
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# (label, free-text query); LIKE gets the first word
+QUERIES = (
+    ("common word", "weekly"),
+    ("common prefix", "boo"),
+    ("payee and memo", "market refund"),
+    ("rare word", "217"),
+    ("no match", "zzzz"),
+)
+
+_LIKE = """
+    SELECT t.id FROM transactions t
+    LEFT JOIN payees p ON p.key = t.payee_key
+    LEFT JOIN categories c ON c.key = t.category_key
+    WHERE t.memo LIKE :pattern OR p.name LIKE :pattern OR c.name LIKE :pattern
+    LIMIT :limit
+"""
+
+
+def _time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="ynab-search-bench-"), "bench.db")
+    os.environ["YNAB_DATABASE_URI"] = f"sqlite:///{db_path}"
+    from sqlalchemy import text
+
+    from benchmarks.synthetic import FakeYNABClient, SyntheticBudget
+    from data import data_loader, database, search
+
+    budget = SyntheticBudget(transactions=args.transactions, seed=args.seed)
+    data_loader.sync_all_data(budget.id, client=FakeYNABClient(budget))
+
+    print(f"{args.transactions:,} transactions, median of {args.repeat} runs\n")
+    print(f"{'query':<34} {'like ms':>9} {'ranked ms':>10} {'recent ms':>10} {'hits':>6}")
+    with database.read_engine.connect() as conn:
+        for label, query in QUERIES:
+            params = {"pattern": f"%{query.split()[0]}%", "limit": search.SEARCH_LIMIT}
+            like = _time(lambda: conn.execute(text(_LIKE), params).all(), args.repeat)
+            ranked = _time(lambda: search.search_transactions(query), args.repeat)
+            recent = _time(lambda: search.search_transactions(query, ranked=False), args.repeat)
+            hits = len(search.search_transactions(query))
+            print(f"{label + ' (' + query + ')':<34} {like * 1000:>9.1f} {ranked * 1000:>10.1f} "
+                  f"{recent * 1000:>10.1f} {hits:>6}")
+
+
+if __name__ == "__main__":
+    main()
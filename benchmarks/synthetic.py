@@ -0,0 +1,338 @@
+"""
+Synthetic YNAB budgets for benchmarks.
+
+Builds fake budgets of configurable size out of the same `ynab` SDK model
+classes the API client returns, so they can be fed straight into the
+`store_*` functions or served through FakeYNABClient to `sync_all_data`.
+
+Transactions are generated lazily and deterministically from their index, so
+a budget with millions of them costs almost no memory until it is iterated.
+"""
+import datetime
+import json
+import random
+import uuid
+
+import ynab
+
+PAYEE_WORDS = ["Market", "Coffee", "Gas", "Pharmacy", "Books", "Hardware", "Cinema", "Bakery", "Taxi", "Airline"]
+CATEGORY_WORDS = ["Groceries", "Rent", "Utilities", "Dining", "Travel", "Fuel", "Gifts", "Insurance", "Health", "Fun"]
+MEMO_WORDS = ["weekly", "refund", "birthday", "monthly", "split with friends", "online order", "cash back"]
+ACCOUNT_TYPES = ["checking", "savings", "creditCard", "cash"]
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+class SyntheticTransactions:
+    """
+    Re-iterable, sized collection of TransactionDetail models.
+
+    Transaction `i` is always generated from the same seed, so iterating twice
+    yields identical data without keeping anything in memory.
+    """
+
+    def __init__(self, budget, count, split_ratio, seed, id_prefix="txn"):
+        self.budget = budget
+        self.count = count
+        self.split_ratio = split_ratio
+        self.seed = seed
+        self.id_prefix = id_prefix
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.transaction(i)
+
+    def transaction(self, i):
+        budget = self.budget
+        rng = random.Random(self.seed * 1_000_003 + i)
+        txn_id = f"{self.id_prefix}-{self.seed}-{i:09d}"
+        account = rng.choice(budget.accounts)
+        payee = rng.choice(budget.payees)
+        txn_date = budget.start_date + datetime.timedelta(days=rng.randrange(budget.days))
+        amount = -rng.randint(100, 250_000) * 10 if rng.random() < 0.85 else rng.randint(1_000, 5_000_000) * 10
+
+        subtransactions = []
+        category = rng.choice(budget.categories)
+        category_id = category.id
+        if rng.random() < self.split_ratio:
+            parts = rng.randint(2, 4)
+            remaining = amount
+            for part in range(parts):
+                sub_amount = remaining if part == parts - 1 else int(remaining * rng.uniform(0.2, 0.6)) // 10 * 10
+                remaining -= sub_amount
+                sub_category = rng.choice(budget.categories)
+                subtransactions.append(ynab.SubTransaction.model_construct(
+                    id=f"{txn_id}-s{part}",
+                    transaction_id=txn_id,
+                    amount=sub_amount,
+                    memo=rng.choice(MEMO_WORDS) if rng.random() < 0.3 else None,
+                    payee_id=payee.id,
+                    payee_name=payee.name,
+                    category_id=sub_category.id,
+                    category_name=sub_category.name,
+                    transfer_account_id=None,
+                    transfer_transaction_id=None,
+                    deleted=False,
+                ))
+            category_id = None  # YNAB leaves the parent of a split uncategorized ("Split")
+
+        return ynab.TransactionDetail.model_construct(
+            id=txn_id,
+            var_date=txn_date,
+            amount=amount,
+            memo=rng.choice(MEMO_WORDS) if rng.random() < 0.4 else None,
+            cleared=rng.choice(["cleared", "uncleared", "reconciled"]),
+            approved=rng.random() < 0.95,
+            flag_color=None,
+            flag_name=None,
+            account_id=account.id,
+            payee_id=payee.id,
+            category_id=category_id,
+            transfer_account_id=None,
+            transfer_transaction_id=None,
+            matched_transaction_id=None,
+            import_id=None,
+            import_payee_name=None,
+            import_payee_name_original=None,
+            debt_transaction_type=None,
+            deleted=False,
+            account_name=account.name,
+            payee_name=payee.name,
+            category_name="Split" if subtransactions else category.name,
+            subtransactions=subtransactions,
+        )
+
+
+class SyntheticBudget:
+    """A fake budget: SDK model lists for every entity plus lazy transactions."""
+
+    def __init__(self, accounts=8, payees=300, category_groups=10, categories_per_group=6,
+                 transactions=10_000, split_ratio=0.05, months=36, seed=0):
+        rng = random.Random(seed)
+        self.seed = seed
+        self.id = _uuid(rng)
+        self.end_date = datetime.date.today()
+        self.start_date = (self.end_date - datetime.timedelta(days=months * 30.44)).replace(day=1)
+        self.days = (self.end_date - self.start_date).days + 1
+
+        self.category_groups = []
+        self.categories = []
+        for g in range(category_groups):
+            group_id = _uuid(rng)
+            group_categories = [
+                ynab.Category.model_construct(
+                    id=_uuid(rng),
+                    category_group_id=group_id,
+                    category_group_name=f"Group {g}",
+                    name=f"{rng.choice(CATEGORY_WORDS)} {g}.{c}",
+                    hidden=rng.random() < 0.05,
+                    note=None,
+                    budgeted=0,
+                    activity=0,
+                    balance=0,
+                    deleted=False,
+                )
+                for c in range(categories_per_group)
+            ]
+            self.categories.extend(group_categories)
+            self.category_groups.append(ynab.CategoryGroupWithCategories.model_construct(
+                id=group_id, name=f"Group {g}", hidden=False, deleted=False, categories=group_categories
+            ))
+
+        self.accounts = []
+        for a in range(accounts):
+            balance = rng.randint(-2_000_000, 20_000_000) * 10
+            self.accounts.append(ynab.Account.model_construct(
+                id=_uuid(rng),
+                name=f"Account {a}",
+                type=rng.choice(ACCOUNT_TYPES),
+                on_budget=rng.random() < 0.8,
+                closed=False,
+                note=None,
+                balance=balance,
+                cleared_balance=balance,
+                uncleared_balance=0,
+                transfer_payee_id=None,
+                direct_import_linked=False,
+                direct_import_in_error=False,
+                deleted=False,
+            ))
+
+        self.payees = [
+            ynab.Payee.model_construct(
+                id=_uuid(rng), name=f"{rng.choice(PAYEE_WORDS)} #{p}", transfer_account_id=None, deleted=False
+            )
+            for p in range(payees)
+        ]
+
+        self.months = []
+        month = self.start_date
+        while month <= self.end_date:
+            self.months.append(ynab.MonthDetail.model_construct(
+                month=month,
+                note=None,
+                income=0,
+                budgeted=0,
+                activity=0,
+                to_be_budgeted=0,
+                age_of_money=None,
+                deleted=False,
+                categories=[
+                    ynab.Category.model_construct(
+                        id=cat.id, category_group_id=cat.category_group_id, name=cat.name, hidden=cat.hidden,
+                        budgeted=rng.randint(0, 50_000) * 10, activity=-rng.randint(0, 50_000) * 10,
+                        balance=rng.randint(-10_000, 50_000) * 10, deleted=False,
+                    )
+                    for cat in self.categories
+                ],
+            ))
+            month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+        self.transactions = SyntheticTransactions(self, transactions, split_ratio, seed)
+
+    def budget_detail(self):
+        """The budget as returned by get_budget_by_id (months included, other lists left out)."""
+        return ynab.BudgetDetail.model_construct(
+            id=self.id,
+            name=f"Synthetic budget {self.seed}",
+            last_modified_on=datetime.datetime.now(datetime.timezone.utc),
+            first_month=self.start_date,
+            last_month=self.end_date.replace(day=1),
+            date_format=None,
+            currency_format=None,
+            months=self.months,
+        )
+
+    def delta(self, changed, seed=1):
+        """`changed` new transactions, as an incremental sync would receive them."""
+        return SyntheticTransactions(self, changed, self.transactions.split_ratio, seed, id_prefix="delta")
+
+
+class TransactionsBody:
+    """
+    Readable `{"data": {"transactions": [...], "server_knowledge": N}}` body
+    encoded lazily from transaction models, so FakeYNABClient can serve a
+    TransactionStream without ever holding the whole JSON document.
+    """
+
+    def __init__(self, transactions, server_knowledge):
+        self._pieces = self._encode(transactions, server_knowledge)
+        self._pending = b""
+
+    @staticmethod
+    def _encode(transactions, server_knowledge):
+        yield b'{"data": {"transactions": ['
+        for index, txn in enumerate(transactions):
+            # Generated with model_construct, so enums are plain strings already
+            item = json.dumps(txn.model_dump(by_alias=True, warnings=False), default=str)
+            yield (", " if index else "").encode() + item.encode()
+        yield f'], "server_knowledge": {server_knowledge}}}}}'.encode()
+
+    def read(self, amt=None):
+        while amt is None or len(self._pending) < amt:
+            piece = next(self._pieces, None)
+            if piece is None:
+                break
+            self._pending += piece
+        block, self._pending = (self._pending, b"") if amt is None else (self._pending[:amt], self._pending[amt:])
+        return block
+
+    def close(self):
+        self._pieces.close()
+
+
+class FakeYNABClient:
+    """
+    Stand-in for YNABClient serving a SyntheticBudget.
+
+    The first call for an entity returns everything; calls that pass a
+    `last_knowledge_of_server` get only `delta_transactions` new transactions
+    and no changes to other entities.
+    """
+
+    SERVER_KNOWLEDGE = 100
+
+    def __init__(self, budget, delta_transactions=100):
+        self.budget = budget
+        self.delta_transactions = delta_transactions
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def close(self):
+        pass
+
+    def quota_remaining(self):
+        return 200
+
+    def _knowledge(self, last_knowledge_of_server):
+        return (last_knowledge_of_server or self.SERVER_KNOWLEDGE) + 1
+
+    def get_budget_by_id_delta(self, budget_id, last_knowledge_of_server=None):
+        budget = self.budget.budget_detail()
+        if last_knowledge_of_server is not None:
+            budget.months = []
+        return budget, self._knowledge(last_knowledge_of_server)
+
+    def get_categories_delta(self, budget_id, last_knowledge_of_server=None):
+        groups = [] if last_knowledge_of_server is not None else self.budget.category_groups
+        return groups, self._knowledge(last_knowledge_of_server)
+
+    def get_payees_delta(self, budget_id, last_knowledge_of_server=None):
+        payees = [] if last_knowledge_of_server is not None else self.budget.payees
+        return payees, self._knowledge(last_knowledge_of_server)
+
+    def get_accounts_delta(self, budget_id, last_knowledge_of_server=None):
+        return self.budget.accounts, self._knowledge(last_knowledge_of_server)
+
+    def get_transactions_delta(self, budget_id, last_knowledge_of_server=None):
+        if last_knowledge_of_server is not None:
+            return self.budget.delta(self.delta_transactions, seed=last_knowledge_of_server), \
+                self._knowledge(last_knowledge_of_server)
+        return self.budget.transactions, self._knowledge(last_knowledge_of_server)
+
+    def get_transactions_stream(self, budget_id, last_knowledge_of_server=None):
+        from data.transaction_stream import TransactionStream
+
+        transactions, knowledge = self.get_transactions_delta(budget_id, last_knowledge_of_server)
+        return TransactionStream(TransactionsBody(transactions, knowledge))
+
+
+def write_fixtures(budget, directory, server_knowledge=FakeYNABClient.SERVER_KNOWLEDGE):
+    """
+    Save a SyntheticBudget as recorded API responses in a data.ynab_fixtures
+    FixtureStore, so sync_all_data can run against a ReplayServer offline.
+    """
+    from data.ynab_fixtures import FixtureStore
+
+    store = FixtureStore(directory)
+
+    def dump(path, payload):
+        body = json.dumps({"data": dict(payload, server_knowledge=server_knowledge)}, default=str)
+        store.save("GET", path, "", 200, {"Content-Type": "application/json"}, body)
+
+    def plain(model):
+        # Generated with model_construct, so enums are plain strings already
+        return model.model_dump(by_alias=True, warnings=False)
+
+    detail = budget.budget_detail()
+    detail_dict = plain(detail)
+    for name in ("accounts", "payees", "category_groups", "categories", "transactions",
+                 "subtransactions", "payee_locations", "scheduled_transactions", "scheduled_subtransactions"):
+        detail_dict.setdefault(name, [])
+        if detail_dict[name] is None:
+            detail_dict[name] = []
+    dump(f"/budgets/{budget.id}", {"budget": detail_dict})
+    dump(f"/budgets/{budget.id}/categories", {"category_groups": [plain(g) for g in budget.category_groups]})
+    dump(f"/budgets/{budget.id}/payees", {"payees": [plain(p) for p in budget.payees]})
+    dump(f"/budgets/{budget.id}/accounts", {"accounts": [plain(a) for a in budget.accounts]})
+    dump(f"/budgets/{budget.id}/transactions", {"transactions": [plain(t) for t in budget.transactions]})
+    return store
@@ -0,0 +1,86 @@
+"""
+Peak memory of reading a transactions response: SDK models vs TransactionStream.
+
+For each size a synthetic transactions body is encoded once, then read two
+ways while tracemalloc records the peak: the SDK path ("sdk") holds the raw
+body and deserializes all of it into TransactionsResponse models, the way
+get_transactions_delta() does; the streaming path ("stream") reads the body
+in blocks through a TransactionStream and consumes it in bulk-writer batches,
+the way sync_all_data stages it. Each batch is turned into rows and dropped,
+so only the parser's buffer and one batch are alive at a time:
+
+    python -m benchmarks.transaction_stream --sizes 5000 20000 50000
+"""
+import argparse
+import time
+import tracemalloc
+
+import ynab
+
+from benchmarks.synthetic import SyntheticBudget, TransactionsBody
+from data.data_loader import _subtransaction_rows, _transaction_rows
+from data.transaction_stream import TransactionStream
+
+
+class _Body:
+    """Readable view of an already encoded body (stands in for the HTTP response)."""
+
+    def __init__(self, data):
+        self._data = memoryview(data)
+        self._pos = 0
+
+    def read(self, amt=None):
+        end = len(self._data) if amt is None else self._pos + amt
+        block = bytes(self._data[self._pos:end])
+        self._pos = min(end, len(self._data))
+        return block
+
+    def close(self):
+        pass
+
+
+def _sdk(data):
+    response = ynab.TransactionsResponse.from_json(_Body(data).read().decode("utf-8"))
+    return len(list(_transaction_rows(response.data.transactions)))
+
+
+def _stream(data):
+    rows = 0
+    with TransactionStream(_Body(data)) as stream:
+        for batch in stream.batches():
+            rows += len(list(_transaction_rows(batch)))
+            list(_subtransaction_rows(batch))
+    return rows
+
+
+def _measure(read, data):
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = read(data)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rows, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5_000, 20_000, 50_000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'transactions':>12} {'body MB':>8} {'sdk peak MB':>12} {'stream peak MB':>15} "
+          f"{'sdk s':>7} {'stream s':>9}")
+    for size in args.sizes:
+        budget = SyntheticBudget(transactions=size, seed=args.seed)
+        data = TransactionsBody(budget.transactions, server_knowledge=1).read()
+
+        sdk_rows, sdk_seconds, sdk_peak = _measure(_sdk, data)
+        stream_rows, stream_seconds, stream_peak = _measure(_stream, data)
+        assert sdk_rows == stream_rows == size
+        print(f"{size:>12,} {len(data) / 2**20:>8.1f} {sdk_peak / 2**20:>12.1f} {stream_peak / 2**20:>15.1f} "
+              f"{sdk_seconds:>7.2f} {stream_seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,43 @@
+# Standard Library Imports
+import datetime
+
 # Third-Party Imports
 import pandas as pd
 import plotly.express as px
-from dash import Input, Output
-from sqlalchemy import create_engine
+from dash import ClientsideFunction, Input, Output, State, no_update
 
-from config import fetch_accounts, fetch_transactions
+from config import SUMMARY_MODE, fetch_accounts, fetch_category_totals, get_data_version
+from profiling import profiled
 
 # Local Application Imports
-from data import database
-
-# Connect to the database
-engine = create_engine(database.DATABASE_URI)
-
-
-def register_callbacks(app):
+from data import aggregates, search, transaction_pages, trend
+from data.money import MILLIUNITS_PER_UNIT, with_currency
+
+# Categories in the summary graph
+SUMMARY_TOP_CATEGORIES = 10
+
+
+def summary_store_data(totals, version):
+    """
+    Account x category totals as sent to the browser for the clientside
+    summary graph: account ids and category names once each, then one
+    (account index, category index, total in milliunits) triple per pair.
+    """
+    account_codes, accounts = pd.factorize(totals["account_id"])
+    category_codes, categories = pd.factorize(totals["category_name"], use_na_sentinel=False)
+    return {
+        "version": version,
+        "accounts": accounts.tolist(),
+        "categories": [None if pd.isna(name) else name for name in categories],
+        "account": account_codes.tolist(),
+        "category": category_codes.tolist(),
+        "total": totals["total"].astype("int64").tolist(),
+        "scale": MILLIUNITS_PER_UNIT,
+        "limit": SUMMARY_TOP_CATEGORIES,
+    }
+
+
+def register_callbacks(app, summary_mode=SUMMARY_MODE):
     @app.callback(
         Output("account_dropdown", "options"),
         Input("account_dropdown", "id"),  # Dummy input to trigger on page load
@@ -38,77 +62,146 @@ def register_callbacks(app):
 
     @app.callback(
         Output("transaction-graph", "figure"),
-        Input("transaction-graph", "id"),  # Dummy input to trigger on page load
+        Input("trend-date-range", "start_date"),
+        Input("trend-date-range", "end_date"),
     )
-    def update_transaction_graph(_):
-        df_all_transactions = fetch_transactions()  # get full cached DataFrame
-
-        if df_all_transactions is None or df_all_transactions.empty:
-            return px.line(title="No Data Available")
-
-        # Ensure 'date' column in the datetime format for proper grouping/sorting
-        df_all_transactions["date"] = pd.to_datetime(df_all_transactions["date"])
-
-        # Perform grouping and sum with pandas
-        df_grouped = df_all_transactions.groupby("date")["amount"].sum().reset_index()
-        df_grouped = df_grouped.rename(columns={"amount": "total"}).sort_values(
-            by="date"
+    @profiled
+    def update_transaction_graph(start_date, end_date):
+        # Bucketed and downsampled in the data layer, so the figure stays small
+        # no matter how much history there is, and no shared DataFrame is touched
+        df_grouped = trend.get_transaction_trend(
+            start_date=datetime.date.fromisoformat(start_date[:10]) if start_date else None,
+            end_date=datetime.date.fromisoformat(end_date[:10]) if end_date else None,
         )
 
         if df_grouped.empty:
             return px.line(title="No Transaction Data to Display Trends")
 
-        fig = px.line(df_grouped, x="date", y="total", title="Transaction Trends")
+        fig = px.line(with_currency(df_grouped, ["total"]), x="date", y="total", title="Transaction Trends")
         return fig
 
-    @app.callback(Output("summary-graph", "figure"), Input("account_dropdown", "value"))
-    def update_summary_graph(selected_account):
-        base_query_select = """
-            SELECT
-                c.name AS category_name, 
-                SUM(t.amount) as total
-            FROM
-                transactions t
-            LEFT JOIN
-                categories c ON t.category_id = c.id
-        """
-        group_order_limit = """
-            GROUP BY
-                c.name
-            ORDER BY
-                total DESC
-            LIMIT 10
-        """
-
-        # if transactions is None or transactions.empty:
-        #     return px.bar(title="No Data Available")
-
-        if selected_account and selected_account != "all":
-            query = f"""
-            {base_query_select}
-            WHERE
-                t.account_id = "{selected_account}"
-            {group_order_limit}
-            """
-        else:
-            query = f"""
-            {base_query_select}
-            {group_order_limit}
-            """
-        df_summary = pd.read_sql(query, engine)
-
-        if df_summary.empty:
-            title = "No Data for Summary Graph"
+    if summary_mode == "client":
+        @app.callback(
+            Output("summary-data", "data"),
+            Input("summary-data", "id"),  # Dummy input to trigger on page load
+            State("summary-data", "data"),
+        )
+        @profiled
+        def load_summary_data(_, stored):
+            # The browser keeps the totals (local storage); they are only sent
+            # again once a sync has moved the data version
+            version = get_data_version()
+            if stored and stored.get("version") == version:
+                return no_update
+            return summary_store_data(fetch_category_totals(), version)
+
+        # Filtering by account, top-10 ranking and the figure run in the
+        # browser (assets/summary.js); dropdown changes never reach the server
+        app.clientside_callback(
+            ClientsideFunction(namespace="summary", function_name="figure"),
+            Output("summary-graph", "figure"),
+            Input("account_dropdown", "value"),
+            Input("summary-data", "data"),
+        )
+    else:
+        @app.callback(Output("summary-graph", "figure"), Input("account_dropdown", "value"))
+        @profiled
+        def update_summary_graph(selected_account):
+            # Read the pre-aggregated account x category x month cube rather than
+            # grouping the whole transactions table on every dropdown change
+            account_id = selected_account if selected_account and selected_account != "all" else None
+            df_summary = aggregates.get_category_summary(account_id=account_id, limit=SUMMARY_TOP_CATEGORIES)
+
+            if df_summary.empty:
+                title = "No Data for Summary Graph"
+                if selected_account and selected_account != "all":
+                    # You might want to fetch account name to make title more specific
+                    title += f" for Selected Account"
+                return px.bar(title=title)
+
+            title = "Top 10 Spending Categories"
             if selected_account and selected_account != "all":
-                # You might want to fetch account name to make title more specific
-                title += f" for Selected Account"
-            return px.bar(title=title)
+                # Ideally, fetch account name from `accounts` table using `selected_account` ID
+                # For now, just indicating a filter is active.
+                title += " (Filtered by Account)"
 
-        title = "Top 10 Spending Categories"
-        if selected_account and selected_account != "all":
-            # Ideally, fetch account name from `accounts` table using `selected_account` ID
-            # For now, just indicating a filter is active.
-            title += " (Filtered by Account)"
+            fig = px.bar(with_currency(df_summary, ["total"]), x="category_name", y="total", title=title)
+            return fig
 
-        fig = px.bar(df_summary, x="category_name", y="total", title=title)
-        return fig
+    @app.callback(
+        Output("txn-account-filter", "options"),
+        Output("txn-category-filter", "options"),
+        Output("txn-payee-filter", "options"),
+        Input("txn-account-filter", "id"),  # Dummy input to trigger on page load
+    )
+    def populate_transaction_filters(_):
+        choices = transaction_pages.get_filter_choices()
+        return tuple(
+            [{"label": name, "value": id_} for id_, name in zip(choices[kind]["id"], choices[kind]["name"])]
+            for kind in ("accounts", "categories", "payees")
+        )
+
+    @app.callback(
+        Output("txn-table", "data"),
+        Output("txn-page-state", "data"),
+        Output("txn-previous", "disabled"),
+        Output("txn-next", "disabled"),
+        Output("txn-page-label", "children"),
+        Input("txn-account-filter", "value"),
+        Input("txn-category-filter", "value"),
+        Input("txn-payee-filter", "value"),
+        Input("txn-date-range", "start_date"),
+        Input("txn-date-range", "end_date"),
+        Input("txn-sort", "value"),
+        Input("txn-previous", "n_clicks"),
+        Input("txn-next", "n_clicks"),
+        State("txn-page-state", "data"),
+    )
+    @profiled
+    def update_transaction_table(account_id, category_id, payee_id, start_date, end_date, sort,
+                                 previous_clicks, next_clicks, state):
+        # One page at a time, fetched by keyset from the cursors of the page on
+        # screen; a click is told from a filter change by the counts in the store
+        filters = {
+            "account_id": account_id,
+            "category_id": category_id,
+            "payee_id": payee_id,
+            "start_date": datetime.date.fromisoformat(start_date[:10]) if start_date else None,
+            "end_date": datetime.date.fromisoformat(end_date[:10]) if end_date else None,
+            "descending": sort != "asc",
+        }
+        previous_clicks, next_clicks = previous_clicks or 0, next_clicks or 0
+        key = [account_id, category_id, payee_id, start_date, end_date, sort]
+        state = state if state and state["key"] == key else None
+
+        if state and next_clicks > state["next_clicks"] and state["last"]:
+            page, number = transaction_pages.get_transaction_page(after=state["last"], **filters), state["page"] + 1
+        elif state and previous_clicks > state["previous_clicks"] and state["first"]:
+            page, number = transaction_pages.get_transaction_page(before=state["first"], **filters), state["page"] - 1
+        else:
+            page, number = transaction_pages.get_transaction_page(**filters), 1
+
+        rows = with_currency(page.rows, ["amount"])
+        if not rows.empty:
+            rows["date"] = rows["date"].dt.strftime("%Y-%m-%d")
+        state = {
+            "key": key, "first": page.first, "last": page.last, "page": number,
+            "previous_clicks": previous_clicks, "next_clicks": next_clicks,
+        }
+        label = f"Page {number}" if not rows.empty else "No transactions"
+        return rows.to_dict("records"), state, not page.has_previous, not page.has_next, label
+
+    @app.callback(
+        Output("txn-search-results", "data"),
+        Input("txn-search", "value"),
+        Input("txn-search-order", "value"),
+    )
+    @profiled
+    def update_search_results(query, order):
+        # Answered from the FTS5 index, never a LIKE scan of the transactions
+        results = search.search_transactions(query, ranked=order != "recent")
+        if results.empty:
+            return []
+        results = with_currency(results, ["amount"])
+        results["date"] = results["date"].dt.strftime("%Y-%m-%d")
+        return results.drop(columns=["rank"]).to_dict("records")
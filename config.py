@@ -1,34 +1,138 @@
 # Third-Party Imports
-from data import database
-from sqlalchemy import create_engine
+import os
+import threading
+
+import metrics
+from data import database, frames
+from data.aggregates import get_account_category_totals
+from data.frames import DEFAULT_TRANSACTION_COLUMNS
+from sqlalchemy import text
 import pandas as pd
 from flask_caching import Cache
 
+# "memory": each process memoizes DataFrames in its own SimpleCache.
+# "shared": all workers on the host read memory-mapped snapshots from CACHE_DIR.
+CACHE_BACKEND = os.environ.get("YNAB_CACHE_BACKEND", "memory")
+CACHE_DIR = os.environ.get("YNAB_CACHE_DIR", os.path.join("data", "cache"))
+
+# "server": every account_dropdown change rebuilds the summary graph on the server.
+# "client": the browser receives the account x category totals once per data
+# version (see fetch_category_totals) and filters and ranks them itself.
+SUMMARY_MODE = os.environ.get("YNAB_SUMMARY_MODE", "server")
+
 # Create a cache instance
 cache = Cache()
+snapshot_cache = None
+
+# Data version whose DataFrames this process currently holds
+_cached_version = None
+
+# Set by the _query_* loaders so fetch_* can tell a cache hit from a miss
+_lookup = threading.local()
 
 
 def init_cache(app):
     """Call this function in the main app file to initialize caching."""
-    cache.init_app(app, config={"CACHE_TYPE": "SimpleCache"})  # Note: SimpleCache in newer versions
+    global snapshot_cache
+    # No timeout: entries are keyed by data version and dropped when it changes
+    cache.init_app(app, config={"CACHE_TYPE": "SimpleCache", "CACHE_DEFAULT_TIMEOUT": 0})  # Note: SimpleCache in newer versions
+    if CACHE_BACKEND == "shared":
+        from data.snapshot_cache import SnapshotCache
+
+        snapshot_cache = SnapshotCache(CACHE_DIR)
+
+
+def get_data_version():
+    """Read the data version the sync pipeline bumps on every commit (0 before the first sync)."""
+    with database.read_engine.connect() as conn:
+        version = conn.execute(text("SELECT version FROM data_version WHERE id = 1")).scalar()
+    return version or 0
+
+
+def current_data_version():
+    """Return the data version, evicting DataFrames cached for an older one."""
+    global _cached_version
+    version = get_data_version()
+    if version != _cached_version:
+        cache.delete_memoized(_load_transactions)
+        cache.delete_memoized(_load_accounts)
+        cache.delete_memoized(_load_category_totals)
+        _cached_version = version
+    return version
+
+
+# Column types of the cached accounts DataFrame (transactions use data.frames).
+# Amounts stay int64 milliunits; convert with data.money.to_currency only when
+# displaying them.
+ACCOUNT_DTYPES = {
+    "balance": "int64", "cleared_balance": "int64", "uncleared_balance": "int64",
+    "on_budget": "bool", "closed": "bool", "deleted": "bool",
+}
+
+
+def _query_transactions(columns=DEFAULT_TRANSACTION_COLUMNS):
+    _lookup.missed = True
+    return frames.load_transactions(columns)
 
 
-def fetch_transactions():
-    @cache.memoize(timeout=300)  # Cache data for 5 minutes
-    def get_transactions():
-        engine = create_engine(database.DATABASE_URI)
-        df = pd.read_sql("SELECT * FROM transactions", engine)
-        return df
+def _query_accounts():
+    _lookup.missed = True
+    return pd.read_sql("SELECT * FROM accounts", database.read_engine, dtype=ACCOUNT_DTYPES)
 
-    return get_transactions()
+
+def _query_category_totals():
+    _lookup.missed = True
+    return get_account_category_totals()
+
+
+def _counted(name, fetch):
+    """Run `fetch` and count it as a hit or miss of the `name` cache."""
+    _lookup.missed = False
+    df = fetch()
+    metrics.CACHE_REQUESTS.inc(cache=name, result="miss" if _lookup.missed else "hit")
+    return df
+
+
+@cache.memoize()
+def _load_transactions(data_version, columns):
+    return _query_transactions(columns)
+
+
+@cache.memoize()
+def _load_accounts(data_version):
+    return _query_accounts()
+
+
+@cache.memoize()
+def _load_category_totals(data_version):
+    return _query_category_totals()
+
+
+def fetch_transactions(columns=DEFAULT_TRANSACTION_COLUMNS):
+    """
+    All transactions with only `columns` (see data.frames for their compact
+    dtypes), reloaded only after a sync has committed new data.
+    """
+    columns = tuple(columns)
+    if snapshot_cache is not None:
+        return _counted("transactions", lambda: snapshot_cache.get(
+            f"transactions-{frames.columns_key(columns)}", get_data_version(),
+            lambda: _query_transactions(columns)
+        ))
+    return _counted("transactions", lambda: _load_transactions(current_data_version(), columns))
 
 
 def fetch_accounts():
-    @cache.memoize(timeout=300)  # Cache data for 5 minutes
-    def get_accounts():
-        engine = create_engine(database.DATABASE_URI)
-        df = pd.read_sql("SELECT * FROM accounts", engine)
-        print(f"Accounts query returned {len(df)} rows")  # Debug print
-        return df
-
-    return get_accounts()
+    """All accounts, reloaded only after a sync has committed new data."""
+    if snapshot_cache is not None:
+        return _counted("accounts", lambda: snapshot_cache.get("accounts", get_data_version(), _query_accounts))
+    return _counted("accounts", lambda: _load_accounts(current_data_version()))
+
+
+def fetch_category_totals():
+    """Account x category totals from the cube, reloaded only after a sync has committed new data."""
+    if snapshot_cache is not None:
+        return _counted("category_totals", lambda: snapshot_cache.get(
+            "category-totals", get_data_version(), _query_category_totals
+        ))
+    return _counted("category_totals", lambda: _load_category_totals(current_data_version()))
@@ -0,0 +1,137 @@
+# aggregates.py
+import datetime
+
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from data import database
+from data.bulk_writer import LOOKUP_CHUNK_SIZE, chunked
+
+_CELL_DELETE = text("""
+    DELETE FROM category_account_month
+    WHERE account_key = :account_key AND month = :month
+""")
+
+_CELL_INSERT = text("""
+    INSERT INTO category_account_month
+        (account_key, category_key, month, total, count, created_at, updated_at)
+    SELECT
+        account_key, category_key, :month, SUM(amount), COUNT(*),
+        CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+    FROM ledger_lines
+    WHERE account_key = :account_key AND date >= :start AND date < :end
+    GROUP BY category_key
+""")
+
+
+def month_of(date):
+    """Cube month key ('YYYY-MM') for a date or ISO date string."""
+    return str(date)[:7]
+
+
+def _month_bounds(month):
+    year, mon = (int(part) for part in month.split("-"))
+    start = datetime.date(year, mon, 1)
+    end = datetime.date(year + mon // 12, mon % 12 + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def transaction_cells(session, transaction_ids):
+    """(account_key, month) cells currently holding the given transactions."""
+    cells = set()
+    query = text(
+        "SELECT account_key, date FROM transactions WHERE id IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+    for chunk in chunked(transaction_ids, LOOKUP_CHUNK_SIZE):
+        for account_key, date in session.execute(query, {"ids": chunk}):
+            cells.add((account_key, month_of(date)))
+    return cells
+
+
+def refresh_cube(session, cells):
+    """Recompute the given (account_key, month) cells from the ledger lines (refresh those first)."""
+    params = []
+    for account_key, month in cells:
+        start, end = _month_bounds(month)
+        params.append({"account_key": account_key, "month": month, "start": start, "end": end})
+    if not params:
+        return 0
+    session.execute(_CELL_DELETE, params)
+    session.execute(_CELL_INSERT, params)
+    return len(params)
+
+
+def rebuild_cube(session):
+    """Recompute the whole cube, e.g. after a full resync or on an existing database."""
+    session.execute(text("DELETE FROM category_account_month"))
+    session.execute(text("""
+        INSERT INTO category_account_month
+            (account_key, category_key, month, total, count, created_at, updated_at)
+        SELECT
+            account_key, category_key, substr(date, 1, 7), SUM(amount), COUNT(*),
+            CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+        FROM ledger_lines
+        GROUP BY account_key, category_key, substr(date, 1, 7)
+    """))
+
+
+def get_category_summary(account_id=None, start_month=None, end_month=None, limit=10):
+    """
+    Top categories by total for an account (None for all) and an inclusive
+    'YYYY-MM' month window, read from the cube instead of the transactions table.
+    Totals are integer milliunits.
+    """
+    conditions = []
+    params = {"limit": limit}
+    if account_id:
+        conditions.append("cam.account_key = (SELECT key FROM accounts WHERE id = :account_id)")
+        params["account_id"] = account_id
+    if start_month:
+        conditions.append("cam.month >= :start_month")
+        params["start_month"] = start_month
+    if end_month:
+        conditions.append("cam.month <= :end_month")
+        params["end_month"] = end_month
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    query = f"""
+        SELECT
+            c.name AS category_name,
+            SUM(cam.total) AS total
+        FROM
+            category_account_month cam
+        LEFT JOIN
+            categories c ON cam.category_key = c.key
+        {where}
+        GROUP BY
+            c.name
+        ORDER BY
+            total DESC
+        LIMIT :limit
+    """
+    with database.read_engine.connect() as conn:
+        return pd.read_sql(text(query), conn, params=params)
+
+
+def get_account_category_totals():
+    """
+    All-time total of every (account, category) pair in the cube, as a
+    DataFrame of account_id, category_name and total (integer milliunits).
+    Summing it over the accounts of interest gives get_category_summary().
+    """
+    query = """
+        SELECT
+            a.id AS account_id,
+            c.name AS category_name,
+            SUM(cam.total) AS total
+        FROM
+            category_account_month cam
+        JOIN
+            accounts a ON a.key = cam.account_key
+        LEFT JOIN
+            categories c ON cam.category_key = c.key
+        GROUP BY
+            cam.account_key, c.name
+    """
+    with database.read_engine.connect() as conn:
+        return pd.read_sql(text(query), conn)
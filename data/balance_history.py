@@ -0,0 +1,149 @@
+# balance_history.py
+"""
+Daily account balances reconstructed from transactions.
+
+An account's balance at the end of day d is its current balance minus
+everything dated after d. Daily net changes are summed in SQL, laid out on a
+gap-free calendar per account, and turned into balances with one reversed
+cumulative sum anchored at accounts.balance (cleared amounts likewise at
+cleared_balance). A change dated D only moves the balances from D on, so
+after a sync just that suffix of each touched account is recomputed.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from data.bulk_writer import LOOKUP_CHUNK_SIZE, chunked, upsert_rows
+from data.database import AccountBalanceHistory
+
+# Statuses counted in an account's cleared balance
+CLEARED_STATUSES = ("cleared", "reconciled")
+
+# Each account's series starts on the first day of its first month in the cube
+# (a much smaller table than transactions)
+_FIRST_MONTHS = text(
+    "SELECT account_key, MIN(month) FROM category_account_month GROUP BY account_key"
+)
+
+# Last day already in the history (today's row may be a mid-day snapshot)
+_RESUME_DATES = text(
+    "SELECT account_key, MAX(date) FROM account_balance_history WHERE date < :today GROUP BY account_key"
+)
+
+_ANCHORS = text(
+    "SELECT key, id, balance, cleared_balance FROM accounts WHERE key IN :keys"
+).bindparams(bindparam("keys", expanding=True))
+
+_DAILY_CHANGES = text(f"""
+    SELECT account_key, date, SUM(amount),
+           SUM(CASE WHEN cleared IN ({", ".join(f"'{status}'" for status in CLEARED_STATUSES)})
+                    THEN amount ELSE 0 END)
+    FROM transactions
+    WHERE date >= :start AND account_key IN :keys
+    GROUP BY account_key, date
+""").bindparams(bindparam("keys", expanding=True))
+
+_DELETE_SUFFIX = text(
+    "DELETE FROM account_balance_history WHERE account_key = :account_key AND date >= :since"
+)
+
+
+def _calendar(since, end):
+    """One row per account and day from the account's `since` date through `end`."""
+    keys = np.array(list(since), dtype="int64")
+    starts = np.array([since[key] for key in since], dtype="datetime64[D]")
+    lengths = np.maximum((np.datetime64(end, "D") - starts).astype("int64") + 1, 0)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return pd.DataFrame({
+        "account_key": np.repeat(keys, lengths),
+        "date": np.repeat(starts, lengths) + offsets,
+    })
+
+
+def _daily_balances(session, since):
+    """DataFrame of history rows for every account in `since` ({account_key: first date to compute})."""
+    keys = list(since)
+    today = datetime.date.today()
+    last = session.execute(text("SELECT MAX(date) FROM transactions")).scalar()
+    end = max(today, datetime.date.fromisoformat(str(last))) if last else today
+
+    anchors = pd.DataFrame(
+        [row for chunk in chunked(keys, LOOKUP_CHUNK_SIZE) for row in session.execute(_ANCHORS, {"keys": chunk})],
+        columns=["account_key", "account_id", "balance", "cleared_balance"],
+    ).set_index("account_key")
+    since = {key: since[key] for key in keys if key in anchors.index}
+    if not since:
+        return None
+
+    changes = pd.DataFrame(
+        [
+            row for chunk in chunked(list(since), LOOKUP_CHUNK_SIZE)
+            for row in session.execute(_DAILY_CHANGES, {"start": min(since.values()).isoformat(), "keys": chunk})
+        ],
+        columns=["account_key", "date", "amount", "cleared_amount"],
+    )
+    changes["date"] = pd.to_datetime(changes["date"]).astype("datetime64[s]")
+
+    grid = _calendar(since, end)
+    grid["date"] = grid["date"].astype("datetime64[s]")
+    grid = grid.merge(changes, on=["account_key", "date"], how="left")
+    grid[["amount", "cleared_amount"]] = grid[["amount", "cleared_amount"]].fillna(0).astype("int64")
+
+    # Everything dated after each day: a reversed running total per account, minus the day itself
+    from_day = grid[::-1].groupby("account_key")[["amount", "cleared_amount"]].cumsum()[::-1]
+    after = from_day - grid[["amount", "cleared_amount"]]
+
+    anchor = anchors.loc[grid["account_key"]].reset_index(drop=True)
+    grid["account_id"] = anchor["account_id"]
+    grid["balance"] = anchor["balance"] - after["amount"]
+    grid["cleared_balance"] = anchor["cleared_balance"] - after["cleared_amount"]
+    grid["uncleared_balance"] = grid["balance"] - grid["cleared_balance"]
+    grid["date"] = grid["date"].dt.date
+    return grid[["account_id", "account_key", "date", "balance", "cleared_balance", "uncleared_balance"]]
+
+
+def _first_days(session):
+    return {key: datetime.date.fromisoformat(f"{month}-01") for key, month in session.execute(_FIRST_MONTHS)}
+
+
+def _recompute(session, since):
+    """Replace the history of each account in `since` from its date on. Returns rows written."""
+    balances = _daily_balances(session, since) if since else None
+    if balances is None:
+        return 0
+    session.execute(_DELETE_SUFFIX, [
+        {"account_key": key, "since": date.isoformat()} for key, date in since.items()
+    ])
+    return upsert_rows(session, AccountBalanceHistory, balances.to_dict("records"),
+                       conflict_columns=["account_id", "date"])
+
+
+def refresh_balance_history(session, cells=()):
+    """
+    Bring the daily history up to date after transactions changed in the given
+    (account_key, 'YYYY-MM') cube cells (refresh those cells first).
+
+    Each touched account is recomputed from the first day of its earliest
+    touched month; every other account is only extended from its last stored
+    day through today, and accounts without any history get all of it.
+    """
+    since = _first_days(session)
+    today = datetime.date.today()
+    for key, last in session.execute(_RESUME_DATES, {"today": today.isoformat()}):
+        if key in since:
+            since[key] = max(since[key], datetime.date.fromisoformat(str(last)))
+    for key, month in cells:
+        if key in since:
+            since[key] = min(since[key], datetime.date.fromisoformat(f"{month}-01"))
+    return _recompute(session, since)
+
+
+def rebuild_balance_history(session):
+    """
+    Recompute every account's full daily history, e.g. after a full resync or
+    on an existing database (rebuild the cube first).
+    """
+    return _recompute(session, _first_days(session))
+
@@ -0,0 +1,56 @@
+# bulk_writer.py
+from itertools import islice
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# Rows sent to the database per executemany() call
+BULK_CHUNK_SIZE = 5000
+
+# Maximum ids per IN (...) lookup, well under SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 900
+
+
+def chunked(iterable, size):
+    """Yield lists of at most `size` items from any iterable without materializing it"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def upsert_rows(session, model, rows, conflict_columns=None, chunk_size=None):
+    """
+    Insert or update rows in batches with SQLite `INSERT ... ON CONFLICT DO UPDATE`.
+
+    `model` is a mapped class or a Table and `rows` an iterable of dicts that all
+    share the same keys. Conflicts are detected on `conflict_columns` (the primary
+    key by default); every other supplied column is overwritten, except
+    `created_at` which keeps the value from the first insert. Each chunk is sent
+    as a single executemany() call, so no per-row SELECT is issued like
+    `session.merge()` does. Returns the number of rows written.
+    """
+    table = getattr(model, "__table__", model)
+    if conflict_columns is None:
+        conflict_columns = [column.name for column in table.primary_key]
+
+    written = 0
+    for chunk in chunked(rows, chunk_size or BULK_CHUNK_SIZE):
+        stmt = sqlite_insert(table)
+        update_columns = {
+            name: stmt.excluded[name]
+            for name in chunk[0]
+            if name not in conflict_columns and name != "created_at"
+        }
+        if "updated_at" in table.c and "updated_at" not in update_columns:
+            update_columns["updated_at"] = stmt.excluded["updated_at"]
+
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(index_elements=conflict_columns, set_=update_columns)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+
+        session.execute(stmt, chunk)
+        written += len(chunk)
+    return written
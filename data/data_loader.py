@@ -1,16 +1,27 @@
 # data_loader.py
 from data.database import (
-    SessionLocal, Transaction, Account, Category, Payee,
-    SubTransaction, AccountBalanceHistory, Budget, MonthBudget
+    SessionLocal, ReadSessionLocal, StagingSessionLocal, Transaction, Account, Category, Payee,
+    SubTransaction, AccountBalanceHistory, Budget, MonthBudget, SyncState, DataVersion
 )
+from data.aggregates import refresh_cube, transaction_cells
+from data.balance_history import refresh_balance_history
+from data.ledger import refresh_ledger_lines
+from data.search import refresh_renamed, refresh_search_index, remove_from_search_index, renamed_keys
+from data.bulk_writer import BULK_CHUNK_SIZE, LOOKUP_CHUNK_SIZE, chunked, upsert_rows
+from data.dimensions import keyed_rows
+from data.migrations import run_migrations
+from data import staging
+from sqlalchemy import bindparam, text
+from collections import defaultdict
 import datetime
-from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager, nullcontext
 
 
 @contextmanager
-def get_db_session():
+def get_db_session(session_factory=SessionLocal):
     """Provide a transactional scope around a series of operations."""
-    session = SessionLocal()
+    session = session_factory()
     try:
         yield session
         session.commit()
@@ -21,287 +32,479 @@ def get_db_session():
         session.close()
 
 
-def store_transactions(transactions):
-    """Store transactions from YNAB API into the database"""
+@contextmanager
+def use_session(session=None):
+    """Reuse the caller's session, or open a new transactional scope if none is given."""
+    if session is not None:
+        yield session
+    else:
+        with get_db_session() as new_session:
+            yield new_session
+
+
+def get_server_knowledge(budget_id, entity):
+    """Return the last stored server_knowledge for an entity type, or None if never synced"""
     with get_db_session() as session:
+        state = session.get(SyncState, (budget_id, entity))
+        return state.server_knowledge if state else None
+
+
+def save_server_knowledge(budget_id, entity, server_knowledge, session=None):
+    """Remember the server_knowledge returned with the data that was just stored"""
+    with use_session(session) as session:
+        session.merge(SyncState(
+            budget_id=budget_id,
+            entity=entity,
+            server_knowledge=server_knowledge
+        ))
+
+
+def bump_data_version(session=None):
+    """Advance the data version so cached dashboard data is reloaded once this session commits"""
+    with use_session(session) as session:
+        state = session.get(DataVersion, 1)
+        if state is None:
+            session.add(DataVersion(id=1, version=1))
+        else:
+            state.version += 1
+
+
+def delete_transactions(transaction_ids, session=None):
+    """Remove transactions (and their subtransactions) that YNAB reported as deleted"""
+    transaction_ids = list(transaction_ids)
+    if not transaction_ids:
+        return
+    with use_session(session) as session:
+        cells = transaction_cells(session, transaction_ids)
+        remove_from_search_index(session, transaction_ids)
+        for chunk in chunked(transaction_ids, LOOKUP_CHUNK_SIZE):
+            session.query(SubTransaction).filter(
+                SubTransaction.transaction_id.in_(chunk)
+            ).delete(synchronize_session=False)
+            session.query(Transaction).filter(
+                Transaction.id.in_(chunk)
+            ).delete(synchronize_session=False)
+        refresh_ledger_lines(session, transaction_ids)
+        refresh_cube(session, cells)
+        refresh_balance_history(session, cells)
+
+
+def delete_stale_subtransactions(transaction_ids, kept_ids, session=None):
+    """Remove split parts of the given transactions that are not in `kept_ids` (e.g. after an un-split)"""
+    kept_ids = set(kept_ids)
+    with use_session(session) as session:
+        for chunk in chunked(transaction_ids, LOOKUP_CHUNK_SIZE):
+            stale = [
+                sub_id for sub_id, in session.query(SubTransaction.id).filter(SubTransaction.transaction_id.in_(chunk))
+                if sub_id not in kept_ids
+            ]
+            if not stale:
+                continue
+            session.query(SubTransaction).filter(
+                SubTransaction.id.in_(stale)
+            ).delete(synchronize_session=False)
+
+
+def _store_rows(session, model, rows, **kwargs):
+    """upsert_rows() with the rows' dimension keys resolved first"""
+    return upsert_rows(session, model, keyed_rows(session, model, rows), **kwargs)
+
+
+def _transaction_rows(transactions):
+    return (
+        {
+            'id': txn.id,
+            'date': txn.var_date,
+            'amount': txn.amount,
+            'memo': txn.memo,
+            'cleared': txn.cleared,
+            'approved': txn.approved,
+            'account_id': txn.account_id,
+            'payee_id': txn.payee_id,
+            'category_id': txn.category_id,
+        }
+        for txn in transactions
+    )
+
+
+def _subtransaction_rows(transactions):
+    return (
+        {
+            'id': sub_txn.id,
+            'transaction_id': txn.id,
+            'amount': sub_txn.amount,
+            'memo': sub_txn.memo,
+            'payee_id': sub_txn.payee_id,
+            'category_id': sub_txn.category_id,
+            'transfer_account_id': getattr(sub_txn, 'transfer_account_id', None),
+            'deleted': getattr(sub_txn, 'deleted', False),
+        }
+        for txn in transactions if getattr(txn, 'subtransactions', None)
+        for sub_txn in txn.subtransactions
+    )
+
+
+def _category_rows(category_groups):
+    return (
+        {
+            'id': cat.id,
+            'name': cat.name,
+            'group_id': category_group.id,
+            'group_name': category_group.name,
+            'hidden': cat.hidden,
+            'deleted': cat.deleted if hasattr(cat, 'deleted') else False,
+        }
+        for category_group in category_groups
+        for cat in category_group.categories
+    )
+
+
+def _payee_rows(payees):
+    return (
+        {
+            'id': payee.id,
+            'name': payee.name,
+            'transfer_account_id': payee.transfer_account_id if hasattr(payee, 'transfer_account_id') else None,
+            'deleted': payee.deleted if hasattr(payee, 'deleted') else False,
+        }
+        for payee in payees
+    )
+
+
+def _account_rows(accounts):
+    return (
+        {
+            'id': acct.id,
+            'name': acct.name,
+            'type': acct.type,
+            'on_budget': acct.on_budget,
+            'closed': acct.closed,
+            'note': acct.note,
+            'balance': acct.balance,
+            'cleared_balance': acct.cleared_balance,
+            'uncleared_balance': acct.uncleared_balance,
+            'transfer_payee_id': acct.transfer_payee_id,
+            'direct_import_linked': acct.direct_import_linked,
+            'direct_import_in_error': acct.direct_import_in_error,
+            'deleted': acct.deleted,
+        }
+        for acct in accounts
+    )
+
+
+def _balance_rows(accounts, snapshot_date):
+    # Current balance of each account, one history row per account per day
+    return (
+        {
+            'account_id': acct.id,
+            'date': snapshot_date,
+            'balance': acct.balance,
+            'cleared_balance': acct.cleared_balance,
+            'uncleared_balance': acct.uncleared_balance,
+        }
+        for acct in accounts
+    )
+
+
+def _budget_row(budget_data):
+    return {
+        'id': budget_data.id,
+        'name': budget_data.name,
+        'last_modified_on': budget_data.last_modified_on,
+        'first_month': budget_data.first_month,
+        'last_month': budget_data.last_month,
+        'currency_format': str(budget_data.currency_format) if hasattr(budget_data, 'currency_format') else None,
+    }
+
+
+def _month_budget_rows(budget_data):
+    return (
+        {
+            'budget_id': budget_data.id,
+            # Stored as text ('YYYY-MM-DD'); comparing with stored rows needs the same form
+            'month': str(month_data.month),
+            'category_id': cat.id,
+            'budgeted': cat.budgeted,
+            'activity': cat.activity,
+            'balance': cat.balance,
+        }
+        for month_data in (getattr(budget_data, 'months', None) or [])
+        for cat in (getattr(month_data, 'categories', None) or [])
+    )
+
+
+# Values compared to decide whether a month budget row changed
+MONTH_BUDGET_VALUES = ('budgeted', 'activity', 'balance')
+
+_STORED_MONTH_BUDGETS = text(
+    "SELECT month, category_id, budgeted, activity, balance FROM month_budgets "
+    "WHERE budget_id = :budget_id AND month IN :months"
+).bindparams(bindparam("months", expanding=True))
+
+
+def _changed_month_budget_rows(session, rows):
+    """
+    The month budget rows that are new or differ from what is stored.
+
+    The stored rows of every month present in `rows` are read once (one query
+    per chunk of months), so an unchanged month costs no per-row lookup and
+    produces no write.
+    """
+    rows = list(rows)
+    months = defaultdict(set)
+    for row in rows:
+        months[row['budget_id']].add(row['month'])
+
+    stored = {}
+    for budget_id, budget_months in months.items():
+        for chunk in chunked(sorted(budget_months), LOOKUP_CHUNK_SIZE):
+            for month, category_id, *values in session.execute(
+                _STORED_MONTH_BUDGETS, {"budget_id": budget_id, "months": chunk}
+            ):
+                stored[(budget_id, month, category_id)] = tuple(values)
+
+    return [
+        row for row in rows
+        if stored.get((row['budget_id'], row['month'], row['category_id']))
+        != tuple(row[name] for name in MONTH_BUDGET_VALUES)
+    ]
+
+
+def store_month_budgets(budget_data, session=None, chunk_size=BULK_CHUNK_SIZE):
+    """Write the month budgets of a budget that changed since they were stored; returns how many"""
+    with use_session(session) as session:
+        changed = _changed_month_budget_rows(session, _month_budget_rows(budget_data))
+        return _store_rows(session, MonthBudget, changed,
+                           conflict_columns=['budget_id', 'month', 'category_id'], chunk_size=chunk_size)
+
+
+def store_transactions(transactions, session=None, chunk_size=BULK_CHUNK_SIZE):
+    """Store transactions from YNAB API into the database"""
+    with use_session(session) as session:
         try:
-            for txn in transactions:
-                # handle subtransactions
-                subtransactions_data = []
-                if hasattr(txn, 'subtransactions') and txn.subtransactions:
-                    for sub_txn in txn.subtransactions:
-                        subtransactions_data.append(SubTransaction(
-                            id=sub_txn.id,
-                            transaction_id=txn.id,
-                            amount=sub_txn.amount / 1000,
-                            memo=sub_txn.memo,
-                            payee_id=sub_txn.payee_id,
-                            category_id=sub_txn.category_id,
-                            transfer_account_id=getattr(sub_txn, 'transfer_account_id', None),
-                            deleted=getattr(sub_txn, 'deleted', False)
-                        ))
-                # Create Main Transaction
-                transaction_entry = Transaction(
-                    id=txn.id,
-                    date=txn.var_date,
-                    amount=txn.amount / 1000,
-                    memo=txn.memo,
-                    cleared=txn.cleared,
-                    approved=txn.approved,
-                    account_id=txn.account_id,
-                    payee_id=txn.payee_id,
-                    category_id=txn.category_id
-                )
-                # Use merge for the main transaction (WTF IS THIS DOING)
-                session.merge(transaction_entry)
-                # For subtransactions check if they exist first
-                for sub_entry in subtransactions_data:
-                    existing = session.query(SubTransaction).filter_by(id=sub_entry.id).first()
-                    if existing:
-                        # Update existing transaction
-                        for key, value in sub_entry.__dict__.items():
-                            if key != '_sa_instance_state' and key != 'id':
-                                setattr(existing, key, value)
-                    else:
-                        session.add(sub_entry)
+            touched_cells = set()
+            for chunk in chunked(transactions, chunk_size):
+                # Delta responses carry deleted transactions; drop them instead of storing
+                deleted_ids = [txn.id for txn in chunk if getattr(txn, 'deleted', False)]
+                live = [txn for txn in chunk if not getattr(txn, 'deleted', False)]
+
+                # Cube cells the live transactions leave (old values) and enter (new values)
+                live_ids = [txn.id for txn in live]
+                touched_cells |= transaction_cells(session, live_ids)
+
+                sub_rows = list(_subtransaction_rows(live))
+                _store_rows(session, Transaction, _transaction_rows(live), chunk_size=chunk_size)
+                _store_rows(session, SubTransaction, sub_rows, chunk_size=chunk_size)
+                delete_stale_subtransactions(live_ids, (row['id'] for row in sub_rows), session=session)
+                touched_cells |= transaction_cells(session, live_ids)
+                refresh_ledger_lines(session, live_ids)
+                refresh_search_index(session, live_ids)
+
+                delete_transactions(deleted_ids, session=session)
+
+            refresh_cube(session, touched_cells)
+            refresh_balance_history(session, touched_cells)
         except Exception as e:
             print(f"Error storing transactions: {e}")
             raise
 
 
-def store_categories(categories):
+def store_categories(categories, session=None, chunk_size=BULK_CHUNK_SIZE):
     """Store categories from YNAB API into the database"""
-    with get_db_session() as session:
+    with use_session(session) as session:
         try:
-            for category_group in categories:
-                group_id = category_group.id
-                group_name = category_group.name
-
-                for cat in category_group.categories:
-                    category_entry = Category(
-                        id=cat.id,
-                        name=cat.name,
-                        group_id=group_id,
-                        group_name=group_name,
-                        hidden=cat.hidden,
-                        deleted=cat.deleted if hasattr(cat, 'deleted') else False
-                    )
-                    session.merge(category_entry)
+            rows = list(_category_rows(categories))
+            # Renamed categories change the search documents of their transactions
+            renamed = renamed_keys(session, "categories", rows)
+            _store_rows(session, Category, rows, chunk_size=chunk_size)
+            refresh_renamed(session, category_keys=renamed)
         except Exception as e:
             print(f"Error storing categories: {e}")
             raise
 
 
-def store_payees(payees):
+def store_payees(payees, session=None, chunk_size=BULK_CHUNK_SIZE):
     """Store payees from YNAB API into the database"""
-    with get_db_session() as session:
+    with use_session(session) as session:
         try:
-            for payee in payees:
-                payee_entry = Payee(
-                    id=payee.id,
-                    name=payee.name,
-                    transfer_account_id=payee.transfer_account_id if hasattr(payee, 'transfer_account_id') else None,
-                    deleted=payee.deleted if hasattr(payee, 'deleted') else False
-                )
-                session.merge(payee_entry)
-            session.commit()
+            rows = list(_payee_rows(payees))
+            # Renamed payees change the search documents of their transactions
+            renamed = renamed_keys(session, "payees", rows)
+            _store_rows(session, Payee, rows, chunk_size=chunk_size)
+            refresh_renamed(session, payee_keys=renamed)
         except Exception as e:
             print(f"Error storing payees: {e}")
             raise
 
 
-def store_accounts(accounts, session=None):
+def store_accounts(accounts, session=None, chunk_size=BULK_CHUNK_SIZE):
     """Store accounts from YNAB API into the database"""
-    close_session = False
-    if session is None:
-        session = SessionLocal()
-        close_session = True
-    try:
-        for acct in accounts:
-            account_entry = Account(
-                id=acct.id,
-                name=acct.name,
-                type=acct.type,
-                on_budget=acct.on_budget,
-                closed=acct.closed,
-                note=acct.note,
-                balance=acct.balance / 1000,
-                cleared_balance=acct.cleared_balance / 1000,
-                uncleared_balance=acct.uncleared_balance / 1000,
-                transfer_payee_id=acct.transfer_payee_id,
-                direct_import_linked=acct.direct_import_linked,
-                direct_import_in_error=acct.direct_import_in_error,
-                deleted=acct.deleted
-            )
-            session.merge(account_entry)
-
-            # Also store current balance in history table
-            store_account_balance_snapshot(acct, session=session)
-
-        session.commit()
-    except Exception as e:
-        print(f"Error storing accounts: {e}")
-        session.rollback()
-    finally:
-        if close_session:
-            session.close()  # Ensure session is always closed
-
-
-def store_account_balance_snapshot(account, snapshot_date=None, session=None):
-    """Store current account balance in the history table"""
-    if snapshot_date is None:
-        snapshot_date = datetime.date.today()
-
-    close_session = False
-    if session is None:
-        session = SessionLocal()
-        close_session = True
-
-    try:
-        # Check if we already have a snapshot for this account/date
-        existing = session.query(AccountBalanceHistory).filter_by(
-            account_id=account.id,
-            date=snapshot_date
-        ).first()
-
-        if existing:
-            # Update existing Snapshot
-            existing.balance = account.balance / 1000
-            existing.cleared_balance = account.cleared_balance / 1000
-            existing.uncleared_balance = account.uncleared_balance / 1000
-        else:
-            # Create new snapshot
-            history_entry = AccountBalanceHistory(
-                account_id=account.id,
-                date=snapshot_date,
-                balance=account.balance / 1000,
-                cleared_balance=account.cleared_balance / 1000,
-                uncleared_balance=account.uncleared_balance / 1000
-            )
-            session.add(history_entry)
-        if close_session:
-            session.commit()
-    except Exception as e:
-        print(f"Error storing account balance history: {e}")
-        if close_session:
-            session.rollback()
-    finally:
-        if close_session:
-            session.close()
+    accounts = list(accounts)
+    with use_session(session) as session:
+        try:
+            _store_rows(session, Account, _account_rows(accounts), chunk_size=chunk_size)
+            # Also store current balance in history table (one row per account per day)
+            _store_rows(session, AccountBalanceHistory, _balance_rows(accounts, datetime.date.today()),
+                        conflict_columns=['account_id', 'date'], chunk_size=chunk_size)
+        except Exception as e:
+            # Re-raise so a failed write never advances the stored server_knowledge
+            print(f"Error storing accounts: {e}")
+            raise
 
 
-def store_budget(budget_data):
-    """Store budget information from YNAB API"""  # NOT SUTE WHJAT THIS DEOSEITHER
-    with get_db_session() as session:
+def store_budget(budget_data, session=None, chunk_size=BULK_CHUNK_SIZE):
+    """Store budget information from YNAB API, with the month budgets that changed"""
+    with use_session(session) as session:
         try:
-            # Store main budget info
-            budget_entry = Budget(
-                id=budget_data.id,
-                name=budget_data.name,
-                last_modified_on=budget_data.last_modified_on,
-                first_month=budget_data.first_month,
-                last_month=budget_data.last_month,
-                currency_format=str(budget_data.currency_format) if hasattr(budget_data, 'currency_format') else None
-            )
-            session.merge(budget_entry)
-            # Store month budget data if available
-            if hasattr(budget_data, 'months') and budget_data.months:
-                for month_data in budget_data.months:
-                    month_str = month_data.month
-
-                    # Process each category in the month
-                    if hasattr(month_data, 'categories') and month_data.categories:
-                        for cat in month_data.categories:
-                            month_budget_entry = MonthBudget(
-                                budget_id=budget_data.id,
-                                month=month_str,
-                                category_id=cat.id,
-                                budgeted=cat.budgeted / 1000,
-                                activity=cat.activity / 1000,
-                                balance=cat.balance / 1000
-                            )
-
-                            # Check if entry exists
-                            existing = session.query(MonthBudget).filter_by(
-                                budget_id=budget_data.id,
-                                month=month_str,
-                                category_id=cat.id
-                            ).first()
-
-                            if existing:
-                                # Update existing entry
-                                existing.budgeted = cat.budgeted / 1000
-                                existing.activity = cat.activity / 1000
-                                existing.balance = cat.balance / 1000
-                            else:
-                                # Add new entry
-                                session.add(month_budget_entry)
+            _store_rows(session, Budget, [_budget_row(budget_data)])
+            store_month_budgets(budget_data, session=session, chunk_size=chunk_size)
         except Exception as e:
             print(f"Error storing budget data: {e}")
             raise
 
 
-# def capture_month_end_balances():
-#     """
-#     Utility function to capture current account balances for historical tracking.
-#     Ideal to run at month-end via a scheduled task.
-#     """
-#     from data.ynab_calls import YNABClient
-#     import secrets_rs
-#
-#     ynab_client = YNABClient()
-#     budget_id = secrets_rs.BANANA_STAND_ID
-#
-#     if budget_id:
-#         # Get current date (or last day of previous month if running as scheduled task)
-#         today = datetime.date.today()
-#         if today.day == 1:  # If first day of month, use last day of previous month
-#             # Move to previous day (last day of previous month)
-#             snapshot_date = today - datetime.timedelta(days=1)
-#         else:
-#             snapshot_date = today
-#
-#         # Fetch current account data
-#         accounts = ynab_client.get_accounts(budget_id)
-#
-#         # Store snapshots with the specific date
-#         for account in accounts:
-#             store_account_balance_snapshot(account, snapshot_date)
-#
-#         print(f"Captured balance snapshots for {len(accounts)} accounts as of {snapshot_date}")
-
-def sync_all_data(budget_id):
+# Order in which fetched entities are staged: budget months and transactions
+# reference categories, payees and accounts, so those go first.
+SYNC_WRITE_ORDER = ("categories", "payees", "accounts", "budget", "transactions")
+
+# Upper bound on parallel API requests when sync_all_data(concurrent=True)
+FETCH_WORKERS = 5
+
+
+def _stage_synced_entity(session, entity, data, chunk_size=BULK_CHUNK_SIZE):
+    """Write one fetched entity into the staging tables"""
+    if entity == "budget":
+        staging.stage_rows(session, Budget, [_budget_row(data)])
+        # Only new or changed month budgets are staged; unchanged months are never rewritten.
+        # They are compared on a read connection, since the staging session must not
+        # read the main database before it publishes (see staging.publish)
+        with ReadSessionLocal() as reader:
+            changed = _changed_month_budget_rows(reader, _month_budget_rows(data))
+        staging.stage_rows(session, MonthBudget, changed, chunk_size=chunk_size)
+    elif entity == "categories":
+        staging.stage_rows(session, Category, _category_rows(data), chunk_size=chunk_size)
+    elif entity == "payees":
+        staging.stage_rows(session, Payee, _payee_rows(data), chunk_size=chunk_size)
+    elif entity == "accounts":
+        staging.stage_rows(session, Account, _account_rows(data), chunk_size=chunk_size)
+        staging.stage_rows(session, AccountBalanceHistory, _balance_rows(data, datetime.date.today()),
+                           chunk_size=chunk_size)
+    elif entity == "transactions":
+        for chunk in chunked(data, chunk_size):
+            # Delta responses carry deleted transactions; they are removed on publish
+            live = [txn for txn in chunk if not getattr(txn, 'deleted', False)]
+            staging.stage_deleted_transactions(
+                session, (txn.id for txn in chunk if getattr(txn, 'deleted', False))
+            )
+            staging.stage_rows(session, Transaction, _transaction_rows(live), chunk_size=chunk_size)
+            staging.stage_rows(session, SubTransaction, _subtransaction_rows(live), chunk_size=chunk_size)
+
+
+def sync_all_data(budget_id, full_resync=False, concurrent=False, max_workers=FETCH_WORKERS, client=None):
     """
     Synchronize all data from YNAB API for a given budget.
     This is a comprehensive sync function that pulls all entity types.
-    """
-    from data.ynab_calls import YNABClient
-
-    ynab_client = YNABClient()
 
-    # Fetch and store budget info (includes months)
-    budget_data = ynab_client.get_budget_by_id(budget_id)
-    if budget_data:
-        store_budget(budget_data)
+    By default the sync is incremental: the server_knowledge stored from the
+    previous run is sent as `last_knowledge_of_server`, so YNAB only returns
+    rows that changed (or were deleted) since then. Pass `full_resync=True` to
+    ignore the stored knowledge, download everything again and drop local
+    transactions that YNAB no longer knows about.
 
-    # Fetch and store categories
-    categories = ynab_client.get_categories(budget_id)
-    if categories:
-        store_categories(categories)
+    With `concurrent=True` the independent API calls run in parallel on a
+    thread pool of at most `max_workers` threads sharing one pooled client.
+    Staging always happens afterwards, one entity at a time, in SYNC_WRITE_ORDER.
+    Transactions are streamed (see data.transaction_stream): the response is
+    parsed and staged in batches as it downloads, so memory stays flat
+    however large the budget.
 
-    # Fetch and store payees
-    payees = ynab_client.get_payees(budget_id)
-    if payees:
-        store_payees(payees)
+    Downloaded rows are loaded into staging tables (see data.staging),
+    checked for referential integrity and published in a single short
+    transaction together with the new server_knowledge.
 
-    # Fetch and store accounts
-    accounts = ynab_client.get_accounts(budget_id)
-    if accounts:
-        store_accounts(accounts)
+    Raises a YNABError (see data.request_scheduler) if any fetch fails, or a
+    staging.SyncIntegrityError if the download references rows that do not
+    exist; in either case nothing is written.
 
-    # Fetch and store transactions
-    transactions = ynab_client.get_transactions(budget_id)
-    if transactions:
-        store_transactions(transactions)
+    `client` replaces the YNABClient created for the run, e.g. with a fake
+    serving synthetic data for benchmarks.
 
-    print(f"Completed full data sync for budget {budget_id}")
+    Returns the number of transactions YNAB reported as changed.
+    """
+    # A database written by an older version is brought up to date first
+    run_migrations()
+
+    fetchers = {
+        "budget": "get_budget_by_id_delta",
+        "categories": "get_categories_delta",
+        "payees": "get_payees_delta",
+        "accounts": "get_accounts_delta",
+        # Parsed while it is staged, so a large download is never held in memory
+        "transactions": "get_transactions_stream",
+    }
+    knowledge_before = {
+        entity: None if full_resync else get_server_knowledge(budget_id, entity)
+        for entity in fetchers
+    }
+
+    if client is None:
+        # Imported here so a caller-supplied client needs no YNAB credentials
+        from data.ynab_calls import YNABClient
+
+        client_context = YNABClient(pool_size=max_workers)
+    else:
+        # A caller-supplied client is left open for the caller to close
+        client_context = nullcontext(client)
+    with client_context as ynab_client:
+        if concurrent:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {
+                    entity: pool.submit(getattr(ynab_client, method), budget_id, knowledge_before[entity])
+                    for entity, method in fetchers.items()
+                }
+            failed = next((future.exception() for future in futures.values() if future.exception()), None)
+            if failed:
+                # Don't leave an opened transactions response holding its connection
+                if not futures["transactions"].exception():
+                    futures["transactions"].result().close()
+                raise failed
+            results = {entity: future.result() for entity, future in futures.items()}
+        else:
+            results = {}
+            try:
+                for entity, method in fetchers.items():
+                    results[entity] = getattr(ynab_client, method)(budget_id, knowledge_before[entity])
+            except BaseException:
+                if "transactions" in results:
+                    results["transactions"].close()
+                raise
+
+        # Any failed fetch has raised a YNABError by now, so nothing is written
+        # from a partial download and the stored knowledge stays where it was.
+        # Everything is staged first and published in one transaction, so readers
+        # never see a half-applied sync and a failure leaves the database untouched.
+        # Transactions are still being downloaded while they are staged; a
+        # broken or truncated body raises before anything is published.
+        # Staged on a connection of the sync's own, so other writes in this process
+        # keep the writer connection while the transactions download
+        with closing(results["transactions"]) as stream, get_db_session(StagingSessionLocal) as session:
+            staging.create_staging_tables(session)
+            for entity in SYNC_WRITE_ORDER:
+                _stage_synced_entity(session, entity, stream if entity == "transactions" else results[entity][0])
+            knowledge_after = {entity: results[entity][1] for entity in SYNC_WRITE_ORDER if entity != "transactions"}
+            knowledge_after["transactions"] = stream.server_knowledge
+
+            removed = staging.publish(session, full_resync=full_resync)
+            if removed and full_resync:
+                print(f"Removed {removed} transactions no longer present in YNAB")
+            for entity in SYNC_WRITE_ORDER:
+                save_server_knowledge(budget_id, entity, knowledge_after[entity], session=session)
+            # Dashboard caches reload once, when this transaction commits
+            bump_data_version(session=session)
+            staging.drop_staging_tables(session)
+
+    # A first sync has no stored knowledge to send, so it downloads everything too
+    mode = "full" if all(knowledge is None for knowledge in knowledge_before.values()) else "incremental"
+    changed = stream.count
+    print(f"Completed {mode} data sync for budget {budget_id}: {changed} transactions changed")
+    return changed
@@ -1,11 +1,79 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker, relationship
-from sqlalchemy import String, Integer, Date, Boolean, ForeignKey, create_engine, UniqueConstraint, DateTime, Index
+from sqlalchemy import String, Integer, Date, Boolean, ForeignKey, create_engine, UniqueConstraint, DateTime, Float, Index
+from sqlalchemy import event, make_url
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
 import datetime
+import os
 
 # Database Setup
-DATABASE_URI = "sqlite:///data/ynab_data.db"
-engine = create_engine(DATABASE_URI)
+DATABASE_URI = os.environ.get("YNAB_DATABASE_URI", "sqlite:///data/ynab_data.db")
+
+# SQLite tuning, applied to every connection. WAL lets dashboard reads run
+# while a sync is writing; NORMAL sync is durable across application crashes
+# in WAL mode and only risks the last commits on power loss.
+SQLITE_JOURNAL_MODE = os.environ.get("YNAB_SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("YNAB_SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.environ.get("YNAB_SQLITE_MMAP_SIZE", str(256 * 2**20)))  # bytes
+SQLITE_CACHE_KB = int(os.environ.get("YNAB_SQLITE_CACHE_KB", str(64 * 1024)))  # per connection
+# How long a writer waits for another process's write lock before failing
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("YNAB_SQLITE_BUSY_TIMEOUT_MS", "30000"))
+
+# Read-only connections available to concurrent dashboard callbacks
+READ_POOL_SIZE = int(os.environ.get("YNAB_READ_POOL_SIZE", "8"))
+
+
+def _sqlite_pragmas(read_only):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            # Persistent in the database file; readers inherit it
+            cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size = {-SQLITE_CACHE_KB}")
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+    return on_connect
+
+
+def _create_engines(uri):
+    """
+    Return (writer, reader, staging) engines for `uri`.
+
+    For a SQLite file the writer pool holds a single connection, so writes from
+    this process are serialized (SQLite allows one writer at a time anyway), and
+    the reader pool holds READ_POOL_SIZE query-only connections which, in WAL
+    mode, never wait for the writer. The staging engine opens a fresh
+    connection for each sync (see data.staging), which takes SQLite's write
+    lock only when it publishes, so a long download never holds the writer
+    connection. Other databases get one ordinary engine.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() != "sqlite":
+        shared = create_engine(uri)
+        return shared, shared, shared
+    if url.database in (None, "", ":memory:"):
+        # Every connection to an in-memory database is a different database
+        shared = create_engine(uri, poolclass=StaticPool)
+        return shared, shared, shared
+
+    writer = create_engine(uri, poolclass=QueuePool, pool_size=1, max_overflow=0)
+    event.listen(writer, "connect", _sqlite_pragmas(read_only=False))
+    reader = create_engine(uri, poolclass=QueuePool, pool_size=READ_POOL_SIZE, max_overflow=0)
+    event.listen(reader, "connect", _sqlite_pragmas(read_only=True))
+    staging = create_engine(uri, poolclass=NullPool)
+    event.listen(staging, "connect", _sqlite_pragmas(read_only=False))
+    return writer, reader, staging
+
+
+# `engine` is the single writer used by the sync pipeline; dashboard code reads
+# through `read_engine`, and syncs stage their downloads through `staging_engine`
+engine, read_engine, staging_engine = _create_engines(DATABASE_URI)
 SessionLocal = sessionmaker(bind=engine)
+ReadSessionLocal = sessionmaker(bind=read_engine)
+StagingSessionLocal = sessionmaker(bind=staging_engine)
 
 
 # Create the Database with Explicit class definition
@@ -26,13 +94,17 @@ class Transaction(Base):
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     date: Mapped[Date] = mapped_column(Date, index=True)
-    amount: Mapped[int] = mapped_column(Integer)
+    amount: Mapped[int] = mapped_column(Integer)  # milliunits
     memo: Mapped[str | None] = mapped_column(String, nullable=True)
     cleared: Mapped[str] = mapped_column(String)
     approved: Mapped[bool] = mapped_column(Boolean)
     account_id: Mapped[str] = mapped_column(ForeignKey('accounts.id'))
     payee_id: Mapped[str | None] = mapped_column(ForeignKey('payees.id'), nullable=True)
     category_id: Mapped[str | None] = mapped_column(ForeignKey('categories.id'), nullable=True)
+    # Integer surrogates of the ids above (see data.dimensions), used for indexes and joins
+    account_key: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    payee_key: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    category_key: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     account = relationship("Account", back_populates="transactions")
     payee = relationship("Payee", back_populates="transactions")
@@ -41,11 +113,11 @@ class Transaction(Base):
 
     __table_args__ = (
         # Most common query pattern: transactions by date range for a specific account
-        Index('ix_transactions_date_account', 'date', 'account_id'),
+        Index('ix_transactions_date_account', 'date', 'account_key'),
         # For filtering by category (budget reporting)
-        Index('ix_transactions_category_date', 'category_id', 'date'),
+        Index('ix_transactions_category_date', 'category_key', 'date'),
         # For filtering by payee
-        Index('ix_transactions_payee_date', 'payee_id', 'date'),
+        Index('ix_transactions_payee_date', 'payee_key', 'date'),
     )
 
 
@@ -54,12 +126,14 @@ class SubTransaction(Base):
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     transaction_id: Mapped[str] = mapped_column(ForeignKey('transactions.id'))
-    amount: Mapped[int] = mapped_column(Integer)
+    amount: Mapped[int] = mapped_column(Integer)  # milliunits
     memo: Mapped[str | None] = mapped_column(String, nullable=True)
     payee_id: Mapped[str | None] = mapped_column(ForeignKey('payees.id'), nullable=True)
     category_id: Mapped[str | None] = mapped_column(ForeignKey('categories.id'), nullable=True)
     transfer_account_id: Mapped[str | None] = mapped_column(String, nullable=True)
     deleted: Mapped[bool] = mapped_column(Boolean, default=False)
+    payee_key: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    category_key: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     transaction = relationship("Transaction", back_populates="subtransactions")
 
@@ -78,10 +152,12 @@ class Category(Base):
     group_name: Mapped[str | None] = mapped_column(String, nullable=True)
     hidden: Mapped[bool] = mapped_column(Boolean, default=False)
     deleted: Mapped[bool] = mapped_column(Boolean, default=False)
+    key: Mapped[int | None] = mapped_column(Integer, nullable=True)  # integer surrogate of id
 
     transactions = relationship("Transaction", back_populates="category")
 
     __table_args__ = (
+        Index('ix_categories_key', 'key', unique=True),
         # For filtering categories by group
         Index('ix_categories_group', 'group_id'),
         # For searching categories by name
@@ -98,10 +174,12 @@ class Payee(Base):
     name: Mapped[str] = mapped_column(String, nullable=False)
     transfer_account_id: Mapped[str | None] = mapped_column(String, nullable=True)
     deleted: Mapped[bool] = mapped_column(Boolean, default=False)
+    key: Mapped[int | None] = mapped_column(Integer, nullable=True)  # integer surrogate of id
 
     transactions = relationship("Transaction", back_populates="payee")
 
     __table_args__ = (
+        Index('ix_payees_key', 'key', unique=True),
         # For searching payees by name
         Index('ix_payees_name', 'name'),
         # For finding transfer payees
@@ -121,18 +199,20 @@ class Account(Base):
     on_budget: Mapped[bool] = mapped_column(Boolean)
     closed: Mapped[bool] = mapped_column(Boolean)
     note: Mapped[str] = mapped_column(String, nullable=True)
-    balance: Mapped[int] = mapped_column(Integer)
+    balance: Mapped[int] = mapped_column(Integer)  # milliunits, like every amount column
     cleared_balance: Mapped[int] = mapped_column(Integer)
     uncleared_balance: Mapped[int] = mapped_column(Integer)
     transfer_payee_id: Mapped[str | None] = mapped_column(String, nullable=True)  # foreign key?
     direct_import_linked: Mapped[bool] = mapped_column(Boolean)
     direct_import_in_error: Mapped[bool] = mapped_column(Boolean)
     deleted: Mapped[bool] = mapped_column(Boolean)
+    key: Mapped[int | None] = mapped_column(Integer, nullable=True)  # integer surrogate of id
 
     transactions = relationship("Transaction", back_populates="account")
     balance_history = relationship("AccountBalanceHistory", back_populates="account")
 
     __table_args__ = (
+        Index('ix_accounts_key', 'key', unique=True),
         # For filtering accounts by type
         Index('ix_accounts_type', 'type'),
         # For searching accounts by name
@@ -148,14 +228,19 @@ class AccountBalanceHistory(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     account_id: Mapped[str] = mapped_column(ForeignKey('accounts.id'))
     date: Mapped[Date] = mapped_column(Date, index=True)
-    balance: Mapped[int] = mapped_column(Integer)
+    balance: Mapped[int] = mapped_column(Integer)  # milliunits, like every amount column
     cleared_balance: Mapped[int] = mapped_column(Integer)
     uncleared_balance: Mapped[int] = mapped_column(Integer)
+    account_key: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     account = relationship("Account", back_populates="balance_history")
 
     # Add composite unique constraint
-    __table_args__ = (UniqueConstraint('account_id', 'date', name='_account_date_uc'),)
+    __table_args__ = (
+        UniqueConstraint('account_id', 'date', name='_account_date_uc'),
+        # Balance history of an account over time
+        Index('ix_account_balance_history_account_date', 'account_key', 'date'),
+    )
 
 
 # Budget data classes
@@ -182,22 +267,130 @@ class MonthBudget(Base):
     budgeted: Mapped[int] = mapped_column(Integer)
     activity: Mapped[int] = mapped_column(Integer)
     balance: Mapped[int] = mapped_column(Integer)
+    category_key: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     budget = relationship("Budget", back_populates="month_budgets")
     category = relationship("Category")
 
     __table_args__ = (
-        # For retrieving a complete month's budget
-        Index('ix_month_budgets_budget_month', 'budget_id', 'month'),
+        # One row per category per month; also serves retrieving a complete month's budget
+        Index('ux_month_budgets_budget_month_category', 'budget_id', 'month', 'category_id', unique=True),
         # For category trend analysis over time
-        Index('ix_month_budgets_category_month', 'category_id', 'month'),
+        Index('ix_month_budgets_category_month', 'category_key', 'month'),
         # For finding categories with specific budget characteristics
         Index('ix_month_budgets_budgeted', 'budgeted'),
         Index('ix_month_budgets_activity', 'activity'),
     )
 
 
+# Reporting aggregates
+class LedgerLine(Base):
+    __tablename__ = "ledger_lines"
+
+    # Flattened, split-aware ledger derived from transactions and subtransactions:
+    # one line per unsplit transaction (id = transaction id) or per live
+    # subtransaction of a split (id = subtransaction id), carrying the effective
+    # category, payee and amount. Reports scan this instead of joining splits.
+    # Accounts, payees and categories are referenced by their integer keys only.
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    transaction_id: Mapped[str] = mapped_column(String)
+    account_key: Mapped[int] = mapped_column(Integer)
+    date: Mapped[Date] = mapped_column(Date)
+    payee_key: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    category_key: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    amount: Mapped[int] = mapped_column(Integer)  # milliunits
+
+    __table_args__ = (
+        # Lines are replaced per transaction when it changes
+        Index('ix_ledger_lines_transaction', 'transaction_id'),
+        # Date range scans (trend) and per-account month refreshes (cube)
+        Index('ix_ledger_lines_date', 'date'),
+        Index('ix_ledger_lines_account_date', 'account_key', 'date'),
+        # Category reports
+        Index('ix_ledger_lines_category_date', 'category_key', 'date'),
+    )
+
+
+class CategoryAccountMonth(Base):
+    __tablename__ = "category_account_month"
+
+    # Pre-aggregated transaction totals per account, category and month, kept
+    # up to date by the sync pipeline so summary reports never scan the ledger.
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    account_key: Mapped[int] = mapped_column(Integer)
+    category_key: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    month: Mapped[str] = mapped_column(String)  # Format: YYYY-MM
+    total: Mapped[int] = mapped_column(Integer)  # milliunits
+    count: Mapped[int] = mapped_column(Integer)
+
+    __table_args__ = (
+        # Cells are refreshed and queried by account and month
+        Index('ix_category_account_month_account_month', 'account_key', 'month'),
+        # For all-account summaries over a date window
+        Index('ix_category_account_month_month', 'month'),
+    )
+
+
+# Surrogate keys
+class DimensionKey(Base):
+    __tablename__ = "dimension_keys"
+
+    # Every account, payee and category UUID seen, interned once to a small
+    # integer. Keys are never reused or reassigned.
+    key: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    uuid: Mapped[str] = mapped_column(String, unique=True)
+
+
+# Sync bookkeeping
+class SyncState(Base):
+    __tablename__ = "sync_state"
+
+    # Last YNAB `server_knowledge` seen per budget and entity type, sent back
+    # as `last_knowledge_of_server` so the next sync only receives deltas.
+    budget_id: Mapped[str] = mapped_column(String, primary_key=True)
+    entity: Mapped[str] = mapped_column(String, primary_key=True)  # budget, categories, payees, accounts, transactions
+    server_knowledge: Mapped[int] = mapped_column(Integer)
+
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+
+    # Single row counter bumped by the sync pipeline whenever it commits new
+    # data. Dashboard caches are keyed by it, so they reload exactly when it moves.
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class SyncRun(Base):
+    __tablename__ = "sync_runs"
+
+    # One row per background sync attempt, shared by every worker. The latest
+    # finished row's next_run_at decides when any worker syncs next.
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    budget_id: Mapped[str] = mapped_column(String)
+    status: Mapped[str] = mapped_column(String)  # running, ok, failed
+    started_at: Mapped[datetime.datetime] = mapped_column(DateTime)
+    finished_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, nullable=True)
+    duration: Mapped[float | None] = mapped_column(Float, nullable=True)  # seconds
+    transactions_changed: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    quota_remaining: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    next_run_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, nullable=True)
+    error: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    __table_args__ = (
+        Index('ix_sync_runs_budget_started', 'budget_id', 'started_at'),
+    )
+
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    # Data migrations (see data.migrations) already applied to this database, by name
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+
+
 # Initialize database (creates tables if they don't exist)
 
 
 Base.metadata.create_all(engine)
+
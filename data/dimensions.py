@@ -0,0 +1,93 @@
+# dimensions.py
+"""
+Integer surrogate keys for YNAB's UUID-keyed dimensions.
+
+Accounts, payees and categories are identified by 36-character UUIDs, which
+make every index, join and GROUP BY on them wide. Each UUID is interned once
+in `dimension_keys` and gets a small integer key: dimension tables carry it
+as `key` and fact tables as `<name>_key` next to each `<name>_id`. Indexes,
+joins and aggregates use the integers; the UUID columns are kept unchanged
+for round-trips to the YNAB API.
+"""
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from data.bulk_writer import BULK_CHUNK_SIZE, LOOKUP_CHUNK_SIZE, chunked
+from data.database import DimensionKey
+
+_keys = DimensionKey.__table__
+
+_INSERT = sqlite_insert(_keys).on_conflict_do_nothing(index_elements=["uuid"])
+
+_LOOKUP = select(_keys.c.uuid, _keys.c.key).where(
+    _keys.c.uuid.in_(bindparam("uuids", expanding=True))
+)
+
+
+def key_columns(table):
+    """(UUID column, key column) pairs of `table`: `key` mirrors `id` and `<name>_key` mirrors `<name>_id`."""
+    pairs = []
+    for column in table.columns:
+        if column.name == "key":
+            source = "id"
+        elif column.name.endswith("_key"):
+            source = column.name[:-len("_key")] + "_id"
+        else:
+            continue
+        if source in table.c:
+            pairs.append((source, column.name))
+    return pairs
+
+
+def intern_keys(session, uuids, known=None):
+    """
+    Map `uuids` to their integer keys, assigning keys to new ones. `known` is
+    a dict of keys already resolved in this transaction; it is extended in
+    place and returned. None stays unmapped.
+    """
+    keys = {} if known is None else known
+    missing = {uuid for uuid in uuids if uuid is not None and uuid not in keys}
+    for chunk in chunked(missing, LOOKUP_CHUNK_SIZE):
+        session.execute(_INSERT, [{"uuid": uuid} for uuid in chunk])
+        keys.update(session.execute(_LOOKUP, {"uuids": chunk}).tuples().all())
+    return keys
+
+
+def keyed_rows(session, model, rows, chunk_size=BULK_CHUNK_SIZE):
+    """Yield `rows` (dicts for `model`'s table) with every key column set from its UUID column."""
+    table = getattr(model, "__table__", model)
+    pairs = key_columns(table)
+    if not pairs:
+        yield from rows
+        return
+    keys = {}
+    for chunk in chunked(rows, chunk_size):
+        intern_keys(session, (row.get(source) for row in chunk for source, _ in pairs), keys)
+        for row in chunk:
+            for source, key in pairs:
+                if source in row:
+                    row[key] = keys.get(row[source])
+            yield row
+
+
+def intern_keys_in(session, table, name=None):
+    """
+    Like keyed_rows() for rows already written to `table` (its Table object):
+    assign keys to the UUIDs in its UUID columns and set its key columns
+    from them, in SQL. `name` is how to address the table if not by its
+    plain name, e.g. "temp.staging_transactions".
+    """
+    pairs = key_columns(table)
+    if not pairs:
+        return
+    name = name or table.name
+    uuids = " UNION ".join(f"SELECT {source} AS uuid FROM {name}" for source, _ in pairs)
+    session.execute(text(f"""
+        INSERT OR IGNORE INTO {_keys.name} (uuid, created_at, updated_at)
+        SELECT uuid, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP FROM ({uuids})
+        WHERE uuid IS NOT NULL
+    """))
+    assignments = ", ".join(
+        f"{key} = (SELECT key FROM {_keys.name} WHERE uuid = {table.name}.{source})" for source, key in pairs
+    )
+    session.execute(text(f"UPDATE {name} SET {assignments}"))
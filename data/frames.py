@@ -0,0 +1,109 @@
+# frames.py
+"""
+Memory-compact DataFrame loading.
+
+Views ask for the columns they need instead of `SELECT *`; repeated ids
+(accounts, payees, categories) and low-cardinality strings become pandas
+categoricals, unique strings are stored as Arrow strings, amounts stay int64
+milliunits, dates datetime64 and flags bool. Rows are read and converted in
+chunks, so the object-dtype intermediate never exceeds one chunk.
+
+    python -m data.frames      # per-column memory of SELECT * vs the compact frame
+"""
+import hashlib
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sqlalchemy import text
+
+from data import database
+
+# Rows converted per chunk while reading
+READ_CHUNK_ROWS = 100_000
+
+# Compact dtype of every transactions column a view may select
+TRANSACTION_DTYPES = {
+    "id": "string[pyarrow]",
+    "date": "datetime64[ns]",
+    "amount": "int64",
+    "memo": "string[pyarrow]",
+    "cleared": "category",
+    "approved": "bool",
+    "account_id": "category",
+    "payee_id": "category",
+    "category_id": "category",
+}
+
+# What fetch_transactions() returns unless a view asks for other columns
+DEFAULT_TRANSACTION_COLUMNS = ("id", "date", "amount", "account_id", "payee_id", "category_id", "cleared", "approved")
+
+
+def _compact(chunk, dtypes):
+    for column, dtype in dtypes.items():
+        if dtype.startswith("datetime64"):
+            chunk[column] = pd.to_datetime(chunk[column])
+        elif dtype == "bool":
+            # SQLite hands booleans back as 0/1 (NULL only for missing values)
+            chunk[column] = chunk[column].fillna(0).astype(bool)
+        else:
+            chunk[column] = chunk[column].astype(dtype)
+    return chunk
+
+
+def read_compact(table, columns, dtypes, engine=None, chunksize=READ_CHUNK_ROWS):
+    """
+    Read `columns` of `table` into a DataFrame with the given `dtypes`,
+    converting chunk by chunk. Categoricals from different chunks are merged
+    into one set of categories.
+    """
+    unknown = [column for column in columns if column not in dtypes]
+    if unknown:
+        raise ValueError(f"No compact dtype for {table} columns: {', '.join(unknown)}")
+    dtypes = {column: dtypes[column] for column in columns}
+    query = text(f"SELECT {', '.join(columns)} FROM {table}")
+
+    with (engine or database.read_engine).connect() as conn:
+        pieces = [_compact(chunk, dtypes) for chunk in pd.read_sql(query, conn, chunksize=chunksize)]
+    if not pieces:
+        return _compact(pd.DataFrame({column: pd.Series(dtype=object) for column in columns}), dtypes)
+
+    categorical = [column for column, dtype in dtypes.items() if dtype == "category"]
+    df = pd.concat([piece.drop(columns=categorical) for piece in pieces], ignore_index=True)
+    for column in categorical:
+        df[column] = union_categoricals([piece[column] for piece in pieces], ignore_order=True)
+    return df[list(columns)]
+
+
+def load_transactions(columns=DEFAULT_TRANSACTION_COLUMNS, engine=None, chunksize=READ_CHUNK_ROWS):
+    """Transactions with only `columns`, in the compact dtypes of TRANSACTION_DTYPES."""
+    return read_compact("transactions", tuple(columns), TRANSACTION_DTYPES, engine=engine, chunksize=chunksize)
+
+
+def columns_key(columns):
+    """Short stable name for a column selection, for cache keys and snapshot file names."""
+    return hashlib.sha1(",".join(columns).encode()).hexdigest()[:10]
+
+
+def memory_report(df):
+    """Deep memory footprint of each column (and the total), largest first."""
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "bytes": usage,
+    }).sort_values("bytes", ascending=False)
+    report.loc["total"] = ["", int(usage.sum())]
+    report["MB"] = (report["bytes"] / 2**20).round(2)
+    return report
+
+
+def main():
+    wide = pd.read_sql("SELECT * FROM transactions", database.read_engine)
+    compact = load_transactions()
+    print(f"SELECT * ({len(wide):,} rows)")
+    print(memory_report(wide).to_string())
+    print(f"\nload_transactions() ({len(compact):,} rows)")
+    print(memory_report(compact).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# ledger.py
+from sqlalchemy import text, bindparam
+
+from data.bulk_writer import LOOKUP_CHUNK_SIZE, chunked
+
+# Lines of the transactions matching {where} (on alias t): the transaction
+# itself unless it has live subtransactions, otherwise one line per live
+# subtransaction, which inherits the parent's payee when it has none.
+# Dimensions are carried over as their integer keys.
+_LINES_INSERT = """
+    INSERT INTO ledger_lines
+        (id, transaction_id, account_key, date, payee_key, category_key, amount, created_at, updated_at)
+    SELECT t.id, t.id, t.account_key, t.date, t.payee_key, t.category_key, t.amount,
+           CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+    FROM transactions t
+    WHERE {where}
+      AND NOT EXISTS (SELECT 1 FROM subtransactions s WHERE s.transaction_id = t.id AND NOT s.deleted)
+    UNION ALL
+    SELECT s.id, t.id, t.account_key, t.date, COALESCE(s.payee_key, t.payee_key), s.category_key, s.amount,
+           CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+    FROM transactions t
+    JOIN subtransactions s ON s.transaction_id = t.id AND NOT s.deleted
+    WHERE {where}
+"""
+
+_CHUNK_DELETE = text(
+    "DELETE FROM ledger_lines WHERE transaction_id IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+_CHUNK_INSERT = text(
+    _LINES_INSERT.format(where="t.id IN :ids")
+).bindparams(bindparam("ids", expanding=True))
+
+
+def refresh_ledger_lines(session, transaction_ids):
+    """
+    Rebuild the lines of the given transactions from the transactions and
+    subtransactions tables. Ids that no longer exist just lose their lines.
+    """
+    for chunk in chunked(transaction_ids, LOOKUP_CHUNK_SIZE):
+        session.execute(_CHUNK_DELETE, {"ids": chunk})
+        session.execute(_CHUNK_INSERT, {"ids": chunk})
+
+
+def refresh_ledger_lines_in(session, id_query):
+    """Like refresh_ledger_lines() for the transaction ids returned by the SQL `id_query`."""
+    session.execute(text(f"DELETE FROM ledger_lines WHERE transaction_id IN ({id_query})"))
+    session.execute(text(_LINES_INSERT.format(where=f"t.id IN ({id_query})")))
+
+
+def rebuild_ledger(session):
+    """Recompute every line, e.g. after a full resync or on an existing database."""
+    session.execute(text("DELETE FROM ledger_lines"))
+    session.execute(text(_LINES_INSERT.format(where="1")))
+
@@ -0,0 +1,134 @@
+# migrations.py
+"""
+One-off data migrations for databases written by older versions.
+
+Importing data.database creates missing tables but never changes existing
+ones; the migrations here bring an older database's rows and derived tables
+up to date, once each, and are recorded in `schema_migrations`. They build
+on the modules that maintain those tables, so they are run explicitly
+rather than on import: the app and sync_all_data() call run_migrations()
+before they read or write anything, as must any other entry point that
+writes to the database. On a new database every migration runs over empty
+tables and is just recorded.
+"""
+from sqlalchemy import text
+
+from data import database
+from data.database import Base, CategoryAccountMonth, LedgerLine, MonthBudget
+from data.aggregates import rebuild_cube
+from data.balance_history import rebuild_balance_history
+from data.dimensions import intern_keys_in, key_columns
+from data.ledger import rebuild_ledger
+from data.search import create_search_index, rebuild_search_index
+
+# Every amount column, all holding integer YNAB milliunits
+AMOUNT_COLUMNS = {
+    "transactions": ("amount",),
+    "subtransactions": ("amount",),
+    "ledger_lines": ("amount",),
+    "accounts": ("balance", "cleared_balance", "uncleared_balance"),
+    "account_balance_history": ("balance", "cleared_balance", "uncleared_balance"),
+    "month_budgets": ("budgeted", "activity", "balance"),
+    "category_account_month": ("total",),
+}
+
+
+def _amounts_to_milliunits(conn):
+    # Older versions stored milliunits / 1000 as REAL; rounding after scaling
+    # back recovers the exact integers
+    for table, columns in AMOUNT_COLUMNS.items():
+        assignments = ", ".join(f"{column} = CAST(ROUND({column} * 1000) AS INTEGER)" for column in columns)
+        conn.execute(text(f"UPDATE {table} SET {assignments}"))
+    # Make the next sync download everything again, rewriting the amounts from the source
+    conn.execute(text("DELETE FROM sync_state"))
+    conn.execute(text("UPDATE data_version SET version = version + 1"))
+
+
+# Tables that gained integer key columns next to their UUID columns
+KEYED_TABLES = (
+    "accounts", "payees", "categories",
+    "transactions", "subtransactions", "month_budgets", "account_balance_history",
+)
+
+
+def _integer_dimension_keys(conn):
+    for name in KEYED_TABLES:
+        table = Base.metadata.tables[name]
+        existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({name})"))}
+        for _, key in key_columns(table):
+            if key not in existing:
+                conn.execute(text(f"ALTER TABLE {name} ADD COLUMN {key} INTEGER"))
+
+    # Intern every UUID already stored, then fill the new columns from it
+    for name in KEYED_TABLES:
+        table = Base.metadata.tables[name]
+        intern_keys_in(conn, table)
+        # Indexes move from the UUID columns to the keys
+        keys = {key for _, key in key_columns(table)}
+        for index in table.indexes:
+            if any(column.name in keys for column in index.columns):
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+                index.create(conn)
+
+    # The ledger and cube reference dimensions by key only; recreate and refill them
+    for table in (LedgerLine.__table__, CategoryAccountMonth.__table__):
+        table.drop(conn)
+        table.create(conn)
+    rebuild_ledger(conn)
+    rebuild_cube(conn)
+
+
+def _month_budgets_unique_key(conn):
+    # The old per-row loader could store a category twice for a month; keep the newest row
+    conn.execute(text("""
+        DELETE FROM month_budgets WHERE id NOT IN (
+            SELECT MAX(id) FROM month_budgets GROUP BY budget_id, month, category_id
+        )
+    """))
+    conn.execute(text("DROP INDEX IF EXISTS ix_month_budgets_budget_month"))
+    for index in MonthBudget.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _backfill_balance_history(conn):
+    # Older versions only kept a snapshot on days a sync ran; fill in every day
+    rebuild_balance_history(conn)
+
+
+def _transaction_search_index(conn):
+    # The FTS5 table is not part of the models' metadata; create and fill it here
+    create_search_index(conn)
+    rebuild_search_index(conn)
+
+
+# Applied in order, once per database
+MIGRATIONS = (
+    ("amounts_to_milliunits", _amounts_to_milliunits),
+    ("integer_dimension_keys", _integer_dimension_keys),
+    ("month_budgets_unique_key", _month_budgets_unique_key),
+    ("balance_history_backfill", _backfill_balance_history),
+    ("transaction_search_index", _transaction_search_index),
+)
+
+
+def run_migrations(engine=None):
+    """
+    Apply pending MIGRATIONS to the database behind `engine` (the writer by
+    default), each in its own transaction, at most once even with several workers.
+    """
+    engine = engine or database.engine
+    with engine.connect() as conn:
+        applied = set(conn.execute(text("SELECT name FROM schema_migrations")).scalars())
+    for name, migrate in MIGRATIONS:
+        if name in applied:
+            continue
+        with engine.begin() as conn:
+            # Claiming the name first takes the write lock, so a worker racing us
+            # waits here and then finds the migration done
+            claimed = conn.execute(
+                text("INSERT OR IGNORE INTO schema_migrations (name, created_at, updated_at) "
+                     "VALUES (:name, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"),
+                {"name": name},
+            ).rowcount
+            if claimed:
+                migrate(conn)
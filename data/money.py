@@ -0,0 +1,24 @@
+# money.py
+import numpy as np
+import pandas as pd
+
+# YNAB amounts are integers in thousandths of the currency unit ("milliunits");
+# they are stored and aggregated that way and only divided for display
+MILLIUNITS_PER_UNIT = 1000
+
+
+def to_currency(milliunits):
+    """
+    Milliunits to currency units in one vectorized step (for display only).
+
+    Accepts a scalar, a NumPy array or a pandas Series/column and returns
+    float64 values of the same shape; a Series keeps its index and name.
+    """
+    if isinstance(milliunits, pd.Series):
+        return milliunits.astype("float64") / MILLIUNITS_PER_UNIT
+    return np.asarray(milliunits, dtype="float64") / MILLIUNITS_PER_UNIT
+
+
+def with_currency(df, columns):
+    """Copy of `df` with the given milliunit columns converted to currency units."""
+    return df.assign(**{column: to_currency(df[column]) for column in columns if column in df})
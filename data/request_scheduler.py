@@ -0,0 +1,280 @@
+# request_scheduler.py
+import email.utils
+import random
+import threading
+import time
+
+import urllib3
+from ynab.exceptions import ApiException
+
+# YNAB allows 200 requests per access token in any rolling hour
+YNAB_RATE_LIMIT = 200
+YNAB_RATE_PERIOD = 3600  # seconds
+
+# Called as hook(seconds, call=description, outcome=...) after every request
+# attempt; metrics.instrument_requests() adds the app's timer
+REQUEST_HOOKS = []
+
+
+class YNABError(Exception):
+    """Base class for errors raised by YNABClient instead of returning empty results."""
+
+
+class YNABAPIError(YNABError):
+    """The API answered with an error status that retrying will not fix (e.g. 401, 404)."""
+
+    def __init__(self, message, status=None, body=None):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+class YNABRateLimitError(YNABError):
+    """The hourly quota is used up, locally or as reported by a 429 response."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class YNABTimeoutError(YNABError):
+    """The request timed out on every attempt."""
+
+
+class YNABConnectionError(YNABError):
+    """The API could not be reached, or kept answering 5xx, on every attempt."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket modelling the YNAB request quota.
+
+    Holds at most `capacity` tokens and refills continuously at
+    `capacity / period` tokens per second, approximating YNAB's rolling hour.
+    """
+
+    def __init__(self, capacity=YNAB_RATE_LIMIT, period=YNAB_RATE_PERIOD, clock=time.monotonic):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available. Returns 0 on success, else the seconds until one is."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def remaining(self):
+        """Whole requests that can be made right now."""
+        with self._lock:
+            self._refill()
+            return max(int(self._tokens), 0)
+
+    def sync(self, used, limit):
+        """
+        Align with the server's `X-Rate-Limit: used/limit` header, which is
+        authoritative, in both directions (it also lifts a drain()).
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = float(min(max(limit - used, 0), self.capacity))
+
+    def drain(self, seconds=None):
+        """
+        Use up the bucket, as when the server answers 429: the next token is
+        available in `seconds` if given, otherwise once one refills.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0 if seconds is None else 1 - seconds * self.rate)
+
+
+# One bucket per access token so every YNABClient in the process shares the quota
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(access_token):
+    """Return the process-wide TokenBucket for an access token."""
+    with _buckets_lock:
+        if access_token not in _buckets:
+            _buckets[access_token] = TokenBucket()
+        return _buckets[access_token]
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(retry_at.timestamp() - now, 0.0)
+
+
+def parse_rate_limit(value):
+    """Parse an `X-Rate-Limit` header such as ``"36/200"`` into ``(used, limit)``, or None."""
+    try:
+        used, limit = value.split("/")
+        return int(used), int(limit)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _header(headers, name):
+    if not headers:
+        return None
+    for key, value in headers.items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+def _is_timeout(error):
+    if isinstance(error, urllib3.exceptions.MaxRetryError):
+        error = error.reason
+    # urllib3 derives NewConnectionError from ConnectTimeoutError; a refused
+    # connection is not a timeout
+    if isinstance(error, urllib3.exceptions.NewConnectionError):
+        return False
+    return isinstance(error, (urllib3.exceptions.TimeoutError, TimeoutError))
+
+
+class RequestScheduler:
+    """
+    Runs YNAB SDK calls under the hourly quota, with retries.
+
+    Every attempt takes a token from the shared bucket, waiting up to
+    `max_wait` seconds for one. 429 responses empty the bucket and honor
+    `Retry-After` up to the same `max_wait`; a longer one is raised as a
+    YNABRateLimitError carrying it. 5xx responses, timeouts and connection
+    errors back off exponentially with full jitter. Failures surface as
+    YNABError subclasses so an empty result always means the budget really
+    is empty.
+    """
+
+    def __init__(self, bucket=None, max_retries=4, backoff_base=1.0, backoff_cap=60.0,
+                 max_wait=60.0, sleep=time.sleep, jitter=random.random):
+        self.bucket = bucket or TokenBucket()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_wait = max_wait
+        self._sleep = sleep
+        self._jitter = jitter
+
+    def quota_remaining(self):
+        """Requests left in the current window, so callers can plan their runs."""
+        return self.bucket.remaining()
+
+    def _backoff(self, attempt):
+        return self._jitter() * min(self.backoff_cap, self.backoff_base * (2 ** attempt))
+
+    def _acquire(self, description):
+        waited = 0.0
+        while True:
+            wait = self.bucket.try_acquire()
+            if not wait:
+                return
+            if waited + wait > self.max_wait:
+                raise YNABRateLimitError(
+                    f"YNAB request quota exhausted before {description}", retry_after=wait
+                )
+            self._sleep(wait)
+            waited += wait
+
+    def call(self, description, api_method, *args, **kwargs):
+        """
+        Call an SDK `*_with_http_info` method and return its deserialized body.
+
+        `description` names the call in error messages.
+        """
+        return self._run(description, api_method, *args, **kwargs).data
+
+    def open(self, description, api_method, *args, **kwargs):
+        """
+        Call an SDK `*_without_preload_content` method and return the urllib3
+        response with its body still unread, for callers that stream it.
+
+        Error statuses are retried or raised exactly as in call(); only
+        opening the response is retried, not reading its body.
+        """
+        def checked(*call_args, **call_kwargs):
+            response = api_method(*call_args, **call_kwargs)
+            if not 200 <= response.status <= 299:
+                error = ApiException(status=response.status, reason=response.reason,
+                                     body=response.data.decode("utf-8", "replace"))
+                error.headers = response.headers
+                raise error
+            return response
+
+        return self._run(description, checked, *args, **kwargs)
+
+    def _run(self, description, api_method, *args, **kwargs):
+        """The retry loop shared by call() and open(); returns the successful response."""
+        attempt = 0
+        while True:
+            self._acquire(description)
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                response = api_method(*args, **kwargs)
+                outcome = "ok"
+            except ApiException as e:
+                outcome = str(e.status)
+                if e.status == 429:
+                    retry_after = parse_retry_after(_header(e.headers, "Retry-After"))
+                    # The server's count is authoritative; make quota_remaining() show it
+                    self.bucket.drain(retry_after)
+                    if attempt >= self.max_retries or (retry_after or 0) > self.max_wait:
+                        raise YNABRateLimitError(
+                            f"YNAB rate limit hit while {description}", retry_after=retry_after
+                        ) from e
+                    delay = retry_after if retry_after is not None else self._backoff(attempt)
+                elif e.status and 500 <= e.status <= 599:
+                    if attempt >= self.max_retries:
+                        raise YNABConnectionError(
+                            f"YNAB server error {e.status} while {description}"
+                        ) from e
+                    delay = self._backoff(attempt)
+                else:
+                    raise YNABAPIError(
+                        f"YNAB API error {e.status} while {description}: {e.reason}",
+                        status=e.status, body=e.body
+                    ) from e
+            except urllib3.exceptions.HTTPError as e:
+                outcome = "timeout" if _is_timeout(e) else "connection_error"
+                if attempt >= self.max_retries:
+                    if _is_timeout(e):
+                        raise YNABTimeoutError(f"Timed out while {description}") from e
+                    raise YNABConnectionError(f"Could not reach YNAB while {description}: {e}") from e
+                delay = self._backoff(attempt)
+            else:
+                rate_limit = parse_rate_limit(_header(response.headers, "X-Rate-Limit"))
+                if rate_limit:
+                    self.bucket.sync(*rate_limit)
+                return response
+            finally:
+                elapsed = time.perf_counter() - started
+                for hook in REQUEST_HOOKS:
+                    hook(elapsed, call=description, outcome=outcome)
+
+            attempt += 1
+            self._sleep(delay)
@@ -0,0 +1,186 @@
+# search.py
+"""
+Full-text search over transactions.
+
+`transaction_search` is an SQLite FTS5 table holding one document per
+transaction, keyed by the transaction's rowid: its memo, payee name and
+category name (plus those of its live subtransactions, for splits). Like the
+ledger lines it is kept in step by the writers: refreshed for the
+transactions they store, emptied of the ones they delete (before the rows go,
+while their rowids can still be looked up), and refreshed for every
+transaction of a payee or category whose name changed.
+
+Rowids of `transactions` are stable under inserts, upserts and deletes but
+not under VACUUM; run rebuild_search_index() after one.
+
+Queries match whole words or, by default, word prefixes, and come back
+ranked by BM25 or most recently stored first.
+"""
+import re
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from data import database
+from data.bulk_writer import LOOKUP_CHUNK_SIZE, chunked
+
+SEARCH_TABLE = "transaction_search"
+
+# Rows returned by search_transactions() unless asked for more
+SEARCH_LIMIT = 50
+
+# unicode61 folds case and (with remove_diacritics) accents; the prefix
+# indexes answer 2 and 3 character prefix queries without a term range scan
+_CREATE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        memo, payee, category,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+"""
+
+# Documents of the transactions matching {where} (on alias t). Split parts are
+# looked up per transaction through ix_subtransactions_transaction.
+_DOCUMENTS_INSERT = f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, memo, payee, category)
+    SELECT t.rowid,
+           trim(COALESCE(t.memo, '') || ' ' || COALESCE(
+               (SELECT group_concat(s.memo, ' ') FROM subtransactions s
+                WHERE s.transaction_id = t.id AND NOT s.deleted), '')),
+           trim(COALESCE(p.name, '') || ' ' || COALESCE(
+               (SELECT group_concat(sp.name, ' ') FROM subtransactions s JOIN payees sp ON sp.key = s.payee_key
+                WHERE s.transaction_id = t.id AND NOT s.deleted), '')),
+           trim(COALESCE(c.name, '') || ' ' || COALESCE(
+               (SELECT group_concat(sc.name, ' ') FROM subtransactions s JOIN categories sc ON sc.key = s.category_key
+                WHERE s.transaction_id = t.id AND NOT s.deleted), ''))
+    FROM transactions t
+    LEFT JOIN payees p ON p.key = t.payee_key
+    LEFT JOIN categories c ON c.key = t.category_key
+    WHERE {{where}}
+"""
+
+_DOCUMENTS_DELETE = f"""
+    DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT t.rowid FROM transactions t WHERE {{where}})
+"""
+
+_CHUNK_DELETE = text(_DOCUMENTS_DELETE.format(where="t.id IN :ids")).bindparams(bindparam("ids", expanding=True))
+
+_CHUNK_INSERT = text(_DOCUMENTS_INSERT.format(where="t.id IN :ids")).bindparams(bindparam("ids", expanding=True))
+
+_STORED_NAMES = {
+    table: text(f"SELECT id, key, name FROM {table} WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+    for table in ("payees", "categories")
+}
+
+# Transactions showing any of the given payee or category keys, on themselves or a split part
+_NAMED_TRANSACTIONS = """
+    SELECT id FROM transactions WHERE {column} IN ({keys})
+    UNION SELECT transaction_id FROM subtransactions WHERE {column} IN ({keys})
+"""
+
+
+def create_search_index(session):
+    session.execute(text(_CREATE))
+
+
+def refresh_search_index(session, transaction_ids):
+    """
+    Rewrite the documents of the given transactions from the current rows.
+    Ids that no longer exist are skipped; remove those with
+    remove_from_search_index() before deleting them.
+    """
+    for chunk in chunked(transaction_ids, LOOKUP_CHUNK_SIZE):
+        session.execute(_CHUNK_DELETE, {"ids": chunk})
+        session.execute(_CHUNK_INSERT, {"ids": chunk})
+
+
+def refresh_search_index_in(session, id_query):
+    """Like refresh_search_index() for the transaction ids returned by the SQL `id_query`."""
+    session.execute(text(_DOCUMENTS_DELETE.format(where=f"t.id IN ({id_query})")))
+    session.execute(text(_DOCUMENTS_INSERT.format(where=f"t.id IN ({id_query})")))
+
+
+def remove_from_search_index(session, transaction_ids):
+    """Drop the documents of transactions about to be deleted."""
+    for chunk in chunked(transaction_ids, LOOKUP_CHUNK_SIZE):
+        session.execute(_CHUNK_DELETE, {"ids": chunk})
+
+
+def remove_from_search_index_in(session, id_query):
+    """Like remove_from_search_index() for the transaction ids returned by the SQL `id_query`."""
+    session.execute(text(_DOCUMENTS_DELETE.format(where=f"t.id IN ({id_query})")))
+
+
+def renamed_keys(session, table, rows):
+    """Keys of the stored `table` ('payees' or 'categories') rows whose name differs in `rows`."""
+    names = {row["id"]: row["name"] for row in rows}
+    return [
+        key
+        for chunk in chunked(list(names), LOOKUP_CHUNK_SIZE)
+        for id_, key, name in session.execute(_STORED_NAMES[table], {"ids": chunk})
+        if name != names[id_]
+    ]
+
+
+def refresh_renamed(session, payee_keys=(), category_keys=()):
+    """Refresh the documents of every transaction naming one of these payees or categories."""
+    for column, keys in (("payee_key", payee_keys), ("category_key", category_keys)):
+        for chunk in chunked(keys, LOOKUP_CHUNK_SIZE):
+            # Keys are integers from the database, safe to inline
+            refresh_search_index_in(session, _NAMED_TRANSACTIONS.format(
+                column=column, keys=", ".join(str(int(key)) for key in chunk)
+            ))
+
+
+def rebuild_search_index(session):
+    """Recompute every document, e.g. after a full resync or on an existing database."""
+    session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    session.execute(text(_DOCUMENTS_INSERT.format(where="1")))
+    session.execute(text(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')"))
+
+
+def match_expression(query, prefix=True):
+    """
+    FTS5 MATCH expression for free text typed by a user: every word must
+    match (as a word prefix unless `prefix=False`). Returns None without words.
+    """
+    words = re.findall(r"\w+", query or "")
+    if not words:
+        return None
+    star = "*" if prefix else ""
+    return " ".join(f'"{word}"{star}' for word in words)
+
+
+def search_transactions(query, limit=SEARCH_LIMIT, prefix=True, ranked=True):
+    """
+    The `limit` best matches for `query` across memo, payee and category,
+    most relevant first, as a DataFrame with the transaction's date, account,
+    payee, category, memo, amount (integer milliunits), id and rank.
+
+    Ranking scores every match; with `ranked=False` the most recently stored
+    matches come back instead, which stops after `limit` hits and stays fast
+    for words found in a large share of the transactions.
+    """
+    expression = match_expression(query, prefix=prefix)
+    if expression is None:
+        return pd.DataFrame(columns=["date", "account", "payee", "category", "memo", "amount", "id", "rank"])
+
+    order = "rank" if ranked else "rowid DESC"
+    sql = text(f"""
+        SELECT t.date, a.name AS account, p.name AS payee, c.name AS category, t.memo, t.amount, t.id, m.rank
+        FROM (
+            SELECT rowid, {"rank" if ranked else "NULL AS rank"} FROM {SEARCH_TABLE}
+            WHERE {SEARCH_TABLE} MATCH :expression
+            ORDER BY {order}
+            LIMIT :limit
+        ) m
+        JOIN transactions t ON t.rowid = m.rowid
+        LEFT JOIN accounts a ON a.key = t.account_key
+        LEFT JOIN payees p ON p.key = t.payee_key
+        LEFT JOIN categories c ON c.key = t.category_key
+        ORDER BY m.{order}
+    """)
+    with database.read_engine.connect() as conn:
+        df = pd.read_sql(sql, conn, params={"expression": expression, "limit": limit})
+    df["date"] = pd.to_datetime(df["date"])
+    return df
@@ -0,0 +1,104 @@
+# snapshot_cache.py
+import fcntl
+import glob
+import os
+import tempfile
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+_ARROW_STRINGS = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+
+# Default location of the shared snapshots; all workers on a host must agree on it
+DEFAULT_SNAPSHOT_DIR = os.path.join("data", "cache")
+
+
+class SnapshotCache:
+    """
+    Disk-backed DataFrame cache shared by every worker process on a host.
+
+    Each (name, data version) pair is written once as an uncompressed Feather
+    (Arrow IPC) file. Workers open it memory-mapped, so the column buffers live
+    in the OS page cache once per host instead of once per worker, and a worker
+    starting cold reads a file rather than re-running the SQL query. A file lock
+    makes sure only one worker builds a missing snapshot.
+    """
+
+    def __init__(self, directory=DEFAULT_SNAPSHOT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # Memory-mapped tables opened by this process, by name: (version, table)
+        self._tables = {}
+        # DataFrames materialized from them, by name: (version, frame)
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name, version):
+        return os.path.join(self.directory, f"{name}-v{version}.feather")
+
+    def get_table(self, name, version, loader):
+        """Return the memory-mapped Arrow table for `name` at `version`, building it with `loader()` if needed."""
+        with self._lock:
+            cached = self._tables.get(name)
+            if cached and cached[0] == version:
+                return cached[1]
+
+            path = self._path(name, version)
+            if not os.path.exists(path):
+                self._build(name, version, loader)
+            table = feather.read_table(path, memory_map=True)
+            self._tables[name] = (version, table)
+            return table
+
+    def get(self, name, version, loader):
+        """
+        Like get_table() but returns a pandas DataFrame, converted once per
+        version and shared by every caller in this process; do not modify it.
+
+        Numeric, datetime and categorical-code columns are read-only views of
+        the mapped file rather than copies (only bools, which Arrow bit-packs,
+        are unpacked), so holding the frame costs each worker next to nothing.
+        """
+        with self._lock:
+            cached = self._frames.get(name)
+            if cached and cached[0] == version:
+                return cached[1]
+        # Strings stay Arrow-backed, as data.frames loads them, instead of becoming Python objects.
+        # One block per column keeps pandas from consolidating (copying) the mapped buffers
+        frame = self.get_table(name, version, loader).to_pandas(
+            types_mapper=_ARROW_STRINGS.get, split_blocks=True, self_destruct=False
+        )
+        with self._lock:
+            self._frames[name] = (version, frame)
+        return frame
+
+    def _build(self, name, version, loader):
+        path = self._path(name, version)
+        with open(os.path.join(self.directory, f"{name}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Another worker may have finished it while we waited for the lock
+                if os.path.exists(path):
+                    return
+                table = pa.Table.from_pandas(loader(), preserve_index=False).combine_chunks()
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                os.close(fd)
+                # Uncompressed, in a single record batch, so readers can use the mapped
+                # buffers directly; a column split over batches is copied to be joined
+                feather.write_feather(table, tmp_path, compression="uncompressed",
+                                      chunksize=max(table.num_rows, 1))
+                os.replace(tmp_path, path)
+                self._remove_stale(name, keep=path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _remove_stale(self, name, keep):
+        # Readers that still map an old file keep working: unlinking only drops the name
+        for stale in glob.glob(os.path.join(self.directory, f"{name}-v*.feather")):
+            if stale != keep:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
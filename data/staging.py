@@ -0,0 +1,278 @@
+# staging.py
+"""
+Shadow tables for atomic syncs.
+
+A staged sync first writes everything it downloaded into TEMPORARY copies of
+the ledger tables (`staging_<table>`), which live on the sync's own connection
+(from database.staging_engine, not the pooled writer) and take no lock on the
+main database; staged rows carry raw UUIDs only. Only then does it check
+referential integrity, assign dimension keys and merge the staged rows into
+the real tables with a handful of INSERT ... SELECT statements in the same
+transaction as the server_knowledge and data version updates. Readers
+therefore see either the previous sync or the complete new one, and neither
+SQLite's write lock nor the writer connection is held during the download;
+other writers wait only for the merge (up to SQLITE_BUSY_TIMEOUT_MS).
+"""
+from sqlalchemy import Column, MetaData, String, Table, UniqueConstraint, text
+
+from data.aggregates import rebuild_cube, refresh_cube
+from data.balance_history import rebuild_balance_history, refresh_balance_history
+from data.ledger import rebuild_ledger, refresh_ledger_lines_in
+from data.search import rebuild_search_index, refresh_renamed, refresh_search_index_in, remove_from_search_index_in
+from data.database import (
+    Account, AccountBalanceHistory, Budget, Category, MonthBudget, Payee, SubTransaction, Transaction
+)
+from data.bulk_writer import upsert_rows
+from data.dimensions import intern_keys_in
+
+STAGING_PREFIX = "staging_"
+
+# Tables a sync writes, in publish order (referenced rows before referencing ones),
+# with the columns that identify a row when merging
+STAGED_MODELS = (
+    (Category, ("id",)),
+    (Payee, ("id",)),
+    (Account, ("id",)),
+    (AccountBalanceHistory, ("account_id", "date")),
+    (Budget, ("id",)),
+    (MonthBudget, ("budget_id", "month", "category_id")),
+    (Transaction, ("id",)),
+    (SubTransaction, ("id",)),
+)
+
+# Foreign keys checked before publishing: (staged model, column, referenced model).
+# A NULL reference is allowed; anything else must exist staged or already published.
+INTEGRITY_CHECKS = (
+    (Transaction, "account_id", Account),
+    (Transaction, "payee_id", Payee),
+    (Transaction, "category_id", Category),
+    (SubTransaction, "transaction_id", Transaction),
+    (SubTransaction, "payee_id", Payee),
+    (SubTransaction, "category_id", Category),
+    (AccountBalanceHistory, "account_id", Account),
+    (MonthBudget, "budget_id", Budget),
+    (MonthBudget, "category_id", Category),
+)
+
+_metadata = MetaData()
+
+# Ids of transactions YNAB reported as deleted
+deleted_transactions = Table(
+    f"{STAGING_PREFIX}deleted_transactions", _metadata,
+    Column("id", String, primary_key=True),
+    prefixes=["TEMPORARY"],
+)
+
+
+class SyncIntegrityError(Exception):
+    """Staged data references rows that exist neither staged nor published; nothing was written."""
+
+    def __init__(self, message, problems=None):
+        super().__init__(message)
+        self.problems = problems or {}
+
+
+def staging_table(model):
+    """The TEMPORARY shadow of `model`'s table: same columns and defaults, keyed on its merge key, no FKs."""
+    table = model.__table__
+    name = STAGING_PREFIX + table.name
+    if name not in _metadata.tables:
+        # Staged rows are deduplicated on the merge key, whether or not the real table
+        # enforces it; surrogate ids of the real table are left unset
+        key_columns = _merge_keys()[model]
+        columns = [
+            Column(column.name, column.type, primary_key=key_columns == (column.name,), autoincrement=False,
+                   default=column.default.arg if column.default is not None else None)
+            for column in table.columns
+        ]
+        uniques = [] if len(key_columns) == 1 else [UniqueConstraint(*key_columns)]
+        Table(name, _metadata, *columns, *uniques, prefixes=["TEMPORARY"])
+    return _metadata.tables[name]
+
+
+def _merge_keys():
+    return dict(STAGED_MODELS)
+
+
+def _staging_tables():
+    return [staging_table(model) for model, _ in STAGED_MODELS] + [deleted_transactions]
+
+
+def create_staging_tables(session):
+    """(Re)create empty shadow tables on the session's connection."""
+    connection = session.connection()
+    drop_staging_tables(session)
+    for table in _staging_tables():
+        table.create(connection)
+
+
+def drop_staging_tables(session):
+    connection = session.connection()
+    for table in _staging_tables():
+        connection.execute(text(f"DROP TABLE IF EXISTS temp.{table.name}"))
+
+
+def stage_rows(session, model, rows, chunk_size=None):
+    """
+    Write rows for `model` into its shadow table (later rows for the same merge
+    key win). Their key columns stay empty until publish() resolves them, so
+    staging never writes to the main database.
+    """
+    return upsert_rows(session, staging_table(model), rows,
+                       conflict_columns=list(_merge_keys()[model]), chunk_size=chunk_size)
+
+
+def stage_deleted_transactions(session, transaction_ids, chunk_size=None):
+    return upsert_rows(session, deleted_transactions, ({"id": txn_id} for txn_id in transaction_ids),
+                       chunk_size=chunk_size)
+
+
+def check_integrity(session):
+    """Raise SyncIntegrityError if a staged row references a missing row."""
+    problems = {}
+    for model, column, parent in INTEGRITY_CHECKS:
+        staged, parent_table = staging_table(model).name, parent.__tablename__
+        missing = session.execute(text(f"""
+            SELECT COUNT(*) FROM temp.{staged} s
+            WHERE s.{column} IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM temp.{STAGING_PREFIX}{parent_table} p WHERE p.id = s.{column})
+              AND NOT EXISTS (SELECT 1 FROM {parent_table} p WHERE p.id = s.{column})
+        """)).scalar()
+        if missing:
+            problems[f"{model.__tablename__}.{column}"] = missing
+    if problems:
+        details = ", ".join(f"{name}: {count}" for name, count in problems.items())
+        raise SyncIntegrityError(f"Staged sync references missing rows ({details})", problems)
+
+
+def _has_unique_key(table, key_columns):
+    keys = [tuple(column.name for column in table.primary_key)]
+    keys += [
+        tuple(column.name for column in constraint.columns)
+        for constraint in table.constraints if isinstance(constraint, UniqueConstraint)
+    ]
+    keys += [tuple(column.name for column in index.columns) for index in table.indexes if index.unique]
+    return any(set(key) == set(key_columns) for key in keys)
+
+
+def merge_staged(session, model, key_columns):
+    """Insert or update every staged row of `model` into the real table, matching on `key_columns`."""
+    table = model.__table__
+    staged = staging_table(model).name
+    autoincrement = [column.name for column in table.primary_key if column.name not in key_columns]
+    columns = [column.name for column in table.columns if column.name not in autoincrement]
+    updates = [name for name in columns if name not in key_columns and name != "created_at"]
+    column_list = ", ".join(columns)
+
+    if _has_unique_key(table, key_columns):
+        set_clause = ", ".join(f"{name} = excluded.{name}" for name in updates)
+        conflict = "DO UPDATE SET " + set_clause if updates else "DO NOTHING"
+        # WHERE true keeps SQLite from reading ON CONFLICT as a join constraint
+        session.execute(text(f"""
+            INSERT INTO {table.name} ({column_list})
+            SELECT {column_list} FROM temp.{staged} WHERE true
+            ON CONFLICT ({", ".join(key_columns)}) {conflict}
+        """))
+        return
+
+    # No unique index to conflict on: update matches, then insert the rest
+    match = " AND ".join(f"{table.name}.{name} = s.{name}" for name in key_columns)
+    if updates:
+        session.execute(text(f"""
+            UPDATE {table.name} SET {", ".join(f"{name} = s.{name}" for name in updates)}
+            FROM temp.{staged} s WHERE {match}
+        """))
+    session.execute(text(f"""
+        INSERT INTO {table.name} ({column_list})
+        SELECT {column_list} FROM temp.{staged} s
+        WHERE NOT EXISTS (SELECT 1 FROM {table.name} WHERE {match})
+    """))
+
+
+def _touched_cells(session):
+    """Cube cells the staged and deleted transactions leave (old values) or enter (new values)."""
+    rows = session.execute(text(f"""
+        SELECT t.account_key, substr(t.date, 1, 7) FROM transactions t
+        WHERE t.id IN (SELECT id FROM temp.{staging_table(Transaction).name})
+           OR t.id IN (SELECT id FROM temp.{deleted_transactions.name})
+        UNION
+        SELECT account_key, substr(date, 1, 7) FROM temp.{staging_table(Transaction).name}
+    """))
+    return {(account_key, month) for account_key, month in rows}
+
+
+def _renamed_keys(session, model):
+    """Keys of published rows of `model` whose staged copy has another name."""
+    return list(session.execute(text(f"""
+        SELECT d.key FROM {model.__tablename__} d
+        JOIN temp.{staging_table(model).name} s ON s.id = d.id
+        WHERE d.name IS NOT s.name
+    """)).scalars())
+
+
+def publish(session, full_resync=False):
+    """
+    Assign the staged rows' dimension keys, check them and merge them into
+    the real tables.
+
+    Transactions reported deleted are removed, and so are split parts a
+    staged transaction no longer has. With `full_resync` the staged
+    transactions are the complete set, so every other transaction is removed
+    too and the ledger lines, cube, daily balance history and search index
+    are rebuilt; otherwise only the lines and search documents of the touched
+    transactions (and of those naming a renamed payee or category), the
+    touched cube cells and the balance history from the touched months on
+    are refreshed.
+    Runs in the session's transaction, which must not have read the main
+    database yet; the caller commits.
+    Returns the number of transactions removed.
+    """
+    # Interning writes first, which takes the write lock (waiting for other
+    # writers) together with this transaction's first view of the main
+    # database, so a commit made elsewhere during the download is seen rather
+    # than leaving the transaction on a snapshot it can no longer write from
+    for model, _ in STAGED_MODELS:
+        table = staging_table(model)
+        intern_keys_in(session, table, f"temp.{table.name}")
+    check_integrity(session)
+    staged_transactions = staging_table(Transaction).name
+
+    if not full_resync:
+        cells = _touched_cells(session)
+        renamed = {"payee_keys": _renamed_keys(session, Payee), "category_keys": _renamed_keys(session, Category)}
+
+    for model, key_columns in STAGED_MODELS:
+        merge_staged(session, model, key_columns)
+    # A staged transaction carries all of its split parts, so parts it no longer
+    # has (a split turned back into a single category) are removed with it
+    session.execute(text(f"""
+        DELETE FROM subtransactions
+        WHERE transaction_id IN (SELECT id FROM temp.{staged_transactions})
+          AND id NOT IN (SELECT id FROM temp.{staging_table(SubTransaction).name})
+    """))
+
+    if full_resync:
+        doomed = f"SELECT id FROM transactions WHERE id NOT IN (SELECT id FROM temp.{staged_transactions})"
+    else:
+        doomed = f"SELECT id FROM temp.{deleted_transactions.name}"
+    if not full_resync:
+        # Search documents are found by rowid, so they go before their transactions
+        remove_from_search_index_in(session, doomed)
+    session.execute(text(f"DELETE FROM subtransactions WHERE transaction_id IN ({doomed})"))
+    removed = session.execute(text(f"DELETE FROM transactions WHERE id IN ({doomed})")).rowcount
+
+    if full_resync:
+        rebuild_ledger(session)
+        rebuild_cube(session)
+        rebuild_balance_history(session)
+        rebuild_search_index(session)
+    else:
+        refresh_ledger_lines_in(session, f"""
+            SELECT id FROM temp.{staged_transactions}
+            UNION SELECT id FROM temp.{deleted_transactions.name}
+        """)
+        refresh_cube(session, cells)
+        refresh_balance_history(session, cells)
+        refresh_search_index_in(session, f"SELECT id FROM temp.{staged_transactions}")
+        refresh_renamed(session, **renamed)
+    return removed
@@ -0,0 +1,232 @@
+# sync_scheduler.py
+import datetime
+import fcntl
+import os
+import threading
+import time
+
+from flask import jsonify
+
+from data.database import ReadSessionLocal, SessionLocal, SyncRun
+from data.request_scheduler import YNAB_RATE_PERIOD, YNABRateLimitError
+
+# Seconds between incremental syncs. The background sync is opt-in: it stays
+# off (0) unless an interval is configured, e.g. YNAB_SYNC_INTERVAL=900
+SYNC_INTERVAL = int(os.environ.get("YNAB_SYNC_INTERVAL", "0"))
+
+# Lock file shared by every worker on the host, so only one of them syncs at a time
+SYNC_LOCK_PATH = os.environ.get("YNAB_SYNC_LOCK", os.path.join("data", "sync.lock"))
+
+# Below this many API requests left in the hour the interval is stretched
+QUOTA_LOW = 40
+
+# How often an idle worker wakes up to check whether a sync is due
+POLL_SECONDS = 60
+
+# sync_runs rows kept per budget
+HISTORY_KEEP = 200
+
+
+def _utcnow():
+    return datetime.datetime.utcnow()
+
+
+def next_interval(interval, quota_remaining):
+    """
+    Seconds to wait before the next sync.
+
+    With plenty of quota this is `interval`. Below QUOTA_LOW requests left it
+    grows in proportion to how scarce they are, up to one full rate-limit
+    window, so background syncs never starve interactive use of the token.
+    """
+    if quota_remaining is None or quota_remaining >= QUOTA_LOW:
+        return interval
+    stretched = interval * QUOTA_LOW / max(quota_remaining, 1)
+    return min(max(stretched, interval), max(YNAB_RATE_PERIOD, interval))
+
+
+class SyncScheduler:
+    """
+    Runs incremental syncs of one budget on a daemon thread.
+
+    Every worker process may start one; a file lock makes sure only one of
+    them syncs at a time, and the schedule itself lives in the sync_runs table
+    (the latest finished run's next_run_at), so workers agree on when the next
+    sync is due. sync_all_data bumps the data version after it commits, which
+    is what makes each worker's dashboard caches reload.
+    """
+
+    def __init__(self, budget_id, interval=SYNC_INTERVAL, lock_path=SYNC_LOCK_PATH,
+                 client_factory=None, sync=None):
+        self.budget_id = budget_id
+        self.interval = interval
+        self.lock_path = lock_path
+        # Builds the client for each run (YNABClient by default)
+        self.client_factory = client_factory
+        # Runs the sync, called like data_loader.sync_all_data (which it defaults
+        # to), e.g. wrapped by the app's profiler
+        self.sync = sync
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.budget_id) and self.interval > 0
+
+    def start(self):
+        """Start the background thread (once per process; later calls are no-ops)."""
+        if self._thread is not None or not self.enabled:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="ynab-sync", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_if_due()
+            except Exception as e:
+                # Never let one bad run kill the thread; the failure is in sync_runs
+                print(f"Background sync error: {e}")
+            self._stop.wait(min(POLL_SECONDS, self.interval))
+
+    def _due(self, session):
+        last = (
+            session.query(SyncRun)
+            .filter(SyncRun.budget_id == self.budget_id, SyncRun.status != "running")
+            .order_by(SyncRun.started_at.desc())
+            .first()
+        )
+        return last is None or last.next_run_at is None or last.next_run_at <= _utcnow()
+
+    def run_if_due(self, force=False):
+        """
+        Sync now if the schedule says so (or `force`) and no other worker is
+        syncing. Returns the finished SyncRun's id, or None if nothing ran.
+        """
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        with open(self.lock_path, "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None  # another worker is syncing
+            try:
+                with SessionLocal() as session:
+                    if not force and not self._due(session):
+                        return None
+                return self._run()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _client(self):
+        if self.client_factory:
+            return self.client_factory()
+        # Imported here so a supplied factory needs no YNAB credentials
+        from data.ynab_calls import YNABClient
+
+        return YNABClient()
+
+    def _run(self):
+        from data.data_loader import sync_all_data
+
+        started = _utcnow()
+        with SessionLocal() as session:
+            run = SyncRun(budget_id=self.budget_id, status="running", started_at=started)
+            session.add(run)
+            session.commit()
+            run_id = run.id
+
+        status, changed, error, quota, wait = "ok", None, None, None, self.interval
+        start = time.perf_counter()
+        client = None
+        try:
+            # Inside the try so a client that cannot be built (no token, bad
+            # config) still finishes the run as failed
+            client = self._client()
+            changed = (self.sync or sync_all_data)(self.budget_id, client=client)
+        except YNABRateLimitError as e:
+            status, error = "failed", str(e)
+            wait = max(self.interval, e.retry_after or 0)
+        except Exception as e:
+            # Recorded in sync_runs rather than raised; a failed sync commits nothing
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            if client is not None:
+                quota = client.quota_remaining()
+                client.close()
+        duration = time.perf_counter() - start
+        wait = next_interval(wait, quota)
+
+        finished = _utcnow()
+        with SessionLocal() as session:
+            run = session.get(SyncRun, run_id)
+            run.status = status
+            run.finished_at = finished
+            run.duration = duration
+            run.transactions_changed = changed
+            run.quota_remaining = quota
+            run.next_run_at = finished + datetime.timedelta(seconds=wait)
+            run.error = error
+            stale = (
+                session.query(SyncRun.id)
+                .filter(SyncRun.budget_id == self.budget_id)
+                .order_by(SyncRun.started_at.desc())
+                .offset(HISTORY_KEEP)
+                .all()
+            )
+            if stale:
+                session.query(SyncRun).filter(SyncRun.id.in_([r.id for r in stale])).delete(
+                    synchronize_session=False
+                )
+            session.commit()
+        return run_id
+
+
+def get_sync_status(budget_id=None, limit=10):
+    """The latest sync runs, newest first, as plain dicts."""
+    with ReadSessionLocal() as session:
+        query = session.query(SyncRun)
+        if budget_id:
+            query = query.filter(SyncRun.budget_id == budget_id)
+        runs = query.order_by(SyncRun.started_at.desc()).limit(limit).all()
+        return [
+            {
+                "id": run.id,
+                "budget_id": run.budget_id,
+                "status": run.status,
+                "started_at": run.started_at.isoformat(),
+                "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+                "duration": run.duration,
+                "transactions_changed": run.transactions_changed,
+                "quota_remaining": run.quota_remaining,
+                "next_run_at": run.next_run_at.isoformat() if run.next_run_at else None,
+                "error": run.error,
+            }
+            for run in runs
+        ]
+
+
+def register_sync(server, scheduler):
+    """
+    Start `scheduler` with the first request each worker serves (threads do
+    not survive a pre-fork, and the reloader's parent process never serves)
+    and expose its history on `/sync/status`.
+    """
+    @server.before_request
+    def start_sync_scheduler():
+        scheduler.start()
+
+    @server.route("/sync/status")
+    def sync_status():
+        return jsonify({
+            "enabled": scheduler.enabled,
+            "interval": scheduler.interval,
+            "runs": get_sync_status(scheduler.budget_id),
+        })
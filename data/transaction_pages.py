@@ -0,0 +1,143 @@
+# transaction_pages.py
+"""
+Server-side pages of the transactions table, with keyset pagination.
+
+A page is found by seeking past the last row of the previous one
+(`WHERE (date, ...) > (:cursor)`), never with OFFSET, so page 1,000 reads
+as few index entries as page 1. Each filter walks one of the transactions
+indexes in its own order:
+
+- a category filter uses ix_transactions_category_date, ordered by (date, rowid);
+- a payee filter uses ix_transactions_payee_date, ordered by (date, rowid);
+- otherwise ix_transactions_date_account is used, ordered by
+  (date, account_key, rowid); an account filter is checked on its entries.
+
+The rowid is in every index entry and breaks ties between rows with the same
+key. Names are joined onto just the rows of the page.
+"""
+from collections import namedtuple
+
+import pandas as pd
+from sqlalchemy import text
+
+from data import database
+
+# Rows per page of the transactions grid
+PAGE_SIZE = 50
+
+# Filter -> (index walked, columns of the keyset order)
+_PATHS = {
+    "category": ("ix_transactions_category_date", ("date", "rowid")),
+    "payee": ("ix_transactions_payee_date", ("date", "rowid")),
+    "date": ("ix_transactions_date_account", ("date", "account_key", "rowid")),
+}
+
+_KEY_LOOKUPS = {
+    "account_key": text("SELECT key FROM accounts WHERE id = :id"),
+    "category_key": text("SELECT key FROM categories WHERE id = :id"),
+    "payee_key": text("SELECT key FROM payees WHERE id = :id"),
+}
+
+# `rows` is a DataFrame of the page; `first` and `last` are the cursors of its
+# first and last rows (JSON-serializable lists) to pass as `before` / `after`
+TransactionPage = namedtuple("TransactionPage", "rows first last has_previous has_next")
+
+
+def _path(category_key, payee_key):
+    if category_key is not None:
+        return _PATHS["category"]
+    if payee_key is not None:
+        return _PATHS["payee"]
+    return _PATHS["date"]
+
+
+def get_transaction_page(after=None, before=None, account_id=None, category_id=None, payee_id=None,
+                         start_date=None, end_date=None, descending=True, page_size=PAGE_SIZE):
+    """
+    One page of transactions matching the filters, newest first unless
+    `descending=False`. Amounts are integer milliunits.
+
+    Without a cursor the first page is returned; `after` gives the page
+    following a page whose `last` cursor it is, and `before` the page
+    preceding a page whose `first` cursor it is. Change the filters or the
+    order only together with starting over from the first page.
+
+    The category and payee filters match the transaction itself; split
+    transactions are listed under their split category.
+    """
+    with database.read_engine.connect() as conn:
+        keys = {}
+        for column, uuid in (("account_key", account_id), ("category_key", category_id), ("payee_key", payee_id)):
+            if uuid:
+                keys[column] = conn.execute(_KEY_LOOKUPS[column], {"id": uuid}).scalar()
+                if keys[column] is None:
+                    return TransactionPage(pd.DataFrame(), None, None, False, False)
+        index, order = _path(keys.get("category_key"), keys.get("payee_key"))
+
+        # Unary + keeps SQLite from dropping account_key from the ORDER BY as a
+        # constant, which would stop it matching the index order and add a sort
+        conditions = [f"{'+' if column == 'account_key' else ''}{column} = :{column}" for column in keys]
+        params = dict(keys, limit=page_size + 1)
+        if start_date:
+            conditions.append("date >= :start_date")
+            params["start_date"] = start_date.isoformat()
+        if end_date:
+            conditions.append("date <= :end_date")
+            params["end_date"] = end_date.isoformat()
+
+        # Walking backwards (before=) reads the index the other way, then flips the rows
+        backwards = before is not None
+        reverse = descending != backwards
+        cursor = before if backwards else after
+        if cursor is not None:
+            placeholders = [f":cursor_{i}" for i in range(len(order))]
+            conditions.append(f"({', '.join(order)}) {'<' if reverse else '>'} ({', '.join(placeholders)})")
+            params.update({name[1:]: value for name, value in zip(placeholders, cursor)})
+        direction = " DESC" if reverse else ""
+        ordering = ", ".join(f"{column}{direction}" for column in order)
+        outer_ordering = ", ".join(f"t.{column}{direction}" for column in order)
+
+        query = text(f"""
+            SELECT t.rowid AS rowid, t.date, t.account_key, a.name AS account, p.name AS payee,
+                   c.name AS category, t.memo, t.amount, t.cleared, t.approved, t.id
+            FROM (
+                SELECT rowid AS rowid, id, date, account_key, payee_key, category_key, memo, amount, cleared, approved
+                FROM transactions INDEXED BY {index}
+                {"WHERE " + " AND ".join(conditions) if conditions else ""}
+                ORDER BY {ordering}
+                LIMIT :limit
+            ) t
+            LEFT JOIN accounts a ON a.key = t.account_key
+            LEFT JOIN payees p ON p.key = t.payee_key
+            LEFT JOIN categories c ON c.key = t.category_key
+            ORDER BY {outer_ordering}
+        """)
+        df = pd.read_sql(query, conn, params=params)
+
+    more = len(df) > page_size
+    df = df.iloc[:page_size]
+    if backwards:
+        df = df.iloc[::-1]
+    df = df.reset_index(drop=True)
+    if df.empty:
+        return TransactionPage(df, None, None, False, False)
+
+    # Plain ints so the cursors survive a dcc.Store round trip and bind as integers
+    first, last = ([row["date"], *(int(row[column]) for column in order[1:])] for row in (df.iloc[0], df.iloc[-1]))
+    df = df.drop(columns=["rowid", "account_key"])
+    df["date"] = pd.to_datetime(df["date"])
+    if backwards:
+        return TransactionPage(df, first, last, more, True)
+    return TransactionPage(df, first, last, after is not None, more)
+
+
+def get_filter_choices():
+    """(id, name) DataFrames of the accounts, categories and payees a page can be filtered by."""
+    queries = {
+        "accounts": "SELECT id, name FROM accounts WHERE NOT deleted ORDER BY name",
+        "categories": "SELECT id, group_name || ': ' || name AS name FROM categories WHERE NOT deleted "
+                      "ORDER BY group_name, name",
+        "payees": "SELECT id, name FROM payees WHERE NOT deleted ORDER BY name",
+    }
+    with database.read_engine.connect() as conn:
+        return {name: pd.read_sql(text(query), conn) for name, query in queries.items()}
@@ -0,0 +1,156 @@
+# transaction_stream.py
+"""
+Streaming reader for large transactions responses.
+
+Deserializing a full transactions download into `ynab` SDK models keeps
+every transaction of a multi-year budget in memory at once. A
+TransactionStream instead reads the raw JSON body a block at a time,
+decodes one transaction object at a time and keeps only a TransactionRecord
+namedtuple of the fields the store uses. The field names match the SDK model
+attributes, so the store's row builders accept either. Consumers take the
+records in fixed-size batches (see `batches()`), so peak memory stays flat
+whatever the size of the budget.
+"""
+import codecs
+import datetime
+import json
+import re
+from collections import namedtuple
+
+import urllib3
+
+from data.bulk_writer import BULK_CHUNK_SIZE, chunked
+from data.request_scheduler import YNABAPIError, YNABConnectionError
+
+# Bytes read from the response body at a time
+READ_BLOCK_BYTES = 64 * 1024
+
+TransactionRecord = namedtuple(
+    "TransactionRecord",
+    "id var_date amount memo cleared approved account_id payee_id category_id deleted subtransactions",
+)
+
+SubTransactionRecord = namedtuple(
+    "SubTransactionRecord",
+    "id amount memo payee_id category_id transfer_account_id deleted",
+)
+
+_ARRAY_START = re.compile(r'"transactions"\s*:\s*\[')
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def _record(item):
+    return TransactionRecord(
+        item["id"],
+        datetime.date.fromisoformat(item["date"]),
+        item["amount"],
+        item.get("memo"),
+        item["cleared"],
+        item["approved"],
+        item["account_id"],
+        item.get("payee_id"),
+        item.get("category_id"),
+        item.get("deleted", False),
+        tuple(
+            SubTransactionRecord(
+                sub["id"], sub["amount"], sub.get("memo"), sub.get("payee_id"), sub.get("category_id"),
+                sub.get("transfer_account_id"), sub.get("deleted", False),
+            )
+            for sub in item.get("subtransactions") or ()
+        ),
+    )
+
+
+class TransactionStream:
+    """
+    The transactions of an open `{"data": {"transactions": [...], "server_knowledge": N}}`
+    response, read incrementally from `response` (anything with `read(amt)`).
+
+    Iterating yields TransactionRecords; it can be done once. `count` and
+    `server_knowledge` are set once the body has been read to the end.
+    Close the stream (or use it as a context manager) to release the
+    connection if it is abandoned early.
+    """
+
+    def __init__(self, response, block_bytes=READ_BLOCK_BYTES):
+        self.response = response
+        self.block_bytes = block_bytes
+        self.count = 0
+        self.server_knowledge = None
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._exhausted = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        release = getattr(self.response, "release_conn", None)
+        if release:
+            release()
+        self.response.close()
+
+    def batches(self, size=BULK_CHUNK_SIZE):
+        """The records as lists of at most `size`, for the bulk writer."""
+        return chunked(self, size)
+
+    def _read(self):
+        if self._exhausted:
+            return ""
+        try:
+            block = self.response.read(self.block_bytes)
+        except urllib3.exceptions.HTTPError as e:
+            raise YNABConnectionError(f"Lost the connection while reading transactions: {e}") from e
+        if not block:
+            self._exhausted = True
+            return self._decoder.decode(b"", final=True)
+        return self._decoder.decode(block)
+
+    def __iter__(self):
+        for item in self._items():
+            try:
+                record = _record(item)
+            except (KeyError, TypeError, ValueError) as e:
+                raise YNABAPIError(f"Transactions response has a malformed transaction: {e!r}") from None
+            self.count += 1
+            yield record
+
+    def _items(self):
+        json_decoder = json.JSONDecoder()
+        buffer = ""
+        while (start := _ARRAY_START.search(buffer)) is None:
+            if self._exhausted:
+                raise YNABAPIError("Transactions response has no transactions list")
+            buffer += self._read()
+        head, buffer, pos = buffer[:start.start()], buffer[start.end():], 0
+
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == "]":
+                break
+            try:
+                item, pos = json_decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Usually just an object cut off at the end of the block
+                if self._exhausted:
+                    raise YNABAPIError("Transactions response is truncated or malformed") from None
+                buffer = buffer[pos:] + self._read()
+                pos = 0
+                continue
+            yield item
+
+        tail = buffer[pos + 1:]
+        while not self._exhausted:
+            tail += self._read()
+        # What surrounds the list is small; parsing it whole also catches a body
+        # cut off after the list, e.g. in the middle of server_knowledge
+        try:
+            envelope = json.loads(f'{head}"transactions": []{tail}')
+            knowledge = envelope["data"].get("server_knowledge")
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+            raise YNABAPIError("Transactions response is truncated or malformed") from None
+        if not isinstance(knowledge, int):
+            raise YNABAPIError("Transactions response has no server_knowledge")
+        self.server_knowledge = knowledge
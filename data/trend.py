@@ -0,0 +1,98 @@
+# trend.py
+import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from data import database
+
+# Upper bound on points sent to the browser for the trend graph
+TREND_MAX_POINTS = 500
+
+# SQL expressions mapping a transaction date onto the start of its bucket
+BUCKET_EXPRESSIONS = {
+    "day": "date",
+    "week": "date(date, 'weekday 0', '-6 days')",  # Monday of the week
+    "month": "strftime('%Y-%m-01', date)",
+}
+
+
+def choose_bucket(start_date, end_date, target_points):
+    """Finest of day/week/month buckets that covers the range in about `target_points` points."""
+    days = (end_date - start_date).days + 1
+    if days <= target_points:
+        return "day"
+    if days / 7 <= target_points:
+        return "week"
+    return "month"
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices of at most `threshold` points of (x, y) that keep the
+    visual shape of the series: first and last points are kept, and from each
+    bucket in between the point forming the largest triangle with the previously
+    kept point and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (avg_y - y[previous])
+        )
+        previous = lo + int(areas.argmax())
+        selected[i + 1] = previous
+    return selected
+
+
+def get_transaction_trend(start_date=None, end_date=None, target_points=TREND_MAX_POINTS):
+    """
+    Transaction totals over time as a DataFrame of (date, total) with at most
+    `target_points` rows. Totals are integer milliunits.
+
+    Totals are bucketed by day, week or month in SQL depending on the length of
+    the range, then thinned with LTTB if still above the target. Missing bounds
+    default to the first and last transaction dates.
+    """
+    with database.read_engine.connect() as conn:
+        if start_date is None or end_date is None:
+            first, last = conn.execute(text("SELECT MIN(date), MAX(date) FROM ledger_lines")).one()
+            if first is None:
+                return pd.DataFrame(columns=["date", "total"])
+            start_date = start_date or datetime.date.fromisoformat(first)
+            end_date = end_date or datetime.date.fromisoformat(last)
+
+        bucket = BUCKET_EXPRESSIONS[choose_bucket(start_date, end_date, target_points)]
+        query = text(f"""
+            SELECT {bucket} AS date, SUM(amount) AS total
+            FROM ledger_lines
+            WHERE date >= :start_date AND date <= :end_date
+            GROUP BY 1
+            ORDER BY 1
+        """)
+        df = pd.read_sql(query, conn, params={
+            "start_date": start_date.isoformat(), "end_date": end_date.isoformat()
+        })
+
+    df["date"] = pd.to_datetime(df["date"])
+    if len(df) > target_points:
+        keep = lttb(df["date"].astype("int64").to_numpy(), df["total"].to_numpy(), target_points)
+        df = df.iloc[keep].reset_index(drop=True)
+    return df
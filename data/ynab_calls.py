@@ -1,86 +1,158 @@
 import ynab
 import secrets_rs
 
+from data.request_scheduler import (
+    RequestScheduler, get_bucket,
+    YNABError, YNABAPIError, YNABRateLimitError, YNABTimeoutError, YNABConnectionError
+)
+from data.transaction_stream import TransactionStream
+
+
+# HTTP connections kept open per YNABClient
+DEFAULT_POOL_SIZE = 8
+
+# Seconds before a single HTTP request is abandoned and retried
+REQUEST_TIMEOUT = 30
+
 
 class YNABClient:
-    def __init__(self, access_token=None):
-        """Initialize YNAB API Client."""
-        self.configuration = ynab.Configuration(
-            access_token=secrets_rs.ACCESS_TOKEN
+    def __init__(self, access_token=None, pool_size=DEFAULT_POOL_SIZE, host=None, scheduler=None,
+                 record_to=None):
+        """Initialize YNAB API Client.
+
+        `host` points the client at another server (e.g. a local fake for tests,
+        or a data.ynab_fixtures.ReplayServer). `scheduler` defaults to a
+        RequestScheduler sharing the process-wide quota bucket of this access
+        token. `record_to` saves every raw response into that fixture directory.
+        """
+        access_token = access_token or secrets_rs.ACCESS_TOKEN
+        self.configuration = ynab.Configuration(access_token=access_token, host=host)
+        # Retries are handled by the scheduler, not by urllib3
+        self.configuration.retries = 0
+        # One long-lived ApiClient per instance so HTTP connections are pooled and
+        # reused across calls. Its urllib3 pool is thread-safe, which lets
+        # sync_all_data fetch several entities in parallel through one client.
+        self.configuration.connection_pool_maxsize = pool_size
+        if record_to:
+            from data.ynab_fixtures import FixtureStore, RecordingApiClient
+
+            self.api_client = RecordingApiClient(self.configuration, FixtureStore(record_to))
+        else:
+            self.api_client = ynab.ApiClient(self.configuration)
+        self.scheduler = scheduler or RequestScheduler(bucket=get_bucket(access_token))
+
+    def close(self):
+        """Close all pooled HTTP connections."""
+        self.api_client.rest_client.pool_manager.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def quota_remaining(self):
+        """Number of API requests left in the current hourly window."""
+        return self.scheduler.quota_remaining()
+
+    def _call(self, description, api_method, *args, **kwargs):
+        return self.scheduler.call(
+            description, api_method, *args, _request_timeout=REQUEST_TIMEOUT, **kwargs
         )
 
     def get_budget_by_id(self, budget_id):
         """Fetch detailed budget information by ID."""
-        with ynab.ApiClient(self.configuration) as api_client:
-            budgets_api = ynab.BudgetsApi(api_client)
-            try:
-                budget_response = budgets_api.get_budget_by_id(budget_id)
-                return budget_response.data.budget
-            except Exception as e:
-                print(f"Error fetching budget: {e}")
-                return None
+        return self.get_budget_by_id_delta(budget_id)[0]
+
+    def get_budget_by_id_delta(self, budget_id, last_knowledge_of_server=None):
+        """Fetch budget details changed since `last_knowledge_of_server` as ``(budget, server_knowledge)``."""
+        budgets_api = ynab.BudgetsApi(self.api_client)
+        budget_response = self._call(
+            "fetching budget", budgets_api.get_budget_by_id_with_http_info,
+            budget_id, last_knowledge_of_server=last_knowledge_of_server
+        )
+        return budget_response.data.budget, budget_response.data.server_knowledge
 
     def get_budget_months(self, budget_id):
         """Fetch budget months for a given budget ID."""
-        with ynab.ApiClient(self.configuration) as api_client:
-            months_api = ynab.MonthsApi(api_client)
-            try:
-                months_response = months_api.get_budget_months(budget_id)
-                return months_response.data.months
-            except Exception as e:
-                print(f"Error fetching budget months: {e}")
-                return []
+        months_api = ynab.MonthsApi(self.api_client)
+        months_response = self._call(
+            "fetching budget months", months_api.get_budget_months_with_http_info, budget_id
+        )
+        return months_response.data.months
 
     def get_budgets(self):
         """Fetch the List of Budgets."""
-        with ynab.ApiClient(self.configuration) as api_client:
-            budgets_api = ynab.BudgetsApi(api_client)
-            try:
-                budgets_response = budgets_api.get_budgets()
-                return budgets_response.data.budgets
-            except Exception as e:
-                print(f"Error fetching budgets: {e}")
-                return []
+        budgets_api = ynab.BudgetsApi(self.api_client)
+        budgets_response = self._call("fetching budgets", budgets_api.get_budgets_with_http_info)
+        return budgets_response.data.budgets
 
     def get_accounts(self, budget_id):
         """Fetch accounts for a given budget ID."""
-        with ynab.ApiClient(self.configuration) as api_client:
-            accounts_api = ynab.AccountsApi(api_client)
-            try:
-                account_response = accounts_api.get_accounts(budget_id)
-                return account_response.data.accounts  # List account objects
-            except Exception as e:
-                print(f"Error fetching accounts: {e}")
-                return []
+        return self.get_accounts_delta(budget_id)[0]
+
+    def get_accounts_delta(self, budget_id, last_knowledge_of_server=None):
+        """Fetch accounts changed since `last_knowledge_of_server` as ``(accounts, server_knowledge)``."""
+        accounts_api = ynab.AccountsApi(self.api_client)
+        account_response = self._call(
+            "fetching accounts", accounts_api.get_accounts_with_http_info,
+            budget_id, last_knowledge_of_server=last_knowledge_of_server
+        )
+        return account_response.data.accounts, account_response.data.server_knowledge
 
     def get_transactions(self, budget_id):
         """Fetch transactions for a given budget ID"""
-        with ynab.ApiClient(self.configuration) as api_client:
-            transactions_api = ynab.TransactionsApi(api_client)
-            try:
-                transact_response = transactions_api.get_transactions(budget_id)
-                return transact_response.data.transactions
-            except Exception as e:
-                print('Exception when calling TransactionsApi->get_transactions: %s\n' % e)
-                return []
+        return self.get_transactions_delta(budget_id)[0]
+
+    def get_transactions_delta(self, budget_id, last_knowledge_of_server=None):
+        """Fetch transactions changed since `last_knowledge_of_server` as ``(transactions, server_knowledge)``.
+
+        Delta responses include deleted transactions with ``deleted=True``.
+        """
+        transactions_api = ynab.TransactionsApi(self.api_client)
+        transact_response = self._call(
+            "fetching transactions", transactions_api.get_transactions_with_http_info,
+            budget_id, last_knowledge_of_server=last_knowledge_of_server
+        )
+        return transact_response.data.transactions, transact_response.data.server_knowledge
+
+    def get_transactions_stream(self, budget_id, last_knowledge_of_server=None):
+        """Like get_transactions_delta(), but as a TransactionStream read from the raw response.
+
+        The body is parsed incrementally while the stream is iterated, so the
+        whole download is never held in memory. `server_knowledge` is set on
+        the stream once it has been read to the end.
+        """
+        transactions_api = ynab.TransactionsApi(self.api_client)
+        response = self.scheduler.open(
+            "fetching transactions", transactions_api.get_transactions_without_preload_content,
+            budget_id, last_knowledge_of_server=last_knowledge_of_server,
+            _request_timeout=REQUEST_TIMEOUT
+        )
+        return TransactionStream(response)
 
     def get_categories(self, budget_id):
-        with ynab.ApiClient(self.configuration) as api_client:
-            categories_api = ynab.CategoriesApi(api_client)
-            try:
-                categories_response = categories_api.get_categories(budget_id)
-                return categories_response.data.category_groups
-            except Exception as e:
-                print(f"Error fetching categories: {e}")
-                return []
+        """Fetch category groups (with their categories) for a given budget ID."""
+        return self.get_categories_delta(budget_id)[0]
+
+    def get_categories_delta(self, budget_id, last_knowledge_of_server=None):
+        """Fetch category groups changed since `last_knowledge_of_server` as ``(category_groups, server_knowledge)``."""
+        categories_api = ynab.CategoriesApi(self.api_client)
+        categories_response = self._call(
+            "fetching categories", categories_api.get_categories_with_http_info,
+            budget_id, last_knowledge_of_server=last_knowledge_of_server
+        )
+        return categories_response.data.category_groups, categories_response.data.server_knowledge
 
     def get_payees(self, budget_id):
         """Fetch payees for a given budget ID."""
-        with ynab.ApiClient(self.configuration) as api_client:
-            payees_api = ynab.PayeesApi(api_client)
-            try:
-                payees_response = payees_api.get_payees(budget_id)
-                return payees_response.data.payees
-            except Exception as e:
-                print(f"Error fetching payees: {e}")
-                return []
+        return self.get_payees_delta(budget_id)[0]
+
+    def get_payees_delta(self, budget_id, last_knowledge_of_server=None):
+        """Fetch payees changed since `last_knowledge_of_server` as ``(payees, server_knowledge)``."""
+        payees_api = ynab.PayeesApi(self.api_client)
+        payees_response = self._call(
+            "fetching payees", payees_api.get_payees_with_http_info,
+            budget_id, last_knowledge_of_server=last_knowledge_of_server
+        )
+        return payees_response.data.payees, payees_response.data.server_knowledge
@@ -0,0 +1,251 @@
+# ynab_fixtures.py
+"""
+Record/replay stand-in for the YNAB API.
+
+Record mode saves the raw HTTP responses a YNABClient receives into a
+FixtureStore directory (one JSON file per request). Replay mode serves those
+files from a local HTTP server that YNABClient can be pointed at with `host=`,
+so sync runs can be measured offline and deterministically. The server can
+answer `last_knowledge_of_server` requests it has no recording for with an
+empty delta, and can inject latency and 429 responses.
+
+    python -m data.ynab_fixtures record <budget_id> fixtures/ [--knowledge N]
+    python -m data.ynab_fixtures replay fixtures/ --port 8765 --latency 0.05 --throttle-every 10
+"""
+import argparse
+import io
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import urllib3
+import ynab
+
+KNOWLEDGE_PARAM = "last_knowledge_of_server"
+
+
+class FixtureStore:
+    """Directory of recorded responses keyed by method, path and query string."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(method, path, query=""):
+        query = urlencode(sorted(parse_qsl(query)))
+        raw = f"{method.upper()} {path}" + (f"?{query}" if query else "")
+        return re.sub(r"[^A-Za-z0-9_.=-]+", "_", raw).strip("_")
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def save(self, method, path, query, status, headers, body):
+        """Store one response. `body` is the raw response text."""
+        record = {
+            "method": method.upper(),
+            "path": path,
+            "query": query,
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() in ("content-type", "x-rate-limit")},
+            "body": body,
+        }
+        with open(self._path(self.key(method, path, query)), "w") as f:
+            json.dump(record, f, indent=1)
+
+    def load(self, method, path, query=""):
+        """Return the recorded response for a request, or None."""
+        try:
+            with open(self._path(self.key(method, path, query))) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+class RecordingApiClient(ynab.ApiClient):
+    """ynab.ApiClient that copies every raw response into a FixtureStore."""
+
+    def __init__(self, configuration, store):
+        super().__init__(configuration)
+        self.store = store
+
+    def call_api(self, method, url, header_params=None, body=None, post_params=None, _request_timeout=None):
+        response = super().call_api(method, url, header_params=header_params, body=body,
+                                    post_params=post_params, _request_timeout=_request_timeout)
+        raw = response.read()
+        parts = urlsplit(url)
+        base_path = urlsplit(self.configuration.host).path.rstrip("/")
+        path = parts.path[len(base_path):] if parts.path.startswith(base_path) else parts.path
+        self.store.save(method, path, parts.query, response.status, dict(response.getheaders()),
+                        raw.decode("utf-8"))
+        # The body was consumed above; give streaming callers a fresh copy to read
+        response.response = urllib3.HTTPResponse(
+            body=io.BytesIO(raw), headers=response.response.headers, status=response.status,
+            reason=response.reason, preload_content=False,
+        )
+        return response
+
+
+def empty_delta(body):
+    """
+    Turn a recorded full response into a delta with no changes: every list
+    in `data` (and in `data.budget`) is emptied, server_knowledge is kept.
+    """
+    payload = json.loads(body)
+    data = payload.get("data", {})
+    for container in (data, data.get("budget") or {}):
+        for name, value in container.items():
+            if isinstance(value, list):
+                container[name] = []
+    return json.dumps(payload)
+
+
+class ReplayServer:
+    """
+    Local HTTP server answering YNAB API requests from a FixtureStore.
+
+    `latency` seconds are added to every response. With `throttle_every=N`,
+    every Nth request is answered 429 with `Retry-After: retry_after`.
+    Requests are counted in an `X-Rate-Limit: n/rate_limit` header like the
+    real API. Use as a context manager; `url` is the value for YNABClient(host=...).
+    """
+
+    def __init__(self, store, port=0, latency=0.0, throttle_every=None, retry_after=1, rate_limit=200):
+        self.store = store if isinstance(store, FixtureStore) else FixtureStore(store)
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def resolve(self, method, path, query):
+        """Pick the recorded response for a request: (status, headers, body)."""
+        record = self.store.load(method, path, query)
+        if record is not None:
+            return record["status"], record["headers"], record["body"]
+
+        params = dict(parse_qsl(query))
+        if KNOWLEDGE_PARAM in params:
+            rest = urlencode(sorted((k, v) for k, v in params.items() if k != KNOWLEDGE_PARAM))
+            full = self.store.load(method, path, rest)
+            if full is not None and full["status"] == 200:
+                known = json.loads(full["body"]).get("data", {}).get("server_knowledge")
+                if known is not None and int(params[KNOWLEDGE_PARAM]) >= known:
+                    return 200, full["headers"], empty_delta(full["body"])
+                # Older knowledge than the recording: the full response is a superset of the delta
+                return full["status"], full["headers"], full["body"]
+
+        body = json.dumps({"error": {"id": "404", "name": "not_found", "detail": f"No fixture for {path}"}})
+        return 404, {"Content-Type": "application/json"}, body
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _respond(self):
+                with server._lock:
+                    server.requests += 1
+                    count = server.requests
+                if server.latency:
+                    time.sleep(server.latency)
+
+                parts = urlsplit(self.path)
+                if server.throttle_every and count % server.throttle_every == 0:
+                    status, headers = 429, {"Content-Type": "application/json",
+                                            "Retry-After": str(server.retry_after)}
+                    body = json.dumps({"error": {"id": "429", "name": "too_many_requests",
+                                                 "detail": "Injected rate limit"}})
+                else:
+                    status, headers, body = server.resolve(self.command, parts.path, parts.query)
+
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("X-Rate-Limit", f"{count % server.rate_limit}/{server.rate_limit}")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+        return Handler
+
+
+def record(budget_id, directory, knowledge=None, access_token=None):
+    """Fetch every entity a sync needs (full, and as a delta if `knowledge` is given) into `directory`."""
+    from data.ynab_calls import YNABClient
+
+    with YNABClient(access_token=access_token, record_to=directory) as client:
+        client.get_budgets()
+        for since in (None, knowledge) if knowledge is not None else (None,):
+            client.get_budget_by_id_delta(budget_id, since)
+            client.get_categories_delta(budget_id, since)
+            client.get_payees_delta(budget_id, since)
+            client.get_accounts_delta(budget_id, since)
+            client.get_transactions_delta(budget_id, since)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="save live API responses")
+    record_parser.add_argument("budget_id")
+    record_parser.add_argument("directory")
+    record_parser.add_argument("--knowledge", type=int, help="also record deltas since this server_knowledge")
+
+    replay_parser = commands.add_parser("replay", help="serve saved responses")
+    replay_parser.add_argument("directory")
+    replay_parser.add_argument("--port", type=int, default=8765)
+    replay_parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    replay_parser.add_argument("--throttle-every", type=int, help="answer every Nth request with 429")
+    replay_parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.budget_id, args.directory, knowledge=args.knowledge)
+        print(f"Recorded responses for budget {args.budget_id} into {args.directory}")
+    else:
+        server = ReplayServer(args.directory, port=args.port, latency=args.latency,
+                              throttle_every=args.throttle_every, retry_after=args.retry_after)
+        print(f"Replaying {args.directory} on {server.url} (use YNABClient(host=...))")
+        try:
+            server._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,5 +8,8 @@ layout = html.Div([
         placeholder="Select an Account",
         value="all"
     ),
-    dcc.Graph(id="summary-graph")
+    dcc.Graph(id="summary-graph"),
+    # Account x category totals for the clientside summary graph (YNAB_SUMMARY_MODE=client),
+    # kept across page loads until the data version changes
+    dcc.Store(id="summary-data", storage_type="local"),
 ])
@@ -1,22 +1,77 @@
 # Third-Party Imports
-from dash import html, dcc
-import pandas as pd
-import plotly.express as px
-from sqlalchemy import create_engine
-
-# Local Application Imports
-from data import database
-
-# Connect to the database
-engine = create_engine(database.DATABASE_URI)
-
-
-def get_transaction_data():
-    query = "SELECT date, SUM(amount) as total FROM transactions GROUP BY date"
-    return pd.read_sql(query, engine)
+from dash import html, dcc, dash_table
 
 
 layout = html.Div([
     html.H1("Transactions"),
-    dcc.Graph(id="transaction-graph")
+    dcc.DatePickerRange(
+        id="trend-date-range",
+        clearable=True,  # Cleared dates fall back to the full history
+    ),
+    dcc.Graph(id="transaction-graph"),
+
+    # Full-text search over memos, payees and categories (see data.search)
+    html.H2("Search"),
+    html.Div([
+        dcc.Input(
+            id="txn-search",
+            type="search",
+            debounce=True,  # Search when typing pauses or Enter is pressed
+            placeholder="Search memos, payees and categories",
+        ),
+        dcc.RadioItems(
+            id="txn-search-order",
+            options=[{"label": "Best match", "value": "rank"}, {"label": "Most recent", "value": "recent"}],
+            value="rank",
+            inline=True,
+        ),
+    ]),
+    dash_table.DataTable(
+        id="txn-search-results",
+        columns=[
+            {"name": "Date", "id": "date"},
+            {"name": "Account", "id": "account"},
+            {"name": "Payee", "id": "payee"},
+            {"name": "Category", "id": "category"},
+            {"name": "Memo", "id": "memo"},
+            {"name": "Amount", "id": "amount", "type": "numeric"},
+        ],
+        data=[],
+    ),
+
+    # Server-side paged grid (see data.transaction_pages); only the current page is sent
+    html.H2("All Transactions"),
+    html.Div([
+        dcc.Dropdown(id="txn-account-filter", options=[], placeholder="All accounts"),
+        dcc.Dropdown(id="txn-category-filter", options=[], placeholder="All categories"),
+        dcc.Dropdown(id="txn-payee-filter", options=[], placeholder="All payees"),
+        dcc.DatePickerRange(id="txn-date-range", clearable=True),
+        dcc.RadioItems(
+            id="txn-sort",
+            options=[{"label": "Newest first", "value": "desc"}, {"label": "Oldest first", "value": "asc"}],
+            value="desc",
+            inline=True,
+        ),
+    ]),
+    dash_table.DataTable(
+        id="txn-table",
+        columns=[
+            {"name": "Date", "id": "date"},
+            {"name": "Account", "id": "account"},
+            {"name": "Payee", "id": "payee"},
+            {"name": "Category", "id": "category"},
+            {"name": "Memo", "id": "memo"},
+            {"name": "Amount", "id": "amount", "type": "numeric"},
+            {"name": "Cleared", "id": "cleared"},
+        ],
+        data=[],
+        page_action="none",  # Paged on the server with the buttons below
+    ),
+    html.Div([
+        html.Button("Previous", id="txn-previous", disabled=True),
+        html.Span(id="txn-page-label"),
+        html.Button("Next", id="txn-next", disabled=True),
+    ]),
+    # Cursors of the page on screen, for the Previous/Next buttons
+    dcc.Store(id="txn-page-state"),
 ])
@@ -0,0 +1,99 @@
+# Standard Library Imports
+import cProfile
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from urllib.parse import parse_qsl, urlsplit
+
+# Third-Party Imports
+from flask import has_request_context, request
+
+# "off":     never profile (the wrapped functions only pay one string comparison)
+# "on":      profile every run
+# "request": profile Dash requests made from a page opened with ?profile=1
+PROFILE_MODE = os.environ.get("YNAB_PROFILE", "off").lower()
+PROFILE_DIR = os.environ.get("YNAB_PROFILE_DIR", "profiles")
+# Slowest runs kept per profiled function; faster ones are deleted
+PROFILE_KEEP = int(os.environ.get("YNAB_PROFILE_KEEP", "10"))
+PROFILE_PARAM = "profile"
+
+# One run is profiled at a time: cProfile allows a single active profiler per
+# process (Python 3.12+ raises on a second) and tracemalloc is process-wide
+_profiling_lock = threading.Lock()
+
+
+def _requested():
+    """True if the current Flask request, or the page that sent it, has ?profile=1."""
+    if not has_request_context():
+        return False
+    if request.args.get(PROFILE_PARAM) == "1":
+        return True
+    # Dash callbacks are POSTed to /_dash-update-component; the page URL is the referrer
+    referrer = request.referrer
+    return bool(referrer) and dict(parse_qsl(urlsplit(referrer).query)).get(PROFILE_PARAM) == "1"
+
+
+def profiling_enabled():
+    if PROFILE_MODE == "off":
+        return False
+    return PROFILE_MODE == "on" or (PROFILE_MODE == "request" and _requested())
+
+
+def _prune(directory, name, keep):
+    """Delete all but the `keep` slowest runs of `name` (the duration leads each file name)."""
+    runs = sorted(
+        (f[:-len(".pstats")] for f in os.listdir(directory)
+         if f.startswith(f"{name}-") and f.endswith(".pstats")),
+        reverse=True,
+    )
+    for run in runs[keep:]:
+        for suffix in (".pstats", ".tracemalloc"):
+            try:
+                os.remove(os.path.join(directory, run + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def _write(name, profiler, snapshot, seconds):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    # Zero-padded milliseconds first so a reverse sort of file names orders runs slowest first
+    run = f"{name}-{int(seconds * 1000):09d}ms-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, run + ".pstats"))
+    snapshot.dump(os.path.join(PROFILE_DIR, run + ".tracemalloc"))
+    _prune(PROFILE_DIR, name, PROFILE_KEEP)
+
+
+def profiled(func):
+    """
+    Profile `func` with cProfile and tracemalloc while profiling is enabled.
+
+    Each run writes `<name>-<ms>ms-<time>.pstats` (open with pstats.Stats or
+    snakeviz) and a matching `.tracemalloc` snapshot (tracemalloc.Snapshot.load)
+    to PROFILE_DIR. Only the calling thread is profiled by cProfile, and only
+    one run at a time: runs starting while another is profiled (in other
+    request threads, or nested in it) run unprofiled.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiling_enabled() or not _profiling_lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+
+        try:
+            profiler = cProfile.Profile()
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            start = time.perf_counter()
+            try:
+                return profiler.runcall(func, *args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                snapshot = tracemalloc.take_snapshot()
+                if started_tracing:
+                    tracemalloc.stop()
+                _write(func.__name__, profiler, snapshot, seconds)
+        finally:
+            _profiling_lock.release()
+    return wrapper
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+import pytest
+
+# data.database connects when it is first imported, so the tests' database is
+# chosen before anything imports it
+_DATABASE_DIR = tempfile.mkdtemp(prefix="ynab-tests-")
+_DATABASE_PATH = os.path.join(_DATABASE_DIR, "ynab_data.db")
+os.environ["YNAB_DATABASE_URI"] = f"sqlite:///{_DATABASE_PATH}"
+
+
+@pytest.fixture
+def database():
+    """A fresh, fully migrated database for each test."""
+    from data import database
+    from data.migrations import run_migrations
+
+    database.engine.dispose()
+    database.read_engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_DATABASE_PATH + suffix):
+            os.remove(_DATABASE_PATH + suffix)
+    database.Base.metadata.create_all(database.engine)
+    run_migrations()
+    yield database
+    database.engine.dispose()
+    database.read_engine.dispose()
+
+
+@pytest.fixture
+def table_contents(database):
+    """Returns every row of a table as a sorted list of dicts, without the timestamp columns."""
+    from sqlalchemy import text
+
+    def contents(table, exclude=("created_at", "updated_at")):
+        with database.ReadSessionLocal() as session:
+            rows = session.execute(text(f"SELECT * FROM {table}")).mappings()
+            return sorted(
+                ({column: value for column, value in row.items() if column not in exclude} for row in rows),
+                key=repr,
+            )
+
+    return contents
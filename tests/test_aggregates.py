@@ -0,0 +1,87 @@
+import datetime
+
+import pytest
+from sqlalchemy import text
+
+from benchmarks.synthetic import FakeYNABClient, SyntheticBudget
+from data import data_loader
+from data.aggregates import rebuild_cube
+
+CUBE_COLUMNS = "account_key, category_key, month, total, count"
+
+
+class DeltaClient(FakeYNABClient):
+    """Serves the given transactions as the next incremental sync."""
+
+    def __init__(self, budget, transactions):
+        super().__init__(budget)
+        self.transactions = transactions
+
+    def get_transactions_delta(self, budget_id, last_knowledge_of_server=None):
+        return self.transactions, self._knowledge(last_knowledge_of_server)
+
+
+def _sync(budget, transactions=None):
+    client = FakeYNABClient(budget) if transactions is None else DeltaClient(budget, transactions)
+    data_loader.sync_all_data(budget.id, client=client)
+
+
+def _store(budget, transactions=None):
+    if transactions is None:
+        data_loader.store_categories(budget.category_groups)
+        data_loader.store_payees(budget.payees)
+        data_loader.store_accounts(budget.accounts)
+        transactions = budget.transactions
+    data_loader.store_transactions(transactions)
+
+
+def _cube(session):
+    return session.execute(text(f"SELECT {CUBE_COLUMNS} FROM category_account_month ORDER BY {CUBE_COLUMNS}")).all()
+
+
+def _lonely_transactions(session, count):
+    """Unsplit transactions that are the only line of their cube cell."""
+    return list(session.execute(text("""
+        SELECT l.transaction_id FROM ledger_lines l
+        JOIN category_account_month c
+          ON c.account_key = l.account_key AND c.category_key IS l.category_key AND c.month = substr(l.date, 1, 7)
+        WHERE c.count = 1 AND l.id = l.transaction_id
+        ORDER BY l.transaction_id LIMIT :count
+    """), {"count": count}).scalars())
+
+
+@pytest.mark.parametrize("load", [_sync, _store], ids=["staged-sync", "store"])
+def test_refreshed_cells_match_a_rebuild(database, load):
+    budget = SyntheticBudget(payees=20, transactions=300, split_ratio=0.1, months=6, seed=29)
+    load(budget)
+    with database.SessionLocal() as session:
+        deleted_id, recategorized_id = _lonely_transactions(session, 2)
+        emptied = set(session.execute(text(
+            "SELECT account_key, category_key, substr(date, 1, 7) FROM ledger_lines WHERE id IN (:first, :second)"
+        ), {"first": deleted_id, "second": recategorized_id}).all())
+
+    by_id = {txn.id: txn for txn in budget.transactions}
+    deleted, recategorized = by_id[deleted_id], by_id[recategorized_id]
+    other_category = next(cat for cat in budget.categories if cat.id != recategorized.category_id)
+    moved, edited = [txn for txn in budget.transactions if not txn.subtransactions and txn.id not in
+                     (deleted_id, recategorized_id)][:2]
+    changes = [
+        deleted.model_copy(update={"deleted": True}),
+        recategorized.model_copy(update={"category_id": other_category.id}),
+        moved.model_copy(update={"account_id": budget.accounts[-1].id,
+                                 "var_date": moved.var_date - datetime.timedelta(days=62)}),
+        edited.model_copy(update={"amount": edited.amount - 990}),
+        budget.transactions.transaction(0).model_copy(update={"id": "brand-new", "subtransactions": []}),
+    ]
+    load(budget, changes)
+
+    with database.SessionLocal() as session:
+        refreshed = _cube(session)
+        rebuild_cube(session)
+        assert _cube(session) == refreshed
+        session.rollback()
+
+    # Cells left empty by the delete and the recategorization are gone, not zero
+    assert len(emptied) == 2
+    assert emptied.isdisjoint((cell.account_key, cell.category_key, cell.month) for cell in refreshed)
+    assert all(cell.count > 0 for cell in refreshed)
@@ -0,0 +1,65 @@
+import datetime
+
+from sqlalchemy import text
+
+from benchmarks.synthetic import FakeYNABClient, SyntheticBudget
+from data.balance_history import rebuild_balance_history
+from data.data_loader import sync_all_data
+
+AMOUNT = -123_450
+
+
+class BackdatedClient(FakeYNABClient):
+    """An incremental sync bringing one transaction dated months ago, with the account's new balance."""
+
+    def __init__(self, budget, date):
+        super().__init__(budget)
+        account = budget.accounts[0]
+        self.transaction = budget.transactions.transaction(0).model_copy(update={
+            "id": "backdated", "var_date": date, "amount": AMOUNT, "cleared": "cleared",
+            "account_id": account.id, "account_name": account.name, "category_name": None,
+            "category_id": budget.categories[0].id, "subtransactions": [],
+        })
+        self.accounts = [account.model_copy(update={
+            "balance": account.balance + AMOUNT, "cleared_balance": account.cleared_balance + AMOUNT,
+        })] + budget.accounts[1:]
+
+    def get_accounts_delta(self, budget_id, last_knowledge_of_server=None):
+        return self.accounts, self._knowledge(last_knowledge_of_server)
+
+    def get_transactions_delta(self, budget_id, last_knowledge_of_server=None):
+        return [self.transaction], self._knowledge(last_knowledge_of_server)
+
+
+def _history(session):
+    return session.execute(text("""
+        SELECT account_id, date, balance, cleared_balance, uncleared_balance
+        FROM account_balance_history ORDER BY account_id, date
+    """)).all()
+
+
+def test_backdated_transaction_recomputes_the_suffix_like_a_rebuild(database):
+    budget = SyntheticBudget(accounts=3, payees=20, transactions=400, months=6, seed=23)
+    sync_all_data(budget.id, client=FakeYNABClient(budget))
+    with database.SessionLocal() as session:
+        before = {(row.account_id, row.date): row for row in _history(session)}
+
+    backdated = budget.start_date + datetime.timedelta(days=45)
+    client = BackdatedClient(budget, backdated)
+    sync_all_data(budget.id, client=client)
+
+    with database.SessionLocal() as session:
+        refreshed = _history(session)
+        rebuild_balance_history(session)
+        assert _history(session) == refreshed
+        session.rollback()
+
+    account_id = budget.accounts[0].id
+    assert {(row.account_id, row.date) for row in refreshed} == set(before)
+    for row in refreshed:
+        old = before[row.account_id, row.date]
+        day = datetime.date.fromisoformat(str(row.date))
+        shifted = row.account_id == account_id and day >= backdated
+        assert row.balance == old.balance + (AMOUNT if shifted else 0), (row.account_id, day)
+        assert row.cleared_balance == old.cleared_balance + (AMOUNT if shifted else 0)
+        assert row.uncleared_balance == old.uncleared_balance
@@ -0,0 +1,74 @@
+from benchmarks.synthetic import SyntheticBudget
+from data import data_loader
+from data.database import Account, Category, Payee, SessionLocal, SubTransaction, Transaction
+from data.dimensions import keyed_rows
+
+TABLES = ("categories", "payees", "accounts", "transactions", "subtransactions")
+
+
+def _store_per_row(budget, transactions):
+    """The pre-bulk write path: one session.merge() per row."""
+    with SessionLocal() as session:
+        for model, rows in (
+            (Category, data_loader._category_rows(budget.category_groups)),
+            (Payee, data_loader._payee_rows(budget.payees)),
+            (Account, data_loader._account_rows(budget.accounts)),
+            (Transaction, data_loader._transaction_rows(transactions)),
+            (SubTransaction, data_loader._subtransaction_rows(transactions)),
+        ):
+            for row in keyed_rows(session, model, list(rows)):
+                session.merge(model(**row))
+        session.commit()
+
+
+def _store_bulk(budget, transactions):
+    data_loader.store_categories(budget.category_groups)
+    data_loader.store_payees(budget.payees)
+    data_loader.store_accounts(budget.accounts)
+    data_loader.store_transactions(transactions)
+
+
+def _edited(transactions):
+    """Every third transaction changed, as a later sync would deliver it."""
+    return [
+        txn.model_copy(update={"amount": txn.amount - 10, "memo": "edited", "cleared": "reconciled"})
+        for txn in list(transactions)[::3]
+    ]
+
+
+def test_bulk_upsert_matches_per_row_merge(database, table_contents):
+    budget = SyntheticBudget(payees=40, transactions=500, split_ratio=0.2, seed=7)
+    edits = _edited(budget.transactions)
+
+    _store_per_row(budget, budget.transactions)
+    _store_per_row(budget, edits)
+    expected = {table: table_contents(table) for table in TABLES}
+
+    with database.engine.begin() as conn:
+        for table in ("subtransactions", "transactions", "accounts", "payees", "categories", "dimension_keys"):
+            conn.exec_driver_sql(f"DELETE FROM {table}")
+
+    _store_bulk(budget, budget.transactions)
+    _store_bulk(budget, edits)
+
+    for table in TABLES:
+        assert table_contents(table) == expected[table], table
+    assert len(expected["transactions"]) == 500
+    assert any(row["memo"] == "edited" for row in expected["transactions"])
+
+
+def test_store_transactions_drops_split_parts_of_unsplit_transactions(database, table_contents):
+    budget = SyntheticBudget(payees=40, transactions=200, split_ratio=0.3, seed=9)
+    _store_bulk(budget, budget.transactions)
+    split = [txn for txn in budget.transactions if txn.subtransactions]
+    assert split
+
+    category = budget.categories[0]
+    data_loader.store_transactions([
+        txn.model_copy(update={"subtransactions": [], "category_id": category.id}) for txn in split
+    ])
+
+    assert table_contents("subtransactions") == []
+    lines = table_contents("ledger_lines")
+    assert len(lines) == 200
+    assert all(line["id"] == line["transaction_id"] for line in lines)
@@ -0,0 +1,82 @@
+from sqlalchemy import text
+
+from benchmarks.synthetic import FakeYNABClient, SyntheticBudget
+from data import data_loader
+from data.data_loader import sync_all_data
+
+
+def test_sync_reports_whether_server_knowledge_was_sent(database, capsys):
+    budget = SyntheticBudget(payees=20, transactions=50, months=3, seed=13)
+    client = FakeYNABClient(budget, delta_transactions=5)
+
+    sync_all_data(budget.id, client=client)
+    assert "Completed full data sync" in capsys.readouterr().out
+
+    sync_all_data(budget.id, client=client)
+    assert "Completed incremental data sync" in capsys.readouterr().out
+
+    sync_all_data(budget.id, full_resync=True, client=client)
+    assert "Completed full data sync" in capsys.readouterr().out
+
+
+def _edited_budget(budget):
+    """The budget detail with two month budgets changed, one added and the rest as they were."""
+    detail = budget.budget_detail()
+    months = list(detail.months)
+    changed = months[2].model_copy(update={"categories": [
+        months[2].categories[0].model_copy(update={"budgeted": months[2].categories[0].budgeted + 1000}),
+        *months[2].categories[1:],
+    ]})
+    newest = months[-1].model_copy(update={"categories": [
+        *months[-1].categories[:-1],
+        months[-1].categories[-1].model_copy(update={"activity": -4560, "balance": 7890}),
+        months[-1].categories[0].model_copy(update={"id": "new-category"}),
+    ]})
+    detail.months = [*months[:2], changed, *months[3:-1], newest]
+    return detail
+
+
+def _month_budgets(session):
+    return session.execute(text(
+        "SELECT budget_id, month, category_id, budgeted, activity, balance FROM month_budgets "
+        "ORDER BY budget_id, month, category_id"
+    )).all()
+
+
+def _full_load(detail):
+    return sorted(
+        tuple(row[column] for column in ("budget_id", "month", "category_id", "budgeted", "activity", "balance"))
+        for row in data_loader._month_budget_rows(detail)
+    )
+
+
+class EditedBudgetClient(FakeYNABClient):
+    def get_budget_by_id_delta(self, budget_id, last_knowledge_of_server=None):
+        return _edited_budget(self.budget), self._knowledge(last_knowledge_of_server)
+
+
+def test_diff_only_month_budget_load_matches_a_full_load(database):
+    budget = SyntheticBudget(payees=10, category_groups=3, categories_per_group=4, transactions=20, months=6, seed=31)
+    data_loader.store_categories(budget.category_groups + [budget.category_groups[0].model_copy(update={
+        "id": "new-group", "categories": [budget.categories[0].model_copy(update={"id": "new-category"})],
+    })])
+    data_loader.store_budget(budget.budget_detail())
+    edited = _edited_budget(budget)
+
+    assert data_loader.store_month_budgets(budget.budget_detail()) == 0
+    assert data_loader.store_month_budgets(edited) == 3
+    with database.SessionLocal() as session:
+        assert [tuple(row) for row in _month_budgets(session)] == _full_load(edited)
+
+
+def test_staged_month_budget_diff_matches_a_full_load(database):
+    budget = SyntheticBudget(payees=10, category_groups=3, categories_per_group=4, transactions=20, months=6, seed=31)
+    budget.category_groups.append(budget.category_groups[0].model_copy(update={
+        "id": "new-group", "categories": [budget.categories[0].model_copy(update={"id": "new-category"})],
+    }))
+    sync_all_data(budget.id, client=FakeYNABClient(budget))
+
+    sync_all_data(budget.id, client=EditedBudgetClient(budget))
+
+    with database.SessionLocal() as session:
+        assert [tuple(row) for row in _month_budgets(session)] == _full_load(_edited_budget(budget))
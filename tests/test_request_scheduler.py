@@ -0,0 +1,60 @@
+import pytest
+from ynab.exceptions import ApiException
+
+from data.request_scheduler import RequestScheduler, TokenBucket, YNABRateLimitError
+
+
+class FakeClock:
+    """Monotonic clock that only moves when sleep() is called."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _rate_limited(retry_after):
+    calls = []
+
+    def api_method():
+        calls.append(retry_after)
+        error = ApiException(status=429, reason="Too Many Requests")
+        error.headers = {"Retry-After": retry_after}
+        raise error
+
+    return api_method, calls
+
+
+def test_429_with_retry_after_beyond_max_wait_raises_without_sleeping():
+    clock = FakeClock()
+    bucket = TokenBucket(clock=clock)
+    scheduler = RequestScheduler(bucket=bucket, max_wait=60.0, sleep=clock.sleep)
+    api_method, calls = _rate_limited("3600")
+
+    with pytest.raises(YNABRateLimitError) as raised:
+        scheduler.call("fetching payees", api_method)
+
+    assert raised.value.retry_after == 3600
+    assert len(calls) == 1
+    assert clock.sleeps == []
+    # The bucket is drained, so the next request waits out the server's Retry-After
+    assert scheduler.quota_remaining() == 0
+    assert bucket.try_acquire() == pytest.approx(3600)
+
+
+def test_429_with_short_retry_after_waits_and_retries():
+    clock = FakeClock()
+    scheduler = RequestScheduler(bucket=TokenBucket(clock=clock), max_wait=60.0, sleep=clock.sleep, max_retries=1)
+    api_method, calls = _rate_limited("5")
+
+    with pytest.raises(YNABRateLimitError):
+        scheduler.call("fetching payees", api_method)
+
+    assert len(calls) == 2
+    assert clock.sleeps == [5]
@@ -0,0 +1,109 @@
+import pytest
+from sqlalchemy import text
+
+from benchmarks.synthetic import FakeYNABClient, SyntheticBudget
+from data import data_loader
+from data.search import SEARCH_TABLE, rebuild_search_index, search_transactions
+
+NEW_PAYEE_NAME = "Zanzibar Emporium"
+NEW_CATEGORY_NAME = "Quixotic Quokkas"
+NEW_MEMO = "xylophone lessons"
+
+
+def _changes(budget):
+    """A renamed payee and category, an edited memo and a deleted transaction."""
+    payee = budget.payees[0].model_copy(update={"name": NEW_PAYEE_NAME})
+    category = budget.categories[1].model_copy(update={"name": NEW_CATEGORY_NAME})
+    group = budget.category_groups[0].model_copy(update={"categories": [
+        category if cat.id == category.id else cat for cat in budget.category_groups[0].categories
+    ]})
+    edited = budget.transactions.transaction(3).model_copy(update={"memo": NEW_MEMO})
+    deleted = budget.transactions.transaction(4).model_copy(update={"deleted": True})
+    return payee, group, edited, deleted
+
+
+class ChangesClient(FakeYNABClient):
+    """Serves the _changes() of the budget as the next incremental sync."""
+
+    def __init__(self, budget):
+        super().__init__(budget)
+        self.payee, self.group, self.edited, self.deleted = _changes(budget)
+
+    def get_payees_delta(self, budget_id, last_knowledge_of_server=None):
+        return [self.payee], self._knowledge(last_knowledge_of_server)
+
+    def get_categories_delta(self, budget_id, last_knowledge_of_server=None):
+        return [self.group], self._knowledge(last_knowledge_of_server)
+
+    def get_transactions_delta(self, budget_id, last_knowledge_of_server=None):
+        return [self.edited, self.deleted], self._knowledge(last_knowledge_of_server)
+
+
+def _sync(budget):
+    data_loader.sync_all_data(budget.id, client=FakeYNABClient(budget))
+
+
+def _sync_changes(budget):
+    data_loader.sync_all_data(budget.id, client=ChangesClient(budget))
+
+
+def _store(budget):
+    data_loader.store_categories(budget.category_groups)
+    data_loader.store_payees(budget.payees)
+    data_loader.store_accounts(budget.accounts)
+    data_loader.store_transactions(budget.transactions)
+
+
+def _store_changes(budget):
+    payee, group, edited, deleted = _changes(budget)
+    data_loader.store_payees([payee])
+    data_loader.store_categories([group])
+    data_loader.store_transactions([edited, deleted])
+
+
+def _documents(session):
+    return session.execute(text(f"SELECT rowid, memo, payee, category FROM {SEARCH_TABLE} ORDER BY rowid")).all()
+
+
+def _named(session, column, name):
+    table = {"payee_key": "payees", "category_key": "categories"}[column]
+    return set(session.execute(text(f"""
+        SELECT t.id FROM transactions t JOIN {table} d ON d.key = t.{column} WHERE d.name = :name
+        UNION SELECT s.transaction_id FROM subtransactions s JOIN {table} d ON d.key = s.{column}
+        WHERE d.name = :name AND NOT s.deleted
+    """), {"name": name}).scalars())
+
+
+@pytest.mark.parametrize("load, apply_changes", [(_sync, _sync_changes), (_store, _store_changes)],
+                         ids=["staged-sync", "store"])
+def test_index_follows_renames_edits_and_deletes(database, load, apply_changes):
+    budget = SyntheticBudget(payees=10, category_groups=2, categories_per_group=3, transactions=300,
+                             split_ratio=0.2, months=6, seed=19)
+    deleted_id = budget.transactions.transaction(4).id
+    load(budget)
+    with database.SessionLocal() as session:
+        deleted_rowid = session.execute(
+            text("SELECT rowid FROM transactions WHERE id = :id"), {"id": deleted_id}
+        ).scalar_one()
+
+    apply_changes(budget)
+
+    with database.SessionLocal() as session:
+        documents = _documents(session)
+        rowids = set(session.execute(text("SELECT rowid FROM transactions")).scalars())
+        assert {rowid for rowid, *_ in documents} == rowids
+        assert not session.execute(text("SELECT 1 FROM transactions WHERE id = :id"), {"id": deleted_id}).all()
+        # Removed by rowid before the row went; a leftover would be an orphan document
+        assert deleted_rowid not in {rowid for rowid, *_ in documents}
+        payee_ids = _named(session, "payee_key", NEW_PAYEE_NAME)
+        category_ids = _named(session, "category_key", NEW_CATEGORY_NAME)
+
+        # Incremental upkeep leaves exactly what a rebuild would
+        rebuild_search_index(session)
+        assert _documents(session) == documents
+        session.rollback()
+
+    assert payee_ids and category_ids
+    assert set(search_transactions("zanzibar", limit=1000)["id"]) == payee_ids
+    assert set(search_transactions("quokka", limit=1000)["id"]) == category_ids
+    assert list(search_transactions("xylophone")["id"]) == [budget.transactions.transaction(3).id]
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from data.snapshot_cache import SnapshotCache
+
+
+def _loader():
+    return pd.DataFrame({
+        "id": pd.array([f"txn-{i}" for i in range(200_000)], dtype="string[pyarrow]"),
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(pd.RangeIndex(200_000) % 365, unit="D"),
+        "amount": pd.RangeIndex(200_000).to_numpy() * -10,
+        "account_id": pd.Categorical([f"account-{i % 8}" for i in range(200_000)]),
+    })
+
+
+def test_frames_are_views_of_the_mapped_snapshot(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    frame = cache.get("transactions", 1, _loader)
+
+    pd.testing.assert_frame_equal(frame, _loader())
+    # Copies would be writeable; the mapped file is not
+    assert not frame["amount"].to_numpy().flags.writeable
+    assert not frame["date"].to_numpy().flags.writeable
+    assert not frame["account_id"].cat.codes.to_numpy().flags.writeable
+    assert cache.get("transactions", 1, _loader) is frame
+
+
+def test_a_new_version_replaces_the_frame(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    first = cache.get("transactions", 1, _loader)
+    second = cache.get("transactions", 2, lambda: _loader().head(10))
+
+    assert len(first) == 200_000
+    assert len(second) == 10
+    assert [path.name for path in tmp_path.glob("*.feather")] == ["transactions-v2.feather"]
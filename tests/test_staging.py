@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from benchmarks.synthetic import FakeYNABClient, SyntheticBudget
+from data.aggregates import rebuild_cube
+from data.data_loader import bump_data_version, sync_all_data
+from data.staging import SyncIntegrityError
+
+PUBLISHED_TABLES = (
+    "categories", "payees", "accounts", "transactions", "subtransactions", "budgets", "month_budgets",
+    "account_balance_history", "ledger_lines", "category_account_month", "dimension_keys", "sync_state",
+    "data_version",
+)
+
+
+class OrphanedTransactionClient(FakeYNABClient):
+    """Serves one extra transaction, on an account YNAB never returned."""
+
+    def get_transactions_delta(self, budget_id, last_knowledge_of_server=None):
+        transactions, knowledge = super().get_transactions_delta(budget_id, last_knowledge_of_server)
+        orphan = next(iter(transactions)).model_copy(update={"id": "orphan", "account_id": "no-such-account"})
+        return list(transactions) + [orphan], knowledge
+
+
+def test_failed_integrity_check_leaves_published_tables_untouched(database, table_contents):
+    budget = SyntheticBudget(payees=40, transactions=300, split_ratio=0.2, months=6, seed=3)
+    sync_all_data(budget.id, client=FakeYNABClient(budget))
+    published = {table: table_contents(table) for table in PUBLISHED_TABLES}
+
+    with pytest.raises(SyncIntegrityError) as raised:
+        sync_all_data(budget.id, client=OrphanedTransactionClient(budget))
+
+    assert raised.value.problems
+    for table in PUBLISHED_TABLES:
+        assert table_contents(table) == published[table], table
+
+
+class UnsplitClient(FakeYNABClient):
+    """Serves every transaction again, with the splits turned back into a single category."""
+
+    def get_transactions_delta(self, budget_id, last_knowledge_of_server=None):
+        category = self.budget.categories[0]
+        transactions = [
+            txn.model_copy(update={"subtransactions": [], "category_id": category.id,
+                                   "category_name": category.name})
+            if txn.subtransactions else txn
+            for txn in self.budget.transactions
+        ]
+        return transactions, self._knowledge(last_knowledge_of_server)
+
+
+@pytest.mark.parametrize("full_resync", [True, False])
+def test_unsplit_transactions_lose_their_split_parts(database, table_contents, full_resync):
+    budget = SyntheticBudget(payees=40, transactions=300, split_ratio=0.3, months=6, seed=5)
+    sync_all_data(budget.id, client=FakeYNABClient(budget))
+    split_ids = {txn.id for txn in budget.transactions if txn.subtransactions}
+    assert split_ids and table_contents("subtransactions")
+
+    sync_all_data(budget.id, full_resync=full_resync, client=UnsplitClient(budget))
+
+    assert table_contents("subtransactions") == []
+    lines = table_contents("ledger_lines")
+    assert len(lines) == len(budget.transactions)
+    assert all(line["id"] == line["transaction_id"] for line in lines)
+
+    # The cube holds what a rebuild from the cleaned-up lines would
+    cube_columns = ("id", "created_at", "updated_at")
+    cube = table_contents("category_account_month", exclude=cube_columns)
+    with database.SessionLocal() as session:
+        rebuild_cube(session)
+        session.commit()
+    assert table_contents("category_account_month", exclude=cube_columns) == cube
+
+
+class WriteDuringDownloadClient(FakeYNABClient):
+    """Commits a write from another thread halfway through the transactions download."""
+
+    def __init__(self, budget):
+        super().__init__(budget)
+        self.write_finished = None
+
+    def _write(self):
+        writer = threading.Thread(target=bump_data_version)
+        writer.start()
+        writer.join(timeout=5)
+        self.write_finished = not writer.is_alive()
+
+    def get_transactions_delta(self, budget_id, last_knowledge_of_server=None):
+        transactions, knowledge = super().get_transactions_delta(budget_id, last_knowledge_of_server)
+
+        def downloading():
+            for index, txn in enumerate(transactions):
+                if index == len(transactions) // 2:
+                    self._write()
+                yield txn
+
+        return downloading(), knowledge
+
+
+def test_other_writers_are_not_blocked_by_a_download(database, table_contents):
+    budget = SyntheticBudget(payees=40, transactions=300, months=6, seed=11)
+    client = WriteDuringDownloadClient(budget)
+
+    sync_all_data(budget.id, client=client)
+
+    assert client.write_finished
+    # Both the write and the sync's own bump of the data version landed
+    assert table_contents("data_version")[0]["version"] == 2
+    assert len(table_contents("transactions")) == 300
@@ -0,0 +1,167 @@
+import datetime
+import fcntl
+
+import pytest
+
+from data import sync_scheduler
+from data.database import SyncRun
+from data.request_scheduler import YNAB_RATE_PERIOD, YNABRateLimitError
+from data.sync_scheduler import QUOTA_LOW, SyncScheduler, next_interval
+
+INTERVAL = 600
+
+
+class Client:
+    def __init__(self, quota=200):
+        self.quota = quota
+        self.closed = False
+
+    def quota_remaining(self):
+        return self.quota
+
+    def close(self):
+        self.closed = True
+
+
+class Syncs:
+    """Stands in for sync_all_data: returns `changed`, or raises the next of `errors`."""
+
+    def __init__(self, *errors, changed=5):
+        self.errors = list(errors)
+        self.changed = changed
+        self.calls = []
+
+    def __call__(self, budget_id, client=None):
+        self.calls.append(budget_id)
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.changed
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [datetime.datetime(2026, 1, 1, 12, 0, 0)]
+    monkeypatch.setattr(sync_scheduler, "_utcnow", lambda: now[0])
+    return now
+
+
+def _scheduler(tmp_path, sync, client=None, interval=INTERVAL):
+    return SyncScheduler("budget-1", interval=interval, lock_path=str(tmp_path / "sync.lock"),
+                         client_factory=lambda: client or Client(), sync=sync)
+
+
+def _runs(database):
+    with database.SessionLocal() as session:
+        return session.query(SyncRun).order_by(SyncRun.id).all()
+
+
+@pytest.mark.parametrize("quota, expected", [
+    (None, INTERVAL),
+    (200, INTERVAL),
+    (QUOTA_LOW, INTERVAL),
+    (QUOTA_LOW // 2, INTERVAL * 2),
+    (1, YNAB_RATE_PERIOD),
+    (0, YNAB_RATE_PERIOD),
+])
+def test_next_interval_stretches_with_scarce_quota(quota, expected):
+    assert next_interval(INTERVAL, quota) == expected
+
+
+def test_next_interval_never_shortens_a_long_interval():
+    assert next_interval(2 * YNAB_RATE_PERIOD, 1) == 2 * YNAB_RATE_PERIOD
+
+
+def test_a_second_holder_skips_while_the_lock_is_held(database, tmp_path, clock):
+    inner = []
+    second = _scheduler(tmp_path, Syncs())
+
+    def sync(budget_id, client=None):
+        inner.append(second.run_if_due(force=True))
+        return 1
+
+    first = _scheduler(tmp_path, sync)
+    assert first.run_if_due(force=True) is not None
+
+    assert inner == [None]
+    assert second.sync.calls == []
+    assert [run.status for run in _runs(database)] == ["ok"]
+
+
+def test_another_process_holding_the_lock_is_skipped(database, tmp_path, clock):
+    syncs = Syncs()
+    scheduler = _scheduler(tmp_path, syncs)
+
+    with open(scheduler.lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        assert scheduler.run_if_due(force=True) is None
+
+    assert syncs.calls == []
+    assert _runs(database) == []
+    assert scheduler.run_if_due() is not None
+
+
+def test_successful_run_is_recorded_and_not_due_before_the_interval(database, tmp_path, clock):
+    client = Client(quota=QUOTA_LOW // 2)
+    syncs = Syncs(changed=7)
+    scheduler = _scheduler(tmp_path, syncs, client=client)
+
+    run_id = scheduler.run_if_due()
+
+    (run,) = _runs(database)
+    assert run.id == run_id
+    assert (run.status, run.transactions_changed, run.quota_remaining, run.error) == ("ok", 7, QUOTA_LOW // 2, None)
+    # Low quota doubled the wait
+    assert run.next_run_at == run.finished_at + datetime.timedelta(seconds=2 * INTERVAL)
+    assert client.closed
+
+    clock[0] += datetime.timedelta(seconds=2 * INTERVAL - 1)
+    assert scheduler.run_if_due() is None
+    clock[0] += datetime.timedelta(seconds=1)
+    assert scheduler.run_if_due() is not None
+    assert len(syncs.calls) == 2
+
+
+def test_failed_run_is_recorded_and_retried_on_the_interval(database, tmp_path, clock):
+    syncs = Syncs(RuntimeError("YNAB exploded"))
+    scheduler = _scheduler(tmp_path, syncs)
+
+    scheduler.run_if_due()
+
+    (run,) = _runs(database)
+    assert run.status == "failed"
+    assert run.error == "RuntimeError: YNAB exploded"
+    assert run.transactions_changed is None
+    assert run.next_run_at == run.finished_at + datetime.timedelta(seconds=INTERVAL)
+
+    assert scheduler.run_if_due() is None
+    clock[0] += datetime.timedelta(seconds=INTERVAL)
+    scheduler.run_if_due()
+
+    assert [run.status for run in _runs(database)] == ["failed", "ok"]
+
+
+def test_rate_limited_run_waits_for_retry_after(database, tmp_path, clock):
+    scheduler = _scheduler(tmp_path, Syncs(YNABRateLimitError("slow down", retry_after=3 * INTERVAL)))
+
+    scheduler.run_if_due()
+
+    (run,) = _runs(database)
+    assert run.status == "failed"
+    assert run.next_run_at == run.finished_at + datetime.timedelta(seconds=3 * INTERVAL)
+    clock[0] += datetime.timedelta(seconds=INTERVAL)
+    assert scheduler.run_if_due() is None
+
+
+def test_client_that_cannot_be_built_fails_the_run(database, tmp_path, clock):
+    def broken_client():
+        raise ValueError("no access token")
+
+    syncs = Syncs()
+    scheduler = SyncScheduler("budget-1", interval=INTERVAL, lock_path=str(tmp_path / "sync.lock"),
+                              client_factory=broken_client, sync=syncs)
+
+    scheduler.run_if_due()
+
+    (run,) = _runs(database)
+    assert (run.status, run.error, run.quota_remaining) == ("failed", "ValueError: no access token", None)
+    assert syncs.calls == []
@@ -0,0 +1,98 @@
+import datetime
+
+import pytest
+from sqlalchemy import text
+
+from benchmarks.synthetic import SyntheticBudget
+from data import data_loader
+from data.transaction_pages import get_transaction_page
+
+
+@pytest.fixture
+def budget(database):
+    # A month of 400 transactions, so many share a date and an account
+    budget = SyntheticBudget(accounts=3, payees=5, category_groups=2, categories_per_group=2,
+                             transactions=400, months=1, seed=17)
+    data_loader.store_categories(budget.category_groups)
+    data_loader.store_payees(budget.payees)
+    data_loader.store_accounts(budget.accounts)
+    data_loader.store_transactions(budget.transactions)
+    return budget
+
+
+def _expected(database, where="1", params=None, order="date, account_key, rowid", descending=True):
+    direction = " DESC" if descending else ""
+    ordering = ", ".join(column + direction for column in order.split(", "))
+    with database.ReadSessionLocal() as session:
+        return list(session.execute(
+            text(f"SELECT id FROM transactions WHERE {where} ORDER BY {ordering}"), params or {}
+        ).scalars())
+
+
+def _walk_forward(page_size, **filters):
+    pages = [get_transaction_page(page_size=page_size, **filters)]
+    while pages[-1].has_next:
+        pages.append(get_transaction_page(after=pages[-1].last, page_size=page_size, **filters))
+    return pages
+
+
+def _walk_backward(last_page, page_size, **filters):
+    pages = [last_page]
+    while pages[-1].has_previous:
+        pages.append(get_transaction_page(before=pages[-1].first, page_size=page_size, **filters))
+    return pages[::-1]
+
+
+def _ids(pages):
+    return [txn_id for page in pages for txn_id in page.rows["id"]]
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_paging_forward_and_back_through_equal_dates(database, budget, descending):
+    expected = _expected(database, descending=descending)
+    with database.ReadSessionLocal() as session:
+        assert session.execute(text(
+            "SELECT MAX(n) FROM (SELECT COUNT(*) AS n FROM transactions GROUP BY date, account_key)"
+        )).scalar() > 1
+
+    forward = _walk_forward(7, descending=descending)
+
+    assert _ids(forward) == expected
+    assert not forward[0].has_previous and forward[0].has_next
+    assert forward[-1].has_previous and not forward[-1].has_next
+    assert all(len(page.rows) == 7 for page in forward[:-1])
+    assert _ids(_walk_backward(forward[-1], 7, descending=descending)) == expected
+
+
+@pytest.mark.parametrize("column, order", [
+    ("category_id", "date, rowid"),
+    ("payee_id", "date, rowid"),
+    ("account_id", "date, account_key, rowid"),
+])
+def test_filter_combined_with_the_cursor(database, budget, column, order):
+    with database.ReadSessionLocal() as session:
+        value = session.execute(text(f"SELECT {column} FROM transactions WHERE {column} IS NOT NULL")).scalar()
+    start, end = budget.start_date + datetime.timedelta(days=5), budget.end_date - datetime.timedelta(days=5)
+    filters = {column: value, "start_date": start, "end_date": end}
+    expected = _expected(
+        database, f"{column} = :value AND date >= :start AND date <= :end",
+        {"value": value, "start": start.isoformat(), "end": end.isoformat()}, order=order,
+    )
+    assert len(expected) > 10
+
+    forward = _walk_forward(4, **filters)
+
+    assert _ids(forward) == expected
+    assert _ids(_walk_backward(forward[-1], 4, **filters)) == expected
+    assert all(start <= date.date() <= end for page in forward for date in page.rows["date"])
+
+
+def test_single_page_and_empty_results(database, budget):
+    page = get_transaction_page(page_size=1000)
+
+    assert len(page.rows) == 400
+    assert not page.has_previous and not page.has_next
+
+    assert get_transaction_page(account_id="no-such-account").rows.empty
+    after_last = get_transaction_page(after=page.last, page_size=10)
+    assert after_last.rows.empty and not after_last.has_next
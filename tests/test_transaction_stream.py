@@ -0,0 +1,123 @@
+import datetime
+import json
+
+import pytest
+
+from data.request_scheduler import YNABAPIError
+from data.transaction_stream import TransactionStream
+
+
+class Blocks:
+    """A response body served as the given blocks, one per read() whatever `amt` asks for."""
+
+    def __init__(self, *blocks):
+        self.blocks = [block.encode() if isinstance(block, str) else block for block in blocks]
+        self.closed = False
+
+    def read(self, amt=None):
+        return self.blocks.pop(0) if self.blocks else b""
+
+    def close(self):
+        self.closed = True
+
+
+def _transaction(index, **fields):
+    return dict({
+        "id": f"txn-{index}", "date": "2024-03-0%d" % (index % 9 + 1), "amount": -1000 * index,
+        "memo": "café {with} [brackets], \"quotes\"", "cleared": "cleared", "approved": True,
+        "account_id": "account-1", "payee_id": "payee-1", "category_id": None, "deleted": False,
+        "subtransactions": [],
+    }, **fields)
+
+
+def _body(transactions, server_knowledge=42, indent=None):
+    return json.dumps({"data": {"transactions": transactions, "server_knowledge": server_knowledge}},
+                      indent=indent, ensure_ascii=False)
+
+
+def _split_every(text, size):
+    data = text.encode()
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+TRANSACTIONS = [_transaction(index) for index in range(5)] + [_transaction(5, subtransactions=[
+    {"id": "sub-1", "amount": -300, "memo": None, "payee_id": None, "category_id": "category-1",
+     "transfer_account_id": None, "deleted": False},
+    {"id": "sub-2", "amount": -200, "category_id": "category-2"},
+])]
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 7, 64, 10_000])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_objects_and_separators_split_across_blocks(block_size, indent):
+    # Byte-sized blocks also split the UTF-8 sequence of the memo's é
+    stream = TransactionStream(Blocks(*_split_every(_body(TRANSACTIONS, indent=indent), block_size)))
+
+    records = list(stream)
+
+    assert [record.id for record in records] == [txn["id"] for txn in TRANSACTIONS]
+    assert records[0].var_date == datetime.date(2024, 3, 1)
+    assert records[1].memo == TRANSACTIONS[1]["memo"]
+    assert [sub.id for sub in records[5].subtransactions] == ["sub-1", "sub-2"]
+    assert stream.count == len(TRANSACTIONS)
+    assert stream.server_knowledge == 42
+
+
+def test_block_boundaries_on_whitespace_and_commas():
+    first, second = (json.dumps(_transaction(index)) for index in range(2))
+    stream = TransactionStream(Blocks(
+        '{"data": {"transactions": [', "\n  ", first, " ,", "\n ", second, "  ", "]", ", ",
+        '"server_knowledge": 7}}',
+    ))
+
+    assert [record.id for record in stream] == ["txn-0", "txn-1"]
+    assert stream.server_knowledge == 7
+
+
+def test_server_knowledge_before_the_list():
+    body = '{"data": {"server_knowledge": 9, "transactions": [' + json.dumps(_transaction(1)) + "]}}"
+    stream = TransactionStream(Blocks(*_split_every(body, 5)))
+
+    assert [record.id for record in stream] == ["txn-1"]
+    assert stream.server_knowledge == 9
+
+
+def test_empty_list():
+    stream = TransactionStream(Blocks(_body([])))
+
+    assert list(stream) == []
+    assert stream.server_knowledge == 42
+
+
+@pytest.mark.parametrize("cut", [40, 200, -30, -3, -1])
+def test_truncated_body_raises(cut):
+    body = _body(TRANSACTIONS[:3])
+    stream = TransactionStream(Blocks(*_split_every(body[:cut], 16)))
+
+    with pytest.raises(YNABAPIError):
+        list(stream)
+
+
+@pytest.mark.parametrize("body", [
+    '{"data": {"transactions": [{"id": "txn-1", "date": }]}, "server_knowledge": 1}',
+    '{"data": {"transactions": [' + json.dumps(_transaction(1)) + ' oops ]}, "server_knowledge": 1}',
+    '{"data": {"transactions": [1, 2], "server_knowledge": 1}}',
+    '{"data": {"transactions": [{"id": "txn-1"}], "server_knowledge": 1}}',
+    '{"data": {"transactions": [' + json.dumps(_transaction(1, date="yesterday")) + '], "server_knowledge": 1}}',
+    '{"data": {"budgets": []}}',
+    '{"data": {"transactions": []}}',
+], ids=["bad-json", "garbage-between", "not-objects", "missing-fields", "bad-date", "no-list", "no-knowledge"])
+def test_malformed_body_raises(body):
+    stream = TransactionStream(Blocks(*_split_every(body, 8)))
+
+    with pytest.raises(YNABAPIError):
+        list(stream)
+
+
+def test_close_releases_the_response():
+    response = Blocks(_body(TRANSACTIONS))
+
+    with TransactionStream(response) as stream:
+        next(iter(stream))
+
+    assert response.closed